@@ -0,0 +1 @@
+"""Benchmarks du pipeline d'annotation (exécuter avec `python -m benchmarks.<module>`)."""
@@ -0,0 +1,73 @@
+"""Micro-benchmark : gardes fenêtrées (_guard_hits) vs gardes indexées par phrase.
+
+    python -m benchmarks.bench_guards --rules rules [--repeat 20] [--dense-copies 40]
+
+Pour chaque règle à gardes, tous les matches de `when_pattern` sont évalués avec
+_guard_hits (une fenêtre découpée + toutes les gardes par match) et avec SentenceGuards
+(chemin utilisé par apply_marker_rule); les résultats doivent être identiques.
+Deux corpus : le corpus réel, et un corpus dense où chaque phrase concatène les exemples
+de la règle (la règle se déclenche alors de nombreuses fois par phrase).
+"""
+
+from __future__ import annotations
+import argparse
+import time
+from pathlib import Path
+
+from prompts.loaders import load_markers
+from prompts.markers import _guard_hits, SentenceGuards
+
+
+def _corpus(path: Path):
+    with open(path, encoding="utf-8") as fh:
+        return [line.strip() for line in fh if line.strip()]
+
+
+def _dense_corpus(rule, copies: int):
+    examples = [str(ex).split("→")[0].strip() for ex in rule.get("examples") or []]
+    sentence = " ; ".join(examples * copies)
+    return [sentence] * 10 if sentence else []
+
+
+def _bench(rule, sentences, repeat: int):
+    cases = [(text, text.casefold(), list(rule["_compiled"].finditer(text))) for text in sentences]
+    cases = [case for case in cases if case[2]]
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        windowed = [_guard_hits(rule, text, m) for text, _, ms in cases for m in ms]
+    t_windowed = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        indexed = []
+        for text, folded, ms in cases:  # casefold partagé avec le préfiltre dans annotate_sentence
+            guards = SentenceGuards(rule, text, folded)
+            indexed.extend(guards.hits(m) for m in ms)
+    t_indexed = time.perf_counter() - t0
+
+    assert indexed == windowed, f"{rule['id']}: résultats différents"
+    return len(windowed), sum(windowed), t_windowed, t_indexed
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rules", default="rules")
+    ap.add_argument("--input", default="data/corpus_raw/CAS_Neg_Dalloux.txt")
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--dense-copies", type=int, default=40)
+    args = ap.parse_args()
+
+    sentences = _corpus(Path(args.input))
+    markers = load_markers(Path(args.rules))
+    rules = [r for rs in markers.values() for r in rs if r.get("_guards") and r.get("_compiled")]
+    for rule in rules:
+        for name, corpus in (("corpus", sentences), ("dense", _dense_corpus(rule, args.dense_copies))):
+            n, rejected, t_windowed, t_indexed = _bench(rule, corpus, args.repeat)
+            print(f"{rule['id']:<28} {name:<7} matches={n:<6} rejets={rejected:<5} "
+                  f"fenêtré={t_windowed * 1e3:8.1f} ms  indexé={t_indexed * 1e3:8.1f} ms  "
+                  f"x{t_windowed / t_indexed if t_indexed else float('inf'):.2f}")
+
+
+if __name__ == "__main__":
+    main()
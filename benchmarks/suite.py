@@ -0,0 +1,361 @@
+"""Suite de benchmarks reproductible du pipeline d'annotation.
+
+    python -m benchmarks.suite run --out bench.json [--scales 1,10,100,1000] [--density 0.9]
+    python -m benchmarks.suite compare base.json bench.json [--threshold 0.10]
+
+`run` mesure :
+  - load_markers à froid (sans cache disque) et à chaud (cache prompts.loaders), chacun dans
+    un processus neuf ;
+  - annotate_sentence groupe par groupe (seules les règles du groupe sont chargées) ;
+  - le pipeline complet en process (runner._annotate_line : annotation + JSON) ;
+  - le runner en sous-processus (débit de bout en bout et pic RSS du processus).
+Corpus : CAS_Neg_Dalloux.txt, puis des corpus synthétiques de `scale` fois sa taille où une
+proportion `density` des phrases porte une négation. Les phrases sans négation sont obtenues
+en retirant les cues des phrases du corpus (jusqu'à ce qu'aucune règle ne se déclenche).
+Le tirage est déterministe (--seed).
+
+Chaque résultat donne phrases/s et latence par phrase p50/p99 (ms). La mémoire est mesurée
+par benchmark, jamais comme le pic du processus de la suite (ru_maxrss ne redescend pas) :
+pic RSS (ko) du sous-processus pour load_markers et le runner, pic des allocations Python
+(ko, tracemalloc, sur une passe supplémentaire non chronométrée) pour les benchmarks en
+process. Les benchmarks d'annotation gardent la meilleure de --repeat passes.
+`compare` signale les régressions au-delà de --threshold et sort en erreur (code 1) s'il y
+en a ; les temps des benchmarks plus courts que --min-seconds dans les deux runs sont ignorés (bruit).
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from prompts.loaders import load_markers
+from prompts.detector import annotate_sentence
+from prompts.annotator import annotate_record
+from prompts.runner import _annotate_line
+
+# Sens de chaque métrique pour compare : +1 = plus haut est mieux, -1 = plus bas est mieux.
+METRICS = {
+    "sentences_per_s": +1,
+    "p50_ms": -1,
+    "p99_ms": -1,
+    "seconds": -1,
+    "peak_rss_kb": -1,
+    "peak_alloc_kb": -1,
+}
+_MEMORY_METRICS = ("peak_rss_kb", "peak_alloc_kb")
+
+
+def _read_corpus(path: Path) -> List[str]:
+    with open(path, encoding="utf-8") as fh:
+        return [line.strip() for line in fh if line.strip()]
+
+
+def _strip_negations(text: str, markers_by_group, max_passes: int = 4) -> Optional[str]:
+    """Retire les cues de `text` jusqu'à ce qu'aucune règle ne se déclenche (None si échec)."""
+    for _ in range(max_passes):
+        cues = annotate_record(text, 0, markers_by_group)["cues"]
+        if not cues:
+            return text or None
+        for a, b in sorted((p for c in cues for p in c["positions"]), reverse=True):
+            text = text[:a] + text[b:]
+        text = re.sub(r"\s+", " ", text).strip()
+    return None if annotate_record(text, 0, markers_by_group)["cues"] else text
+
+
+def synthetic_corpus(base: List[str], markers_by_group, scale: int, density: float, seed: int = 0) -> List[str]:
+    """`scale` × len(base) phrases, dont une proportion `density` avec négation."""
+    negated, plain = [], []
+    for text in base:
+        (negated if annotate_record(text, 0, markers_by_group)["cues"] else plain).append(text)
+        stripped = _strip_negations(text, markers_by_group)
+        if stripped:
+            plain.append(stripped)
+    rng = random.Random(seed)
+    n = scale * len(base)
+    return [rng.choice(negated) if rng.random() < density else rng.choice(plain) for _ in range(n)]
+
+
+def _rss_kb(ru_maxrss: int) -> int:
+    return ru_maxrss // 1024 if sys.platform == "darwin" else ru_maxrss  # octets sous macOS, ko sous Linux
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values) + 0.5)) - 1))  # rang le plus proche
+    return sorted_values[k]
+
+
+def _latency_stats(latencies: List[float], total: float) -> Dict[str, Any]:
+    lat = sorted(latencies)
+    return {
+        "sentences": len(lat),
+        "seconds": total,
+        "sentences_per_s": len(lat) / total if total > 0 else 0.0,
+        "p50_ms": _percentile(lat, 0.50) * 1e3,
+        "p99_ms": _percentile(lat, 0.99) * 1e3,
+    }
+
+
+# Chargement chronométré dans un processus neuf : dans le processus de la suite, le cache
+# interne de `regex` rendrait la recompilation des motifs (passe à froid) presque gratuite.
+_LOAD_SCRIPT = """
+import sys, time
+from pathlib import Path
+from prompts.loaders import load_markers
+t0 = time.perf_counter()
+load_markers(Path(sys.argv[1]), use_cache=sys.argv[2] == "1")
+print(time.perf_counter() - t0)
+"""
+
+
+def _load_run(rules: Path, use_cache: bool):
+    """(secondes de load_markers, pic RSS en ko) d'un processus neuf."""
+    cmd = [sys.executable, "-c", _LOAD_SCRIPT, str(rules), "1" if use_cache else "0"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True, cwd=Path(__file__).resolve().parents[1])
+    out = proc.stdout.read()
+    proc.stdout.close()
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode:
+        raise RuntimeError(f"load_markers en échec ({proc.returncode}) : {' '.join(cmd)}")
+    return float(out.strip().splitlines()[-1]), _rss_kb(usage.ru_maxrss)
+
+
+def bench_load(rules_dir: Path, repeat: int) -> List[Dict[str, Any]]:
+    """load_markers sans cache, puis avec un cache déjà construit (copie temporaire des règles).
+
+    Chaque passe tourne dans un sous-processus (voir _LOAD_SCRIPT).
+    """
+    out = []
+    tmp = Path(tempfile.mkdtemp(prefix="bench_rules_"))
+    try:
+        rules = tmp / "rules"
+        shutil.copytree(rules_dir, rules, ignore=shutil.ignore_patterns(".cache"))
+        load_markers(rules, use_cache=True)  # construit le cache
+        for variant, use_cache in (("cold", False), ("warm", True)):
+            measured = [_load_run(rules, use_cache) for _ in range(repeat)]
+            runs = sorted(seconds for seconds, _ in measured)
+            out.append({"name": f"load_markers[{variant}]", "bench": "load_markers", "variant": variant,
+                        "seconds": runs[len(runs) // 2], "runs": runs,
+                        "peak_rss_kb": max(rss for _, rss in measured)})
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return out
+
+
+def _timed_passes(annotate, sentences: List[str], repeat: int) -> Dict[str, Any]:
+    """Chronomètre `annotate(text, sid)` phrase par phrase ; garde la meilleure des `repeat` passes."""
+    clock = time.perf_counter
+    best = None
+    for _ in range(max(1, repeat)):
+        latencies = []
+        t_start = clock()
+        for sid, text in enumerate(sentences, 1):
+            t0 = clock()
+            annotate(text, sid)
+            latencies.append(clock() - t0)
+        total = clock() - t_start
+        if best is None or total < best[1]:
+            best = (latencies, total)
+    stats = _latency_stats(*best)
+    stats["peak_alloc_kb"] = _peak_alloc_kb(annotate, sentences)
+    return stats
+
+
+def _peak_alloc_kb(annotate, sentences: List[str]) -> int:
+    """Pic des allocations Python (ko) pendant une passe, mesuré par tracemalloc (passe non chronométrée)."""
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    for sid, text in enumerate(sentences, 1):
+        annotate(text, sid)
+    peak = tracemalloc.get_traced_memory()[1]
+    if not was_tracing:
+        tracemalloc.stop()
+    return max(0, peak - base) // 1024
+
+
+def bench_groups(markers_by_group, sentences: List[str], corpus: str, repeat: int) -> List[Dict[str, Any]]:
+    out = []
+    for group, rules in markers_by_group.items():
+        only = {group: rules}
+        res = {"name": f"annotate_group[{group}]@{corpus}", "bench": "annotate_group", "group": group,
+               "corpus": corpus, "rules": len(rules)}
+        res.update(_timed_passes(lambda text, sid: annotate_sentence(text, sid, only), sentences, repeat))
+        out.append(res)
+    return out
+
+
+def bench_pipeline(markers_by_group, sentences: List[str], corpus: str, repeat: int) -> Dict[str, Any]:
+    res = {"name": f"pipeline@{corpus}", "bench": "pipeline", "corpus": corpus}
+    res.update(_timed_passes(lambda text, sid: _annotate_line(text, sid, markers_by_group), sentences, repeat))
+    return res
+
+
+def bench_runner(rules_dir: Path, input_path: Path, n: int, corpus: str, workers: int) -> Dict[str, Any]:
+    """Runner complet en sous-processus : débit de bout en bout et pic RSS du processus.
+
+    `rules_dir` doit être une copie jetable : le runner y écrit son cache de règles (.cache).
+    """
+    with tempfile.TemporaryDirectory(prefix="bench_out_") as tmp:
+        cmd = [sys.executable, "-m", "prompts.runner", "--rules", str(rules_dir), "--input", str(input_path),
+               "--output", str(Path(tmp) / "out.jsonl"), "--workers", str(workers), "--cue-cache", "0",
+               "--log", "WARNING"]  # sans cache de cues : les corpus synthétiques répètent les mêmes phrases
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(cmd)
+        _, status, usage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - t0
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode:
+        raise RuntimeError(f"runner en échec ({proc.returncode}) : {' '.join(cmd)}")
+    rss = _rss_kb(usage.ru_maxrss)
+    return {"name": f"runner[w{workers}]@{corpus}", "bench": "runner", "corpus": corpus, "workers": workers,
+            "sentences": n, "seconds": elapsed, "sentences_per_s": n / elapsed if elapsed > 0 else 0.0,
+            "peak_rss_kb": rss}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(args) -> Dict[str, Any]:
+    rules_dir = Path(args.rules)
+    base = _read_corpus(Path(args.input))
+    markers_by_group = load_markers(rules_dir)
+    results = bench_load(rules_dir, args.load_repeat)
+    for sid, text in enumerate(base[:200], 1):  # échauffement (caches, allocations) avant les mesures
+        _annotate_line(text, sid, markers_by_group)
+
+    corpora = [("dalloux", base)]
+    for scale in args.scales:
+        name = f"synthetic-x{scale}-d{args.density:g}"
+        corpora.append((name, synthetic_corpus(base, markers_by_group, scale, args.density, args.seed)))
+
+    with tempfile.TemporaryDirectory(prefix="bench_corpus_") as tmp:
+        runner_rules = Path(tmp) / "rules"  # le cache de règles du runner est écrit ici, pas dans --rules
+        shutil.copytree(rules_dir, runner_rules, ignore=shutil.ignore_patterns(".cache"))
+        load_markers(runner_rules, use_cache=True)
+        for name, sentences in corpora:
+            print(f"[bench] {name}: {len(sentences)} phrases", file=sys.stderr)
+            if not args.skip_groups:
+                results.extend(bench_groups(markers_by_group, sentences, name, args.repeat))
+            results.append(bench_pipeline(markers_by_group, sentences, name, args.repeat))
+            path = Path(tmp) / f"{name}.txt"
+            path.write_text("\n".join(sentences) + "\n", encoding="utf-8")
+            for workers in args.runner_workers:
+                results.append(bench_runner(runner_rules, path, len(sentences), name, workers))
+
+    return {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "input": str(args.input),
+            "scales": args.scales,
+            "density": args.density,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float, min_seconds: float = 0.0) -> List[Dict[str, Any]]:
+    """Compare deux runs ; retourne une ligne par (benchmark, métrique) commun.
+
+    Les métriques de temps d'un benchmark plus court que `min_seconds` dans les deux runs sont
+    ignorées (trop bruitées pour conclure) : un benchmark rapide dans `base` qui dépasse ce
+    seuil dans `new` (ex. cache de règles cassé) est comparé.
+    """
+    base_by_name = {r["name"]: r for r in base.get("results", [])}
+    rows = []
+    for r in new.get("results", []):
+        b = base_by_name.get(r["name"])
+        if b is None:
+            continue
+        for metric, sign in METRICS.items():
+            if metric not in r or metric not in b or not b[metric]:
+                continue
+            if metric not in _MEMORY_METRICS and max(b.get("seconds", 0.0), r.get("seconds", 0.0)) < min_seconds:
+                continue
+            change = (r[metric] - b[metric]) / b[metric]
+            rows.append({"name": r["name"], "metric": metric, "base": b[metric], "new": r[metric],
+                         "change": change, "regression": sign * change < -threshold})
+    return rows
+
+
+def _parse_ints(s: str) -> List[int]:
+    return [int(x) for x in s.split(",") if x.strip()]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("run", help="Exécute la suite et écrit le JSON des résultats")
+    r.add_argument("--rules", default="rules")
+    r.add_argument("--input", default="data/corpus_raw/CAS_Neg_Dalloux.txt")
+    r.add_argument("--out", help="Fichier JSON de sortie (défaut : stdout)")
+    r.add_argument("--scales", type=_parse_ints, default=[10], help="Facteurs des corpus synthétiques, ex. 10,100,1000")
+    r.add_argument("--density", type=float, default=0.9, help="Proportion de phrases avec négation (corpus synthétiques)")
+    r.add_argument("--seed", type=int, default=0)
+    r.add_argument("--repeat", type=int, default=3, help="Passes par benchmark d'annotation (la meilleure est gardée)")
+    r.add_argument("--load-repeat", type=int, default=5)
+    r.add_argument("--runner-workers", type=_parse_ints, default=[1], help="Nombres de workers du runner, ex. 1,4")
+    r.add_argument("--skip-groups", action="store_true", help="Ne pas mesurer annotate_sentence groupe par groupe")
+
+    c = sub.add_parser("compare", help="Compare deux runs et signale les régressions")
+    c.add_argument("base")
+    c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=0.10, help="Variation relative tolérée (0.10 = 10 %%)")
+    c.add_argument("--min-seconds", type=float, default=0.1, help="Ignore les temps des benchmarks plus courts dans les deux runs (bruit)")
+    c.add_argument("--json", action="store_true", help="Sortie JSON au lieu du tableau")
+    args = ap.parse_args()
+
+    if args.cmd == "run":
+        report = json.dumps(run(args), ensure_ascii=False, indent=2)
+        if args.out:
+            Path(args.out).write_text(report + "\n", encoding="utf-8")
+        else:
+            print(report)
+        return
+
+    base = json.loads(Path(args.base).read_text(encoding="utf-8"))
+    new = json.loads(Path(args.new).read_text(encoding="utf-8"))
+    rows = compare(base, new, args.threshold, args.min_seconds)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        for row in rows:
+            flag = "RÉGRESSION" if row["regression"] else ""
+            print(f"{row['name']:<52} {row['metric']:<16} {row['base']:>12.4g} → {row['new']:>12.4g} "
+                  f"{row['change'] * 100:+7.1f}% {flag}")
+    regressions = [row for row in rows if row["regression"]]
+    if regressions:
+        print(f"{len(regressions)} régression(s) au-delà de {args.threshold:.0%}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
 """prompts package init - keeps the prompts module importable as a package."""
 
-__all__ = ["detector"]
+from .annotator import Annotator
+
+__all__ = ["detector", "Annotator"]
@@ -0,0 +1,127 @@
+"""Extraction de littéraux d'ancrage pour le préfiltrage des règles.
+
+Pour chaque motif regex, on calcule un ensemble de chaînes littérales (casefold)
+dont au moins une apparaît obligatoirement dans tout texte où le motif trouve une
+correspondance. Si aucune n'apparaît dans la phrase, la règle ne peut pas matcher et
+son `finditer` est inutile.
+
+L'analyse est volontairement conservatrice : le motif est relu avec le parseur du module
+`re`; toute construction inconnue ou non supportée (syntaxe propre au module `regex`,
+classes de caractères, répétitions optionnelles...) ne produit pas d'ancre, et une règle
+sans ancre est toujours évaluée. Certaines syntaxes de `regex` sont acceptées par `re` mais
+lues comme du texte littéral (contraintes floues `{e<=1}`, classes POSIX `[[:alpha:]]`) :
+elles sont détectées avant l'analyse, et tout avertissement du parseur annule aussi l'ancre.
+"""
+
+from __future__ import annotations
+import re
+import warnings
+from typing import FrozenSet, List, Optional, Set
+
+try:  # Python >= 3.11
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # pragma: no cover - Python < 3.11
+    import sre_parse
+    import sre_constants
+
+_LITERAL = sre_constants.LITERAL
+_AT = sre_constants.AT
+_SUBPATTERN = sre_constants.SUBPATTERN
+_BRANCH = sre_constants.BRANCH
+_ASSERT = sre_constants.ASSERT
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+if hasattr(sre_constants, "POSSESSIVE_REPEAT"):
+    _REPEATS.add(sre_constants.POSSESSIVE_REPEAT)
+_ATOMIC_GROUP = getattr(sre_constants, "ATOMIC_GROUP", None)
+
+# Seuls ces drapeaux ont un sens pour le parseur `re` (valeurs identiques dans `regex`).
+_PARSE_FLAGS = re.IGNORECASE | re.VERBOSE | re.MULTILINE | re.DOTALL
+
+# Syntaxe `regex` que `re` lit comme des littéraux : contrainte floue ({e<=1}, {i}, {1<=d<=2},
+# {2i+2d+1s<=4}...) ou classe POSIX ([[:alpha:]]).
+_REGEX_ONLY = re.compile(r"\{[\d\s,<=>+]*[eids][\d\s,<=>+eids]*\}|\[\[:")
+
+
+def _best(candidates: List[Set[str]]) -> Optional[Set[str]]:
+    """Choisit l'ensemble le plus sélectif : littéraux les plus longs, puis les moins nombreux."""
+    best = None
+    best_key = None
+    for cand in candidates:
+        if not cand or "" in cand:
+            continue
+        key = (min(len(s) for s in cand), -len(cand))
+        if best_key is None or key > best_key:
+            best, best_key = cand, key
+    return best
+
+
+def _required(items) -> Optional[Set[str]]:
+    """Ensemble de littéraux dont l'un est requis par la séquence `items` (ou None)."""
+    candidates: List[Set[str]] = []
+    run = ""
+    for op, av in items:
+        if op is _LITERAL:
+            run += chr(av)
+            continue
+        if op is _AT:  # \b, ^, $ ... : largeur nulle, n'interrompt pas le littéral
+            continue
+        if run:
+            candidates.append({run})
+            run = ""
+        if op is _SUBPATTERN:
+            sub = _required(av[-1])
+        elif _ATOMIC_GROUP is not None and op is _ATOMIC_GROUP:
+            sub = _required(av)
+        elif op is _BRANCH:
+            sub = set()
+            for branch in av[1]:
+                alt = _required(branch)
+                if alt is None:
+                    sub = None
+                    break
+                sub |= alt
+        elif op in _REPEATS:
+            sub = _required(av[2]) if av[0] >= 1 else None
+        elif op is _ASSERT and av[0] == 1:  # lookahead positif : son contenu doit figurer dans le texte
+            sub = _required(av[1])
+        else:
+            sub = None
+        if sub:
+            candidates.append(sub)
+    if run:
+        candidates.append({run})
+    return _best(candidates)
+
+
+def _parse(pattern: str, flags: int = 0):
+    """Motif lu par le parseur de `re`, ou None si cette lecture n'est pas fiable pour `regex`."""
+    if _REGEX_ONLY.search(pattern):
+        return None
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")  # FutureWarning « nested set »... : lecture douteuse
+            return sre_parse.parse(pattern, flags & _PARSE_FLAGS)
+    except Exception:  # syntaxe propre à `regex` ou motif invalide pour `re`
+        return None
+
+
+def anchor_literals(pattern: str, flags: int = 0) -> Optional[FrozenSet[str]]:
+    """Retourne les littéraux d'ancrage (casefold) de `pattern`, ou None si aucun n'est sûr."""
+    parsed = _parse(pattern, flags)
+    if parsed is None:
+        return None
+    lits = _required(list(parsed))
+    if not lits:
+        return None
+    return frozenset(s.casefold() for s in lits)
+
+
+def may_match(anchors: Optional[FrozenSet[str]], folded_text: str) -> bool:
+    """Faux uniquement si aucun littéral d'ancrage n'apparaît dans le texte (déjà casefold)."""
+    if not anchors:
+        return True
+    return any(a in folded_text for a in anchors)
+
+
+__all__ = ["anchor_literals", "may_match"]
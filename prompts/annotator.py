@@ -0,0 +1,194 @@
+"""API bibliothèque : annotation en flux (générateurs sync et async).
+
+Exemple :
+    ann = Annotator(Path("rules"))
+    with gzip.open("corpus.txt.gz", "rt", encoding="utf-8") as fh:
+        for rec in ann.annotate_stream(fh):
+            ...
+
+Chaque enregistrement a le même format que les lignes JSONL du runner :
+{"id": sid, "text": ..., "cues": [...]}. Les entrées sont consommées au fil de l'eau,
+la mémoire reste donc bornée quelle que soit la taille du corpus.
+"""
+
+from __future__ import annotations
+import asyncio
+from itertools import islice
+from pathlib import Path
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .detector import load_markers, annotate_sentence
+from .intervals import IntervalIndex
+from .budget import TimeBudget
+from .cue_cache import CueCache
+from .scopes import load_strategies, resolve_scopes
+from .segmenter import split_sentences
+
+# Une entrée est soit un texte (str/bytes, numéroté automatiquement), soit un couple (sid, texte).
+StreamItem = Union[str, bytes, Tuple[Any, Union[str, bytes]]]
+
+
+def _annotate_cues(text: str, sid, markers_by_group, profile=None, budget=None, cache=None) -> Dict[str, Any]:
+    """annotate_sentence, via `cache` (cue_cache.CueCache) si fourni. Une phrase hors budget
+    n'est pas mise en cache (le résultat dépend du temps d'exécution)."""
+    if cache is not None:
+        cues = cache.get(text)
+        if cues is not None:
+            return {"id": sid, "text": text, "cues": cues}
+    obj = annotate_sentence(text, sid, markers_by_group, IntervalIndex(), profile, budget)  # ← intervalles vus réinitialisés par phrase
+    if cache is not None and "skipped" not in obj:
+        cache.put(text, obj["cues"])
+    return obj
+
+
+def annotate_record(text: str, sid, markers_by_group, strategies_by_group=None, profile=None, budget=None,
+                    cache=None) -> Dict[str, Any]:
+    """Annote une phrase et retourne l'enregistrement minimal écrit par le runner.
+
+    Si `strategies_by_group` (scopes.load_strategies) est fourni, l'enregistrement contient
+    aussi "scopes" (étape 2). `profile` (profiling.RuleProfile) cumule les statistiques par règle.
+    Avec `budget` (budget.TimeBudget), une phrase hors budget a des cues vides et un champ
+    "skipped" ({"rule", "reason", "timeout"}). `cache` (cue_cache.CueCache) évite de réannoter
+    une phrase déjà vue.
+    """
+    obj = _annotate_cues(text, sid, markers_by_group, profile, budget, cache)
+    rec = {"id": obj.get("id"), "text": obj.get("text"), "cues": obj.get("cues", [])}
+    if "skipped" in obj:
+        rec["skipped"] = obj["skipped"]
+    if strategies_by_group is not None:
+        rec["scopes"] = resolve_scopes(text, rec["cues"], strategies_by_group)
+    return rec
+
+
+def annotate_document_record(text: str, sid, markers_by_group, strategies_by_group=None, profile=None, budget=None,
+                             cache=None) -> Dict[str, Any]:
+    """Comme annotate_record, mais découpe d'abord `text` en phrases (segmenter).
+
+    Chaque phrase est annotée séparément (aucune regex ne peut matcher à cheval sur deux
+    phrases) et les positions des cues sont ramenées aux offsets du texte d'origine.
+    L'enregistrement contient en plus "sentences" : les intervalles [start, end) des phrases,
+    et "skipped" si des phrases ont dépassé `budget` (une entrée par phrase, avec son intervalle).
+    """
+    cues: List[Dict[str, Any]] = []
+    skipped: List[Dict[str, Any]] = []
+    scopes: List[Dict[str, Any]] = []
+    spans = split_sentences(text)
+    for a, b in spans:
+        sentence = text[a:b]
+        obj = _annotate_cues(sentence, sid, markers_by_group, profile, budget, cache)
+        if "skipped" in obj:
+            skipped.append(dict(obj["skipped"], sentence=(a, b)))
+        sentence_cues = obj.get("cues", [])
+        if strategies_by_group is not None:
+            for sc in resolve_scopes(sentence, sentence_cues, strategies_by_group):
+                sc["cue_index"] += len(cues)
+                sc["start"] += a
+                sc["end"] += a
+                scopes.append(sc)
+        for cue in sentence_cues:
+            cue["positions"] = [(s + a, e + a) for s, e in cue["positions"]]
+            cues.append(cue)
+    rec = {"id": sid, "text": text, "cues": cues, "sentences": spans}
+    if skipped:
+        rec["skipped"] = skipped
+    if strategies_by_group is not None:
+        rec["scopes"] = scopes
+    return rec
+
+
+def _iter_items(items: Iterable[StreamItem], start_id: int) -> Iterator[Tuple[Any, str]]:
+    sid = start_id - 1
+    for item in items:
+        if isinstance(item, tuple):
+            item_sid, text = item
+        else:
+            item_sid, text = None, item
+        if isinstance(text, bytes):
+            text = text.decode("utf-8")
+        text = text.strip()
+        if not text:
+            continue
+        sid += 1
+        yield (sid if item_sid is None else item_sid), text
+
+
+class Annotator:
+    """Annotateur réutilisable : les règles sont chargées une fois à la construction."""
+
+    def __init__(self, rules_dir: Optional[Path] = None, markers_by_group=None, use_cache: bool = False,
+                 segment: bool = False, scopes: bool = False, budget: Optional[TimeBudget] = None,
+                 cache: Optional[CueCache] = None):
+        """`segment=True` : chaque entrée est un document, découpé en phrases avant annotation.
+        `scopes=True` : ajoute les portées (rules_dir/20_scopes) à chaque enregistrement.
+        `budget` : limites de temps regex par règle / par phrase (budget.TimeBudget).
+        `cache` : cache des cues par phrase (cue_cache.CueCache, construit sur les mêmes règles).
+        """
+        if markers_by_group is None or scopes:
+            if rules_dir is None:
+                raise ValueError("rules_dir est requis (ou markers_by_group sans scopes)")
+        if markers_by_group is None:
+            markers_by_group = load_markers(Path(rules_dir), use_cache=use_cache)
+        self.markers_by_group = markers_by_group
+        self.strategies_by_group = load_strategies(Path(rules_dir)) if scopes else None
+        self._record = annotate_document_record if segment else annotate_record
+        self.budget = budget
+        self.cache = cache
+
+    def annotate(self, text: str, sid=1) -> Dict[str, Any]:
+        return self._record(text, sid, self.markers_by_group, self.strategies_by_group, budget=self.budget, cache=self.cache)
+
+    def annotate_stream(self, texts: Iterable[StreamItem], start_id: int = 1) -> Iterator[Dict[str, Any]]:
+        """Générateur paresseux : une entrée lue → un enregistrement produit.
+
+        Les lignes vides sont ignorées; les textes sans sid explicite sont numérotés à partir
+        de `start_id`, comme le fait le runner.
+        """
+        markers_by_group, strategies_by_group, record = self.markers_by_group, self.strategies_by_group, self._record
+        budget, cache = self.budget, self.cache
+        for sid, text in _iter_items(texts, start_id):
+            yield record(text, sid, markers_by_group, strategies_by_group, budget=budget, cache=cache)
+
+    def _annotate_batch(self, batch: List[Tuple[Any, str]]) -> List[Dict[str, Any]]:
+        return [self._record(text, sid, self.markers_by_group, self.strategies_by_group, budget=self.budget, cache=self.cache)
+                for sid, text in batch]
+
+    async def aannotate_stream(
+        self,
+        texts: Union[Iterable[StreamItem], AsyncIterable[StreamItem]],
+        start_id: int = 1,
+        batch_size: int = 64,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Variante asynchrone (`async for`) de annotate_stream.
+
+        Accepte un itérable sync ou async. L'annotation s'exécute par lots de `batch_size`
+        dans un thread (asyncio.to_thread) pour ne pas bloquer la boucle d'événements ; un
+        seul lot est en vol à la fois, ce qui borne la mémoire et applique la contre-pression
+        au producteur.
+        """
+        if hasattr(texts, "__aiter__"):
+            batch: List[StreamItem] = []
+            n = start_id
+            async for item in texts:
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    pairs = list(_iter_items(batch, n))
+                    n += len(pairs)
+                    batch = []
+                    for rec in await asyncio.to_thread(self._annotate_batch, pairs):
+                        yield rec
+            if batch:
+                for rec in await asyncio.to_thread(self._annotate_batch, list(_iter_items(batch, n))):
+                    yield rec
+            return
+
+        items = _iter_items(texts, start_id)
+        while True:
+            # la lecture de l'itérable (fichier, curseur...) peut elle aussi bloquer : faite dans le thread
+            pairs = await asyncio.to_thread(lambda: list(islice(items, batch_size)))
+            if not pairs:
+                return
+            for rec in await asyncio.to_thread(self._annotate_batch, pairs):
+                yield rec
+
+
+__all__ = ["Annotator", "annotate_record", "annotate_document_record"]
@@ -0,0 +1,56 @@
+"""Budget de temps des regex (protection contre les retours arrière catastrophiques).
+
+Deux limites, en secondes, toutes deux facultatives :
+  - par règle : `rule_timeout` par défaut, surchargé par l'option YAML `options.timeout` ;
+    transmise au `timeout=` du module `regex` pour le finditer de la règle. Ce `timeout=`
+    borne chaque recherche séparément : bounded_matches vérifie en plus l'échéance entre
+    deux matches, pour que la limite porte sur l'ensemble du finditer ;
+  - par phrase : `sentence_timeout`, temps total de toutes les règles sur une phrase.
+    Chaque règle reçoit au plus le temps restant.
+
+Une phrase hors budget est ignorée par annotate_sentence (cues vides, champ "skipped").
+"""
+
+from __future__ import annotations
+from time import perf_counter
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+
+class TimeBudget:
+    __slots__ = ("rule_timeout", "sentence_timeout")
+
+    def __init__(self, rule_timeout: Optional[float] = None, sentence_timeout: Optional[float] = None):
+        self.rule_timeout = rule_timeout or None
+        self.sentence_timeout = sentence_timeout or None
+
+    def deadline(self) -> Optional[float]:
+        """Échéance (perf_counter) de la phrase qui commence maintenant, ou None."""
+        return perf_counter() + self.sentence_timeout if self.sentence_timeout else None
+
+    def for_rule(self, rule: Dict[str, Any], deadline: Optional[float]) -> Optional[float]:
+        """Timeout de `rule` compte tenu de l'échéance de la phrase (<= 0 : budget épuisé)."""
+        timeout = (rule.get("options") or {}).get("timeout", self.rule_timeout)
+        if deadline is None:
+            return timeout
+        remaining = deadline - perf_counter()
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def __repr__(self) -> str:
+        return f"TimeBudget(rule_timeout={self.rule_timeout!r}, sentence_timeout={self.sentence_timeout!r})"
+
+
+def bounded_matches(matches: Iterable, timeout: float) -> Iterator:
+    """Itère `matches` (un finditer) et lève TimeoutError dès que `timeout` secondes se sont
+    écoulées depuis l'appel, vérifié avant chaque recherche du match suivant."""
+    deadline = perf_counter() + timeout
+    it = iter(matches)
+    while True:
+        if perf_counter() > deadline:
+            raise TimeoutError("budget de la règle épuisé entre deux matches")
+        m = next(it, None)
+        if m is None:
+            return
+        yield m
+
+
+__all__ = ["TimeBudget", "bounded_matches"]
@@ -0,0 +1,440 @@
+"""Sortie en colonnes : alternative compacte au JSONL, relisible sans parser de JSON.
+
+Deux tables, une ligne par enregistrement et une ligne par cue :
+
+    phrases  id (int64), text, skipped (bool), n_cues (int32)
+    cues     sentence (rang de la phrase), rule, group, label (codes int32 des dictionnaires
+             `rules`, `groups`, `labels`), positions en CSR : pos_offsets (n_cues + 1) dans
+             pos_start / pos_end (int32)
+
+Les chaînes répétées (id de règle, groupe, label) ne sont stockées qu'une fois, dans les
+dictionnaires. Deux formats de stockage :
+  - "parquet" (si pyarrow est installé) : un dossier avec sentences.parquet, cues.parquet
+    (positions en colonnes list<int32>) et dictionaries.parquet ;
+  - "npz" : un fichier .npz non compressé (un .npy par colonne, textes et dictionnaires en
+    octets UTF-8 + offsets). Les membres étant stockés tels quels, ColumnarOutput les ouvre
+    en memory-map : une requête ne lit que les colonnes qu'elle touche.
+
+ColumnarWriter reçoit les enregistrements du runner (annotate_record) et les convertit par
+lots de `batch_size` en tableaux NumPy : la mémoire reste bornée par un lot, les colonnes npz
+étant accumulées dans des fichiers temporaires jusqu'à close(). Les portées (--scopes) et
+les intervalles de phrases de --segment ne sont pas représentés.
+"""
+
+from __future__ import annotations
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:  # optionnel : sans pyarrow, le format colonne est le .npz
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    pa = pq = None
+
+COLUMNAR_VERSION = 1
+FORMATS = ("parquet", "npz")
+
+# Colonnes .npy (hors dictionnaires) et leur dtype ; en Parquet, mêmes types Arrow.
+_NPZ_COLS = {"id": np.int64, "skipped": np.bool_, "text_bytes": np.uint8, "text_offsets": np.int64,
+             "cue_offsets": np.int64, "sentence": np.int64, "rule": np.int32, "group": np.int32, "label": np.int32,
+             "pos_offsets": np.int64, "pos_start": np.int32, "pos_end": np.int32}
+_DICTS = ("rules", "groups", "labels")
+
+
+def default_format() -> str:
+    return "parquet" if pa is not None else "npz"
+
+
+def _resolve_format(fmt: str) -> str:
+    fmt = default_format() if fmt in (None, "auto", "columnar") else fmt
+    if fmt not in FORMATS:
+        raise ValueError(f"format colonne inconnu : {fmt!r} (attendu: {', '.join(FORMATS)})")
+    if fmt == "parquet" and pa is None:
+        raise ImportError("le format parquet demande pyarrow (pip install pyarrow), ou utiliser npz")
+    return fmt
+
+
+def _pack_strings(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Chaînes → (octets UTF-8 concaténés, offsets int64 de longueur len(values) + 1)."""
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+class _Batch:
+    def __init__(self):
+        self.ids: List[int] = []
+        self.texts: List[str] = []
+        self.skipped: List[bool] = []
+        self.n_cues: List[int] = []
+        self.cue_sentence: List[int] = []
+        self.cue_rule: List[int] = []
+        self.cue_group: List[int] = []
+        self.cue_label: List[int] = []
+        self.n_positions: List[int] = []
+        self.pos_start: List[int] = []
+        self.pos_end: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        return {
+            "id": np.asarray(self.ids, dtype=np.int64),
+            "skipped": np.asarray(self.skipped, dtype=np.bool_),
+            "n_cues": np.asarray(self.n_cues, dtype=np.int32),
+            "sentence": np.asarray(self.cue_sentence, dtype=np.int64),
+            "rule": np.asarray(self.cue_rule, dtype=np.int32),
+            "group": np.asarray(self.cue_group, dtype=np.int32),
+            "label": np.asarray(self.cue_label, dtype=np.int32),
+            "n_positions": np.asarray(self.n_positions, dtype=np.int32),
+            "pos_start": np.asarray(self.pos_start, dtype=np.int32),
+            "pos_end": np.asarray(self.pos_end, dtype=np.int32),
+        }
+
+
+class _NpzSink:
+    """Colonnes accumulées dans des fichiers bruts temporaires, assemblées en .npz à la fin."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.tmpdir = Path(tempfile.mkdtemp(prefix=f".{path.name}.", dir=path.parent))
+        self.files: Dict[str, Any] = {}
+        self.lengths: Dict[str, int] = {}
+        self.totals = {"text_offsets": 0, "cue_offsets": 0, "pos_offsets": 0}
+        for name in self.totals:  # offsets CSR : commencent à 0
+            self._append(name, np.zeros(1, dtype=np.int64))
+
+    def _append(self, name: str, arr: np.ndarray) -> None:
+        fh = self.files.get(name)
+        if fh is None:
+            fh = self.files[name] = open(self.tmpdir / name, "wb")
+            self.lengths[name] = 0
+        fh.write(np.ascontiguousarray(arr).tobytes())
+        self.lengths[name] += len(arr)
+
+    def _append_offsets(self, name: str, counts) -> None:
+        ends = np.cumsum(np.asarray(counts, dtype=np.int64)) + self.totals[name]
+        if len(ends):
+            self.totals[name] = int(ends[-1])
+        self._append(name, ends)
+
+    def append(self, batch: _Batch) -> None:
+        cols = batch.columns()
+        encoded = [t.encode("utf-8") for t in batch.texts]
+        self._append("text_bytes", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+        self._append_offsets("text_offsets", [len(b) for b in encoded])
+        self._append_offsets("cue_offsets", cols.pop("n_cues"))
+        self._append_offsets("pos_offsets", cols.pop("n_positions"))
+        for name, arr in cols.items():
+            self._append(name, arr)
+
+    def close(self, dictionaries: Dict[str, List[str]]) -> None:
+        for fh in self.files.values():
+            fh.close()
+        arrays: Dict[str, np.ndarray] = {"version": np.asarray([COLUMNAR_VERSION], dtype=np.int32)}
+        for name in _DICTS:
+            arrays[f"{name}_bytes"], arrays[f"{name}_offsets"] = _pack_strings(dictionaries[name])
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        # ZIP_STORED : chaque .npy reste lisible en place (memory-map)
+        with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+            for name, arr in arrays.items():
+                with zf.open(f"{name}.npy", "w", force_zip64=True) as out:
+                    np.lib.format.write_array(out, arr)
+            for name, dtype in _NPZ_COLS.items():
+                if name not in self.files:  # aucun enregistrement écrit
+                    self._append(name, np.empty(0, dtype=dtype))
+                    self.files[name].close()
+                header = {"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False,
+                          "shape": (self.lengths[name],)}
+                with zf.open(f"{name}.npy", "w", force_zip64=True) as out, open(self.tmpdir / name, "rb") as raw:
+                    np.lib.format.write_array_header_2_0(out, header)
+                    shutil.copyfileobj(raw, out, 1 << 20)
+        tmp.replace(self.path)
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def abort(self) -> None:
+        for fh in self.files.values():
+            fh.close()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+class _ParquetSink:
+    """Un row group par lot dans sentences.parquet et cues.parquet (dossier `path`)."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.mkdir(parents=True, exist_ok=True)
+        self.sentences = pq.ParquetWriter(str(path / "sentences.parquet"), pa.schema([
+            ("id", pa.int64()), ("text", pa.large_string()), ("skipped", pa.bool_()), ("n_cues", pa.int32())]))
+        self.cues = pq.ParquetWriter(str(path / "cues.parquet"), pa.schema([
+            ("sentence", pa.int64()), ("rule", pa.int32()), ("group", pa.int32()), ("label", pa.int32()),
+            ("pos_start", pa.list_(pa.int32())), ("pos_end", pa.list_(pa.int32()))]))
+
+    def append(self, batch: _Batch) -> None:
+        cols = batch.columns()
+        self.sentences.write_table(pa.table({
+            "id": cols["id"], "text": pa.array(batch.texts, type=pa.large_string()),
+            "skipped": cols["skipped"], "n_cues": cols["n_cues"]}))
+        offsets = np.zeros(len(cols["n_positions"]) + 1, dtype=np.int32)
+        np.cumsum(cols["n_positions"], out=offsets[1:])
+        self.cues.write_table(pa.table({
+            "sentence": cols["sentence"], "rule": cols["rule"], "group": cols["group"], "label": cols["label"],
+            "pos_start": pa.ListArray.from_arrays(pa.array(offsets), pa.array(cols["pos_start"])),
+            "pos_end": pa.ListArray.from_arrays(pa.array(offsets), pa.array(cols["pos_end"]))}))
+
+    def close(self, dictionaries: Dict[str, List[str]]) -> None:
+        self.sentences.close()
+        self.cues.close()
+        kinds, codes, values = [], [], []
+        for name in _DICTS:
+            for code, value in enumerate(dictionaries[name]):
+                kinds.append(name)
+                codes.append(code)
+                values.append(value)
+        table = pa.table({"kind": kinds, "code": pa.array(codes, type=pa.int32()), "value": values})
+        pq.write_table(table, str(self.path / "dictionaries.parquet"))
+
+    def abort(self) -> None:
+        self.sentences.close()
+        self.cues.close()
+
+
+class ColumnarWriter:
+    """Écrit des enregistrements (forme annotate_record) en colonnes, par lots.
+
+    S'utilise comme le fichier JSONL du runner (write / writelines), de préférence dans un
+    `with` : close() écrit les dictionnaires et finalise le fichier.
+    """
+
+    def __init__(self, path: Path, fmt: str = "auto", batch_size: int = 8192):
+        self.path = Path(path)
+        self.format = _resolve_format(fmt)
+        self.batch_size = batch_size
+        self._codes: Dict[str, Dict[str, int]] = {name: {} for name in _DICTS}
+        self._rows = 0
+        self._batch = _Batch()
+        self._sink = _ParquetSink(self.path) if self.format == "parquet" else _NpzSink(self.path)
+
+    def _code(self, kind: str, value) -> int:
+        codes = self._codes[kind]
+        value = "" if value is None else str(value)
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+        return code
+
+    def write(self, rec: Dict[str, Any]) -> None:
+        b = self._batch
+        row = self._rows + len(b)
+        cues = rec.get("cues") or []
+        b.ids.append(int(rec.get("id") or 0))
+        b.texts.append(rec.get("text") or "")
+        b.skipped.append("skipped" in rec)
+        b.n_cues.append(len(cues))
+        for cue in cues:
+            positions = cue.get("positions") or []
+            b.cue_sentence.append(row)
+            b.cue_rule.append(self._code("rules", cue.get("id")))
+            b.cue_group.append(self._code("groups", cue.get("group")))
+            b.cue_label.append(self._code("labels", cue.get("cue_label")))
+            b.n_positions.append(len(positions))
+            for s, e in positions:
+                b.pos_start.append(s)
+                b.pos_end.append(e)
+        if len(b) >= self.batch_size:
+            self._flush()
+
+    def writelines(self, records: Iterable[Dict[str, Any]]) -> None:
+        for rec in records:
+            self.write(rec)
+
+    def _flush(self) -> None:
+        if len(self._batch):
+            self._sink.append(self._batch)
+            self._rows += len(self._batch)
+            self._batch = _Batch()
+
+    def close(self) -> None:
+        if self._sink is None:
+            return
+        self._flush()
+        self._sink.close({name: list(codes) for name, codes in self._codes.items()})
+        self._sink = None
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        elif self._sink is not None:
+            self._sink.abort()
+            self._sink = None
+
+
+# ——— Lecture ———
+
+def _npz_members(path: Path) -> Dict[str, np.ndarray]:
+    """Membres .npy d'un .npz non compressé, en memory-map (lecture seule)."""
+    out: Dict[str, np.ndarray] = {}
+    with zipfile.ZipFile(path) as zf, open(path, "rb") as fh:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path}: membre compressé {info.filename}, memory-map impossible")
+            fh.seek(info.header_offset)
+            local = fh.read(30)  # en-tête local ZIP : longueurs du nom et du champ extra en fin d'en-tête
+            name_len = int.from_bytes(local[26:28], "little")
+            extra_len = int.from_bytes(local[28:30], "little")
+            fh.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(fh)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(fh)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(fh)
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if int(np.prod(shape)) == 0:
+                out[name] = np.empty(shape, dtype=dtype)
+            else:
+                out[name] = np.memmap(path, dtype=dtype, mode="r", offset=fh.tell(), shape=shape,
+                                      order="F" if fortran else "C")
+    return out
+
+
+def _unpack_strings(data: np.ndarray, offsets: np.ndarray) -> List[str]:
+    raw = bytes(data)
+    return [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+def _csr(counts: np.ndarray) -> np.ndarray:
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
+
+
+class ColumnarOutput:
+    """Lecture d'une sortie en colonnes (dossier Parquet ou fichier .npz).
+
+    Attributs NumPy : `ids`, `skipped`, `cue_offsets` (CSR phrases → cues), `cue_sentence`,
+    `cue_rule`, `cue_group`, `cue_label` (codes), `pos_offsets`, `pos_start`, `pos_end`;
+    dictionnaires `rules`, `groups`, `labels` (code → chaîne).
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        if self.path.is_dir():
+            self._load_parquet()
+        else:
+            self._load_npz()
+        self._rule_codes = {v: i for i, v in enumerate(self.rules)}
+        self._group_codes = {v: i for i, v in enumerate(self.groups)}
+
+    def _load_npz(self) -> None:
+        m = _npz_members(self.path)
+        if int(m["version"][0]) != COLUMNAR_VERSION:
+            raise ValueError(f"{self.path}: version {int(m['version'][0])} non supportée")
+        self.format = "npz"
+        self.ids, self.skipped = m["id"], m["skipped"]
+        self.cue_offsets = m["cue_offsets"]
+        self.cue_sentence, self.cue_rule, self.cue_group, self.cue_label = m["sentence"], m["rule"], m["group"], m["label"]
+        self.pos_offsets, self.pos_start, self.pos_end = m["pos_offsets"], m["pos_start"], m["pos_end"]
+        self._text_bytes, self._text_offsets = m["text_bytes"], m["text_offsets"]
+        self.rules, self.groups, self.labels = (_unpack_strings(m[f"{n}_bytes"], m[f"{n}_offsets"]) for n in _DICTS)
+
+    def _load_parquet(self) -> None:
+        if pq is None:
+            raise ImportError("lecture d'une sortie parquet : pyarrow requis")
+        self.format = "parquet"
+        sentences = pq.read_table(str(self.path / "sentences.parquet"), memory_map=True)
+        cues = pq.read_table(str(self.path / "cues.parquet"), memory_map=True)
+        dicts = pq.read_table(str(self.path / "dictionaries.parquet")).to_pydict()
+        self.ids = sentences.column("id").to_numpy()
+        self.skipped = sentences.column("skipped").to_numpy()
+        self.cue_offsets = _csr(sentences.column("n_cues").to_numpy())
+        self._texts = sentences.column("text")
+        self.cue_sentence = cues.column("sentence").to_numpy()
+        self.cue_rule = cues.column("rule").to_numpy()
+        self.cue_group = cues.column("group").to_numpy()
+        self.cue_label = cues.column("label").to_numpy()
+        starts = cues.column("pos_start").combine_chunks()
+        self.pos_offsets = starts.offsets.to_numpy().astype(np.int64)
+        self.pos_start = starts.values.to_numpy()
+        self.pos_end = cues.column("pos_end").combine_chunks().values.to_numpy()
+        by_kind: Dict[str, Dict[int, str]] = {name: {} for name in _DICTS}
+        for kind, code, value in zip(dicts["kind"], dicts["code"], dicts["value"]):
+            by_kind[kind][code] = value
+        self.rules, self.groups, self.labels = ([d[i] for i in range(len(d))] for d in (by_kind[n] for n in _DICTS))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def n_cues(self) -> int:
+        return len(self.cue_rule)
+
+    def text(self, i: int) -> str:
+        if self.format == "parquet":
+            return self._texts[i].as_py()
+        a, b = int(self._text_offsets[i]), int(self._text_offsets[i + 1])
+        return bytes(self._text_bytes[a:b]).decode("utf-8")
+
+    def cue(self, j: int) -> Dict[str, Any]:
+        """Cue `j` sous la forme du JSONL (id, cue_label, positions, group)."""
+        a, b = int(self.pos_offsets[j]), int(self.pos_offsets[j + 1])
+        return {
+            "id": self.rules[self.cue_rule[j]],
+            "cue_label": self.labels[self.cue_label[j]],
+            "positions": [(int(s), int(e)) for s, e in zip(self.pos_start[a:b], self.pos_end[a:b])],
+            "group": self.groups[self.cue_group[j]],
+        }
+
+    def record(self, i: int) -> Dict[str, Any]:
+        """Enregistrement `i` (id, text, cues; "skipped" réduit à un booléen)."""
+        rec = {"id": int(self.ids[i]), "text": self.text(i),
+               "cues": [self.cue(j) for j in range(int(self.cue_offsets[i]), int(self.cue_offsets[i + 1]))]}
+        if self.skipped[i]:
+            rec["skipped"] = True
+        return rec
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self.record(i) for i in range(len(self)))
+
+    def cue_mask(self, rule: Optional[str] = None, group: Optional[str] = None) -> np.ndarray:
+        """Masque booléen des cues de la règle `rule` et/ou du groupe `group`."""
+        mask = np.ones(self.n_cues, dtype=bool)
+        if rule is not None:
+            code = self._rule_codes.get(rule)
+            mask &= (self.cue_rule == code) if code is not None else False
+        if group is not None:
+            code = self._group_codes.get(group)
+            mask &= (self.cue_group == code) if code is not None else False
+        return mask
+
+    def cues_where(self, rule: Optional[str] = None, group: Optional[str] = None) -> np.ndarray:
+        """Indices des cues sélectionnées (voir cue_mask)."""
+        return np.flatnonzero(self.cue_mask(rule, group))
+
+    def sentences_with(self, rule: Optional[str] = None, group: Optional[str] = None) -> np.ndarray:
+        """Rangs des phrases ayant au moins une cue sélectionnée."""
+        return np.unique(self.cue_sentence[self.cue_mask(rule, group)])
+
+    def rule_counts(self) -> Dict[str, int]:
+        counts = np.bincount(self.cue_rule, minlength=len(self.rules))
+        return {r: int(n) for r, n in zip(self.rules, counts)}
+
+    def group_counts(self) -> Dict[str, int]:
+        counts = np.bincount(self.cue_group, minlength=len(self.groups))
+        return {g: int(n) for g, n in zip(self.groups, counts)}
+
+
+def open_columnar(path: Path) -> ColumnarOutput:
+    return ColumnarOutput(path)
+
+
+__all__ = ["COLUMNAR_VERSION", "ColumnarOutput", "ColumnarWriter", "FORMATS", "default_format", "open_columnar"]
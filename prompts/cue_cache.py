@@ -0,0 +1,131 @@
+"""Cache des cues par phrase (les comptes rendus répètent des phrases types à l'identique).
+
+La clé est le texte exact de la phrase, dans l'espace d'un jeu de règles donné
+(loaders.ruleset_fingerprint) : les labels et positions des cues dépendent du texte exact
+(casse, apostrophes), une normalisation plus agressive de la clé changerait la sortie.
+
+En mémoire : LRU borné à `maxsize` entrées (OrderedDict). Optionnellement, un fichier
+SQLite (`path`) sert de second niveau, partagé entre exécutions et entre processus : une
+phrase absente de la mémoire y est cherchée, et chaque nouveau résultat y est écrit.
+
+Les cues sont rendues en copies : l'appelant peut les modifier (annotate_document_record
+décale les positions) sans altérer le cache. L'id de l'enregistrement reste celui de la
+phrase courante (le cache ne stocke que les cues).
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .loaders import ruleset_fingerprint
+
+log = logging.getLogger("prompts.cue_cache")
+
+# Incrémenter si le format des cues produites par detector change (invalide les caches disque).
+CUE_CACHE_VERSION = 1
+
+Cues = List[Dict[str, Any]]
+
+
+def _copy_cues(cues: Cues) -> Cues:
+    return [dict(c, positions=[tuple(p) for p in c["positions"]]) for c in cues]
+
+
+class CueCache:
+    def __init__(self, markers_by_group, maxsize: int = 50_000, path: Optional[Path] = None,
+                 commit_every: int = 1000):
+        self.fingerprint = f"v{CUE_CACHE_VERSION}:{ruleset_fingerprint(markers_by_group)}"
+        self.maxsize = maxsize
+        self._lru: "OrderedDict[str, Cues]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._pending = 0
+        self._commit_every = commit_every
+        if path is not None:
+            self._open(Path(path))
+
+    def _open(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(path), timeout=30.0)
+        db.execute("PRAGMA journal_mode=WAL")  # plusieurs workers peuvent lire/écrire le même fichier
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS cues (fingerprint TEXT NOT NULL, key BLOB NOT NULL, cues TEXT NOT NULL,"
+                   " PRIMARY KEY (fingerprint, key))")
+        db.commit()
+        self._db = db
+
+    @staticmethod
+    def _disk_key(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def get(self, text: str) -> Optional[Cues]:
+        """Cues (copiées) de `text`, ou None si absentes."""
+        cues = self._lru.get(text)
+        if cues is not None:
+            self._lru.move_to_end(text)
+            self.hits += 1
+            return _copy_cues(cues)
+        if self._db is not None:
+            row = self._db.execute("SELECT cues FROM cues WHERE fingerprint = ? AND key = ?",
+                                   (self.fingerprint, self._disk_key(text))).fetchone()
+            if row is not None:
+                cues = _copy_cues(json.loads(row[0]))
+                self._remember(text, cues)
+                self.hits += 1
+                self.disk_hits += 1
+                return _copy_cues(cues)
+        self.misses += 1
+        return None
+
+    def put(self, text: str, cues: Cues) -> None:
+        cues = _copy_cues(cues)
+        self._remember(text, cues)
+        if self._db is not None:
+            self._db.execute("INSERT OR REPLACE INTO cues (fingerprint, key, cues) VALUES (?, ?, ?)",
+                             (self.fingerprint, self._disk_key(text), json.dumps(cues, ensure_ascii=False)))
+            self._pending += 1
+            if self._pending >= self._commit_every:
+                self.flush()
+
+    def _remember(self, text: str, cues: Cues) -> None:
+        if self.maxsize <= 0:
+            return
+        self._lru[text] = cues
+        self._lru.move_to_end(text)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def flush(self) -> None:
+        if self._db is not None and self._pending:
+            self._db.commit()
+            self._pending = 0
+
+    def close(self) -> None:
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "disk_hits": self.disk_hits, "size": len(self._lru)}
+
+    def reset_stats(self) -> None:
+        self.hits = self.misses = self.disk_hits = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+
+__all__ = ["CueCache", "CUE_CACHE_VERSION"]
@@ -1,52 +1,109 @@
 # debug_print.py
-import inspect
+"""Instrumentation de debug et traces structurées, au-dessus de `logging`.
+
+Désactivé (le défaut), un appel coûte un test de niveau du logger : on peut donc laisser
+les appels dans le chemin chaud. Pour les activer :
+
+    logging.getLogger("prompts").setLevel(TRACE)   # ou enable_tracing()
+
+Les traces par règle (`trace(log, "match", rule_id, ...)`) sont émises au niveau TRACE
+(sous DEBUG) sur les loggers des modules ("prompts.markers", "prompts.loaders"); chaque
+enregistrement porte les champs `trace_event`, `rule_id` et `trace` (dict), exploitables
+par un handler (voir JsonTraceFormatter). Dans une boucle, tester une fois
+`tracing = log.isEnabledFor(TRACE)` puis `if tracing: trace(...)`.
+"""
+import json
+import logging
+import sys
 from pathlib import Path
 
-# Active/désactive les prints de debug
-debug_mode = True
+# Niveau sous DEBUG pour les événements par match (volumineux)
+TRACE = 5
+logging.addLevelName(TRACE, "TRACE")
 
-# Dictionnaire global pour suivre combien de fois chaque message a été affiché
+_log = logging.getLogger("prompts.debug")
+
+# Force l'affichage de debug_print même si le logger n'est pas configuré (ancien comportement)
+debug_mode = False
+
+# Nombre d'affichages par point d'appel (fichier, ligne) : borné par la taille du code,
+# et non plus par le nombre de messages formatés distincts.
 _debug_counters = {}
 
+
 def debug_print(msg: str, *args, max_print: int = None, **kwargs):
     """
-    Affiche un message de debug avec informations sur l'appelant.
-    
+    Émet un message de debug (logger "prompts.debug", niveau DEBUG).
+
     Args:
         msg (str): Message principal à afficher
         *args: Variables à afficher avec leur type
-        max_print (int, optional): Nombre maximum d'affichages pour ce message (None = illimité)
-        **kwargs: Arguments supplémentaires passés à print
+        max_print (int, optional): Nombre maximum d'affichages depuis ce point d'appel (None = illimité)
+        **kwargs: ignorés (anciens arguments de print)
     """
-    if not debug_mode:
+    if not debug_mode and not _log.isEnabledFor(logging.DEBUG):
         return
 
-    # Compteur pour ce message
-    counter_key = msg
-    if counter_key not in _debug_counters:
-        _debug_counters[counter_key] = 0
+    if max_print is not None:
+        frame = sys._getframe(1)
+        counter_key = (frame.f_code.co_filename, frame.f_lineno)
+        n = _debug_counters.get(counter_key, 0)
+        if n >= max_print:
+            return
+        _debug_counters[counter_key] = n + 1
 
-    if max_print is not None and _debug_counters[counter_key] >= max_print:
-        return
+    output = msg
+    if args:
+        vars_info = ", ".join(f"{repr(a)} (type={type(a).__name__})" for a in args)
+        output += " | Vars: " + vars_info
 
-    _debug_counters[counter_key] += 1
+    if _log.isEnabledFor(logging.DEBUG):
+        _log.debug("%s", output, stacklevel=2)  # fichier/fonction/ligne de l'appelant via %(filename)s...
+    else:
+        frame = sys._getframe(1)
+        print(f"[DEBUG] {Path(frame.f_code.co_filename).name}:{frame.f_code.co_name}:{frame.f_lineno} → {output}")
 
-    # Info sur l'appelant
-    frame = inspect.currentframe().f_back
-    func_name = frame.f_code.co_name
-    line_no = frame.f_lineno
-    filename = frame.f_code.co_filename.split("\\")[-1]
 
-    # Préparer le message principal
-    output = f"[DEBUG] {filename}:{func_name}:{line_no} → {msg}"
+def trace(logger: logging.Logger, event: str, rule_id, **fields) -> None:
+    """Émet un événement structuré `event` pour la règle `rule_id` au niveau TRACE.
 
-    # Ajouter les variables avec leur type
-    if args:
-        vars_info = ", ".join(f"{repr(a)} (type={type(a).__name__})" for a in args)
-        output += " | Vars: " + vars_info
+    À appeler derrière un `logger.isEnabledFor(TRACE)` déjà évalué : ne reteste pas le niveau.
+    """
+    logger.log(
+        TRACE, "%s %s %s", event, rule_id, fields,
+        extra={"trace_event": event, "rule_id": rule_id, "trace": fields},
+        stacklevel=2,
+    )
+
+
+class JsonTraceFormatter(logging.Formatter):
+    """Une ligne JSON par événement de trace (les autres messages gardent leur texte)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = getattr(record, "trace_event", None)
+        if event is None:
+            return json.dumps({"level": record.levelname, "logger": record.name, "msg": record.getMessage()},
+                              ensure_ascii=False)
+        obj = {"event": event, "rule": record.rule_id, "logger": record.name}
+        obj.update(record.trace)
+        return json.dumps(obj, ensure_ascii=False, default=str)
+
+
+def enable_tracing(handler: logging.Handler = None, logger_name: str = "prompts") -> logging.Handler:
+    """Active le niveau TRACE sous `logger_name` et y attache `handler` (stderr par défaut)."""
+    if handler is None:
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonTraceFormatter())
+    handler.setLevel(TRACE)
+    logger = logging.getLogger(logger_name)
+    logger.setLevel(TRACE)
+    logger.addHandler(handler)
+    return handler
 
-    print(output, **kwargs)
 
 def _debug_return(p: Path) -> Path:
     debug_print(f"Fichier trouvé : {p.name}")
     return p
+
+
+__all__ = ["TRACE", "debug_print", "trace", "JsonTraceFormatter", "enable_tracing"]
@@ -6,55 +6,113 @@ from pathlib import Path
 from typing import Dict, List, Any, Tuple, Optional
 from .types import Token, Cue, Rule, Strategy
 from .loaders import _iter_yaml_files, infer_group_from_filename, load_markers
-from .markers import _guard_hits, _extract_negation_markers_only, _find_cleaned_text_positions
+from .markers import _guard_hits, _extract_negation_markers_only, _find_cleaned_text_positions, SentenceGuards, log as markers_log
+from .anchors import may_match
+from .intervals import IntervalIndex, DEFAULT_DEDUP, as_interval_index
+from .budget import TimeBudget, bounded_matches
+from .normalize import NormalizedText
 import regex as reg
 import os
 import yaml
-from .debug_print import debug_print
+from time import perf_counter
+from .debug_print import debug_print, trace, TRACE
 
 def _mk_cue(rule: Dict[str,Any], a:int,b:int, span:str) -> Dict[str,Any]:
     return {"id": rule.get("id","UNK_RULE"), "cue_label": span, "start": a, "end": b, "group": rule.get("group","unknown")}
 
-seen_starts = set()
+_NO_BUDGET = TimeBudget()
 
-def apply_marker_rule(rule: Dict[str,Any], text: str, seen_intervals: List[Tuple[int, int]]) -> List[Dict[str,Any]]:
+def rule_is_applied(rule: Dict[str,Any]) -> bool:
+    """Faux pour les règles ignorées par apply_marker_rule (action, contrôle qualité QC*)."""
+    return not (rule.get("action") or str(rule.get("id",""))[:2].upper() == "QC")
+
+def _format_cue_label(template: Optional[str], m) -> str:
+    """Label d'une règle sans exclude_verbs_from_cue : `cue_label` (champs {nom} remplis par les
+    groupes nommés du match) ou, à défaut, le texte du match."""
+    if not template:
+        return m.group(0)
+    try:
+        return template.format(**{k: v or "" for k, v in m.groupdict().items()})
+    except (KeyError, IndexError, ValueError):
+        return template
+
+def apply_marker_rule(rule: Dict[str,Any], text: str, seen_intervals: IntervalIndex, folded: Optional[str] = None, profile=None,
+                      timeout: Optional[float] = None, normalized: Optional[NormalizedText] = None) -> List[Dict[str,Any]]:
+    # `timeout` (secondes) : passé au finditer du module regex (par recherche) et vérifié entre les matches
+    # (budget.bounded_matches) : TimeoutError si dépassé (voir budget.TimeBudget)
+    # `normalized` : texte normalisé de la phrase (normalize.NormalizedText), partagé entre les règles
     out: List[Dict[str,Any]] = []
-    if rule.get("action") or str(rule.get("id",""))[:2].upper() == "QC": # Ignorer certaines règles
+    if not rule_is_applied(rule): # Ignorer certaines règles
         return out
     pat = rule.get("_compiled") # Récupère le motif regex précompilé (pattern original `when_pattern`, compilé dans load_markers avec reg.VERBOSE + options éventuelles).
-    # debug_print("Motif précompilé récupéré", pat)  # Affiche le pattern compilé et son type
     if not pat:
         return out
+    dedup = rule.get("options", {}).get("dedup", DEFAULT_DEDUP) # politique de déduplication (voir intervals.DEDUP_MODES)
+    guards = SentenceGuards(rule, text, folded) if rule.get("_guards") else None # gardes négatives, indexées si la règle se répète
+    tracing = markers_log.isEnabledFor(TRACE) # évalué une fois par appel : les traces ne coûtent rien si désactivées
+    rid = rule.get("id", "UNK_RULE")
+    st = profile.rule(rule) if profile is not None else None # statistiques de la règle (profiling.RuleProfile) ou None
     # Parcourt tout le texte à la recherche de correspondances avec la regex compilée `pat`.
     # Retourne un itérable (iterator) de `re.Match` objects, chacun contenant :
     #   - la sous-chaîne correspondante (`match.group()`)
     #   - la position de début (`match.start()`)
     #   - la position de fin (`match.end()`)
     # Type : Iterator[re.Match]
-    # liste intermédiaire pour stocker les intervalles des matches conservés
-# ensemble pour stocker les positions de début déjà vues
-    for m in pat.finditer(text):  # parcourt tout le texte et trouve chaque portion (mot, phrase, ou expression) qui correspond au motif regex compilé dans 'pat'
+    matches = pat.finditer(text, timeout=timeout) if timeout is not None else pat.finditer(text)
+    if timeout is not None:
+        matches = bounded_matches(matches, timeout)
+    if st is not None: # en profilage, le finditer est consommé d'un bloc pour chronométrer la regex seule
+        t0 = perf_counter()
+        matches = list(matches)
+        profile.record_regex(st, perf_counter() - t0)
+        st["matches"] += len(matches)
+    for m in matches:  # parcourt tout le texte et trouve chaque portion (mot, phrase, ou expression) qui correspond au motif regex compilé dans 'pat'
         start, end = m.start(), m.end()
-        # debug_print("Match avant filtrage :", m.group(0), "| Positions:", (start, end), "| Groupdict:", m.groupdict())
-        # ignorer si ce match chevauche un intervalle déjà vu
-        if any(start == s for s, e in seen_intervals):
-            # debug_print("Match ignoré (début identique à un match existant):", m.group(0), "| Positions:", (start, end))
+        if tracing:
+            trace(markers_log, "match", rid, span=(start, end), surface=m.group(0))
+        # ignorer si ce match est un doublon d'un intervalle déjà vu (par défaut : même début)
+        if seen_intervals.is_duplicate(start, end, dedup):
+            if tracing:
+                trace(markers_log, "dedup_drop", rid, span=(start, end), dedup=dedup)
+            if st is not None:
+                st["dedup_drops"] += 1
             continue
 
         # sinon, on conserve ce match
-        seen_intervals.append((start, end))
-        # debug_print("Match unique conservé:", m.group(0), "| Positions:", (start, end), "| Groupdict:", m.groupdict())
+        seen_intervals.add(start, end)
 
-        if _guard_hits(rule, text, m):
-            continue
+        if guards is not None:
+            if st is not None:
+                t0 = perf_counter()
+                rejected = guards.hits(m)
+                st["guard_s"] += perf_counter() - t0
+            else:
+                rejected = guards.hits(m)
+            if rejected:
+                if tracing:
+                    trace(markers_log, "guard_reject", rid, span=(start, end), surface=m.group(0))
+                if st is not None:
+                    st["guard_rejects"] += 1
+                continue
         # Vérifier exclusion des verbes
         exclude_verbs = rule.get("options", {}).get("exclude_verbs_from_cue", False)
         # nettoyer le span si nécessaire
+        if st is not None:
+            t0 = perf_counter()
         if exclude_verbs:
-            # debug_print("Avant extract", m.group(0), "start", m.start(), "end", m.end())
             span_text, start_pos, end_pos = _extract_negation_markers_only(text, m, rule)
             # Recalculer les positions nettoyées
-        cleaned_positions = _find_cleaned_text_positions(text, span_text, start_pos)
+        else:  # cue = le match entier
+            span_text, start_pos, end_pos = m.group(0), m.start(), m.end()
+        if st is not None:
+            t1 = perf_counter()
+            st["extract_s"] += t1 - t0
+        if normalized is None:
+            normalized = NormalizedText(text, folded)
+        cleaned_positions = _find_cleaned_text_positions(text, span_text, start_pos, normalized=normalized)
+        if st is not None:
+            st["positions_s"] += perf_counter() - t1
+            st["cues"] += 1
         # générer le label
         if exclude_verbs:
             label = span_text
@@ -67,14 +125,48 @@ def apply_marker_rule(rule: Dict[str,Any], text: str, seen_intervals: List[Tuple
             "positions": cleaned_positions,  # liste de tuples (start, end)
             "group": rule.get("group", "unknown"),
         }
+        if tracing:
+            trace(markers_log, "cue", rid, label=label, positions=cleaned_positions)
         out.append(cue)
     return out
 
-def annotate_sentence(text: str, sid: int, markers_by_group, seen_intervals) -> Dict[str,Any]:
+def annotate_sentence(text: str, sid: int, markers_by_group, seen_intervals=None, profile=None, budget: Optional[TimeBudget] = None) -> Dict[str,Any]:
     cues: List[Dict[str,Any]] = []
+    budget = budget or _NO_BUDGET # sans budget, seule l'option `timeout` des règles s'applique
+    deadline = budget.deadline()
+    skipped = None # règle qui a dépassé le budget : la phrase est alors ignorée
+    seen = as_interval_index(seen_intervals) # index des intervalles déjà vus (une liste est encore acceptée)
+    normalized = NormalizedText(text) # calculé une fois par phrase : casefold (préfiltre, gardes) et texte normalisé (positions)
+    folded = normalized.folded
+    if markers_log.isEnabledFor(TRACE): # repère de phrase pour les événements par règle qui suivent
+        trace(markers_log, "sentence", None, sid=sid, length=len(text))
+    if profile is not None:
+        profile.sentences += 1
+        profile.sid = sid
     for g, rules in markers_by_group.items(): # Parcourt chaque groupe (g) par exemple "adversative", "determinant", etc. de marqueurs  et ses règles associées par exemple MAIS_RESTRICTIF # .items() retourne des paires (clé, valeur) : g = nom du groupe, rules = liste des règles associées
         for r in rules: #  ses règles associées par exemple MAIS_RESTRICTIF
-            cues.extend(apply_marker_rule(r, text, seen_intervals)) # Applique la règle `r` au texte et ajoute toutes les cues détectées à la liste `cues`
+            if not may_match(r.get("_anchors"), folded): # aucun littéral requis dans la phrase → la règle ne peut pas matcher (ni marquer seen_intervals)
+                if profile is not None:
+                    profile.rule(r)["prefiltered"] += 1
+                continue
+            timeout = budget.for_rule(r, deadline)
+            try:
+                if timeout is not None and timeout <= 0:
+                    raise TimeoutError("budget de la phrase épuisé")
+                cues.extend(apply_marker_rule(r, text, seen, folded, profile, timeout, normalized)) # Applique la règle `r` au texte et ajoute toutes les cues détectées à la liste `cues`
+            except TimeoutError:
+                skipped = {"rule": r.get("id", "UNK_RULE"), "reason": "timeout", "timeout": None if timeout is None else round(max(timeout, 0.0), 3)}
+                if profile is not None:
+                    profile.rule(r)["timeouts"] += 1
+                break
+        if skipped:
+            break
+    if skipped:
+        markers_log.warning("Phrase %s ignorée : la règle %s dépasse le budget regex (%.3gs, %d caractères)",
+                            sid, skipped["rule"], skipped["timeout"] or 0.0, len(text))
+        cues = []
+    if isinstance(seen_intervals, list): # ancienne API : la liste de l'appelant reflète les intervalles vus
+        seen_intervals[:] = list(seen)
     groups_present = sorted({c["group"] for c in cues})
     obj = {
         "id": sid,
@@ -83,6 +175,8 @@ def annotate_sentence(text: str, sid: int, markers_by_group, seen_intervals) ->
         # "candidates_rules_ID_cues": build_candidates_rules_id_cues(groups_present, markers_by_group),
         "cues": cues
     }
+    if skipped:
+        obj["skipped"] = skipped
     return obj
 
-__all__ = ["load_markers","annotate_sentence","make_logger"]
+__all__ = ["load_markers","annotate_sentence","rule_is_applied","make_logger"]
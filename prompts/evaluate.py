@@ -0,0 +1,282 @@
+"""Évaluation d'une sortie du runner contre des annotations de référence (gold).
+
+    python -m prompts.evaluate --pred sortie.jsonl --gold data/annotations_example.jsonl [--json rapport.json]
+
+Les deux côtés sont au format JSONL du runner ({"id", "text", "cues": [{"id", "cue_label",
+"positions", "group"}]}) ou en sortie colonne (prompts.columnar, .npz ou dossier Parquet).
+Les phrases sont appariées par "id"; seules les phrases présentes dans le gold sont évaluées.
+
+Précision, rappel et F1 sont calculés par id de règle, par groupe et globalement (« * » :
+cues comparées sans tenir compte de la règle ni du groupe), selon deux critères :
+  - exact   : mêmes intervalles `positions` (tous), même phrase, même clé ;
+  - overlap : au moins un intervalle d'une cue prédite chevauche un intervalle d'une cue gold
+              de même phrase et de même clé (précision sur les prédites, rappel sur les gold).
+
+Tout est vectorisé (NumPy) : les cues sont aplaties en tableaux, les intervalles placés dans un
+espace de coordonnées global (clé, phrase, offset) où le chevauchement se teste par
+searchsorted sur les débuts triés et un maximum cumulé des fins; l'appariement exact compare
+des signatures de cues (np.unique), avec multiplicité.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import logging
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+log = logging.getLogger("prompts.evaluate")
+
+LEVELS = ("rule", "group", "all")
+
+
+class CueArrays:
+    """Cues aplaties : une ligne par cue, positions en CSR (pos_offsets → pos_start / pos_end)."""
+
+    def __init__(self, ids: np.ndarray, cue_sid: np.ndarray, cue_rule: np.ndarray, cue_group: np.ndarray,
+                 rules: List[str], groups: List[str], pos_offsets: np.ndarray, pos_start: np.ndarray,
+                 pos_end: np.ndarray):
+        self.ids = np.asarray(ids, dtype=np.int64)          # ids des phrases
+        self.cue_sid = np.asarray(cue_sid, dtype=np.int64)  # id de phrase de chaque cue
+        self.cue_rule = np.asarray(cue_rule, dtype=np.int64)
+        self.cue_group = np.asarray(cue_group, dtype=np.int64)
+        self.rules = list(rules)
+        self.groups = list(groups)
+        self.pos_offsets = np.asarray(pos_offsets, dtype=np.int64)
+        self.pos_start = np.asarray(pos_start, dtype=np.int64)
+        self.pos_end = np.asarray(pos_end, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.cue_sid)
+
+    @property
+    def pos_cue(self) -> np.ndarray:
+        """Indice de cue de chaque intervalle."""
+        return np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.pos_offsets))
+
+    def select(self, keep: np.ndarray) -> "CueArrays":
+        """Sous-ensemble des cues (masque booléen), positions comprises."""
+        counts = np.diff(self.pos_offsets)
+        keep_pos = np.repeat(keep, counts)
+        offsets = np.zeros(int(keep.sum()) + 1, dtype=np.int64)
+        np.cumsum(counts[keep], out=offsets[1:])
+        return CueArrays(self.ids, self.cue_sid[keep], self.cue_rule[keep], self.cue_group[keep], self.rules,
+                         self.groups, offsets, self.pos_start[keep_pos], self.pos_end[keep_pos])
+
+
+def load_jsonl(path: Path) -> CueArrays:
+    ids: List[int] = []
+    cue_sid: List[int] = []
+    cue_rule: List[int] = []
+    cue_group: List[int] = []
+    n_pos: List[int] = []
+    starts: List[int] = []
+    ends: List[int] = []
+    rules: Dict[str, int] = {}
+    groups: Dict[str, int] = {}
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            sid = rec["id"]
+            ids.append(sid)
+            for cue in rec.get("cues") or []:
+                positions = cue.get("positions") or []
+                cue_sid.append(sid)
+                cue_rule.append(rules.setdefault(str(cue.get("id")), len(rules)))
+                cue_group.append(groups.setdefault(str(cue.get("group")), len(groups)))
+                n_pos.append(len(positions))
+                for s, e in positions:
+                    starts.append(s)
+                    ends.append(e)
+    offsets = np.zeros(len(n_pos) + 1, dtype=np.int64)
+    np.cumsum(np.asarray(n_pos, dtype=np.int64), out=offsets[1:])
+    return CueArrays(np.asarray(ids, dtype=np.int64), np.asarray(cue_sid, dtype=np.int64), np.asarray(cue_rule),
+                     np.asarray(cue_group), list(rules), list(groups), offsets, np.asarray(starts, dtype=np.int64),
+                     np.asarray(ends, dtype=np.int64))
+
+
+def load_columnar(path: Path) -> CueArrays:
+    from .columnar import open_columnar
+    c = open_columnar(path)
+    ids = np.asarray(c.ids, dtype=np.int64)
+    return CueArrays(ids, ids[np.asarray(c.cue_sentence)], c.cue_rule, c.cue_group, c.rules, c.groups,
+                     c.pos_offsets, c.pos_start, c.pos_end)
+
+
+def load_cues(path: Path) -> CueArrays:
+    """JSONL, ou sortie colonne (dossier Parquet / fichier .npz)."""
+    path = Path(path)
+    if path.is_dir() or path.suffix == ".npz":
+        return load_columnar(path)
+    return load_jsonl(path)
+
+
+def _remap(codes: np.ndarray, names: List[str], vocab: Dict[str, int]) -> np.ndarray:
+    """Codes d'un dictionnaire local → codes du vocabulaire commun `vocab` (complété)."""
+    table = np.asarray([vocab.setdefault(n, len(vocab)) for n in names], dtype=np.int64)
+    return table[codes] if len(codes) else np.asarray(codes, dtype=np.int64)
+
+
+def _row_ids(rows: np.ndarray) -> np.ndarray:
+    """Identifiant de chaque ligne distincte de `rows` (2D) ; plus rapide que np.unique(axis=0)."""
+    order = np.lexsort(rows.T[::-1])
+    ordered = rows[order]
+    ids = np.zeros(len(rows), dtype=np.int64)
+    np.cumsum(np.any(ordered[1:] != ordered[:-1], axis=1), out=ids[1:])
+    inverse = np.empty(len(rows), dtype=np.int64)
+    inverse[order] = ids
+    return inverse
+
+
+def _span_ids(pred: CueArrays, gold: CueArrays, prow: np.ndarray, grow: np.ndarray, stride: int) -> np.ndarray:
+    """Identifiant de (phrase, intervalles) de chaque cue, prédites puis gold : deux cues de
+    même identifiant ont exactement les mêmes `positions` dans la même phrase."""
+    width = int(max(np.diff(pred.pos_offsets).max(initial=0), np.diff(gold.pos_offsets).max(initial=0)))
+
+    def signatures(c: CueArrays, row: np.ndarray) -> np.ndarray:
+        # une ligne par cue : phrase, puis ses intervalles (start, end) codés sur un entier, complétés par -1
+        sig = np.full((len(c), 1 + width), -1, dtype=np.int64)
+        sig[:, 0] = row
+        counts = np.diff(c.pos_offsets)
+        rank = np.arange(len(c.pos_start), dtype=np.int64) - np.repeat(c.pos_offsets[:-1], counts)
+        sig[c.pos_cue, 1 + rank] = c.pos_start * stride + c.pos_end
+        return sig
+
+    both = np.concatenate([signatures(pred, prow), signatures(gold, grow)])
+    return _row_ids(both) if len(both) else np.zeros(0, dtype=np.int64)
+
+
+def _exact_tp(span_ids: np.ndarray, pkey: np.ndarray, gkey: np.ndarray, n_keys: int) -> np.ndarray:
+    """Vrais positifs exacts par clé : pour chaque signature (phrase, intervalles, clé),
+    min(nombre de cues prédites, nombre de cues gold)."""
+    if not len(span_ids):
+        return np.zeros(n_keys)
+    keys = np.concatenate([pkey, gkey])
+    _, inverse = np.unique(span_ids * n_keys + keys, return_inverse=True)
+    n_sig = int(inverse.max()) + 1
+    n_pred = len(pkey)
+    matched = np.minimum(np.bincount(inverse[:n_pred], minlength=n_sig), np.bincount(inverse[n_pred:], minlength=n_sig))
+    sig_key = np.empty(n_sig, dtype=np.int64)
+    sig_key[inverse] = keys
+    return np.bincount(sig_key, weights=matched, minlength=n_keys)
+
+
+def _overlap_hits(a: CueArrays, b: CueArrays, akey: np.ndarray, bkey: np.ndarray, arow: np.ndarray,
+                  brow: np.ndarray, stride: int, n_rows: int) -> np.ndarray:
+    """Pour chaque cue de `a`, vrai si un de ses intervalles chevauche un intervalle de `b`
+    (même clé, même phrase)."""
+    if not len(a):
+        return np.zeros(0, dtype=bool)
+    acue, bcue = a.pos_cue, b.pos_cue
+    abase = (akey[acue] * n_rows + arow[acue]) * stride  # coordonnées globales : (clé, phrase, offset)
+    bbase = (bkey[bcue] * n_rows + brow[bcue]) * stride
+    bs, be = bbase + b.pos_start, bbase + b.pos_end
+    order = np.argsort(bs, kind="stable")
+    bs, be = bs[order], be[order]
+    prefix_end = np.maximum.accumulate(be) if len(be) else be
+    # intervalles de b commençant avant la fin de l'intervalle de a : chevauchement si l'un
+    # d'eux finit après son début (les blocs précédents finissent tous avant : stride > offsets)
+    k = np.searchsorted(bs, abase + a.pos_end, side="left")
+    hit = np.zeros(len(k), dtype=bool)
+    has = k > 0
+    hit[has] = prefix_end[k[has] - 1] > (abase + a.pos_start)[has]
+    return np.bincount(acue, weights=hit, minlength=len(a)) > 0
+
+
+def _prf(tp_p: np.ndarray, tp_g: np.ndarray, n_p: np.ndarray, n_g: np.ndarray) -> Dict[str, np.ndarray]:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = np.where(n_p > 0, tp_p / np.maximum(n_p, 1), 0.0)
+        r = np.where(n_g > 0, tp_g / np.maximum(n_g, 1), 0.0)
+        f = np.where(p + r > 0, 2 * p * r / np.where(p + r > 0, p + r, 1), 0.0)
+    return {"precision": p, "recall": r, "f1": f}
+
+
+def evaluate(pred: CueArrays, gold: CueArrays) -> Dict[str, Any]:
+    """Scores exact/overlap par règle, par groupe et globaux (voir le docstring du module)."""
+    ids = gold.ids
+    # phrases évaluées : celles du gold, rangées par id (déjà triées en sortie du runner)
+    sentence_ids = ids if len(ids) < 2 or bool(np.all(ids[1:] > ids[:-1])) else np.unique(ids)
+    prow = np.searchsorted(sentence_ids, pred.cue_sid)
+    keep = prow < len(sentence_ids)
+    keep[keep] = sentence_ids[prow[keep]] == pred.cue_sid[keep]
+    if not keep.all():
+        pred, prow = pred.select(keep), prow[keep]
+    grow = np.searchsorted(sentence_ids, gold.cue_sid)
+    n_rows = max(len(sentence_ids), 1)
+    stride = int(max(pred.pos_end.max(initial=0), gold.pos_end.max(initial=0))) + 1
+
+    span_ids = _span_ids(pred, gold, prow, grow, stride)  # calculé une fois pour tous les niveaux
+
+    report: Dict[str, Any] = {"sentences": int(len(sentence_ids)), "pred_cues": len(pred), "gold_cues": len(gold)}
+    for level in LEVELS:
+        if level == "all":
+            names = ["*"]
+            pkey = np.zeros(len(pred), dtype=np.int64)
+            gkey = np.zeros(len(gold), dtype=np.int64)
+        else:
+            vocab: Dict[str, int] = {}
+            codes = "cue_rule" if level == "rule" else "cue_group"
+            dicts = "rules" if level == "rule" else "groups"
+            gkey = _remap(getattr(gold, codes), getattr(gold, dicts), vocab)
+            pkey = _remap(getattr(pred, codes), getattr(pred, dicts), vocab)
+            names = list(vocab)
+        n = len(names)
+        n_p = np.bincount(pkey, minlength=n)
+        n_g = np.bincount(gkey, minlength=n)
+        exact = _exact_tp(span_ids, pkey, gkey, n)
+        ov_p = np.bincount(pkey, weights=_overlap_hits(pred, gold, pkey, gkey, prow, grow, stride, n_rows), minlength=n)
+        ov_g = np.bincount(gkey, weights=_overlap_hits(gold, pred, gkey, pkey, grow, prow, stride, n_rows), minlength=n)
+        scores = {"exact": _prf(exact, exact, n_p, n_g), "overlap": _prf(ov_p, ov_g, n_p, n_g)}
+        rows = {}
+        for i, name in enumerate(names):
+            row = {"pred": int(n_p[i]), "gold": int(n_g[i]), "exact_tp": int(exact[i]),
+                   "overlap_tp_pred": int(ov_p[i]), "overlap_tp_gold": int(ov_g[i])}
+            for mode, m in scores.items():
+                row.update((f"{mode}_{k}", round(float(v[i]), 4)) for k, v in m.items())
+            rows[name] = row
+        report[level] = dict(sorted(rows.items()))
+    return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    header = (f"{'clé':<32} {'préd.':>6} {'gold':>6} {'P ex.':>6} {'R ex.':>6} {'F1 ex.':>6} "
+              f"{'P ch.':>6} {'R ch.':>6} {'F1 ch.':>6}")
+    lines = [f"{report['sentences']} phrases, {report['pred_cues']} cues prédites, {report['gold_cues']} cues gold"]
+    for level in LEVELS:
+        lines += ["", f"[{level}]", header, "-" * len(header)]
+        for name, r in report[level].items():
+            lines.append(f"{name[:32]:<32} {r['pred']:>6} {r['gold']:>6} {r['exact_precision']:>6.3f} "
+                         f"{r['exact_recall']:>6.3f} {r['exact_f1']:>6.3f} {r['overlap_precision']:>6.3f} "
+                         f"{r['overlap_recall']:>6.3f} {r['overlap_f1']:>6.3f}")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Évalue une sortie du runner contre des annotations gold (P/R/F1 exact et chevauchement)")
+    ap.add_argument("--pred", required=True, help="Sortie du runner (JSONL, .npz ou dossier Parquet)")
+    ap.add_argument("--gold", required=True, help="Annotations de référence (même format)")
+    ap.add_argument("--json", metavar="FICHIER", help="Écrit aussi le rapport complet en JSON")
+    ap.add_argument("--log", default="INFO")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log.upper(), logging.INFO))
+
+    t0 = perf_counter()
+    pred, gold = load_cues(Path(args.pred)), load_cues(Path(args.gold))
+    t1 = perf_counter()
+    report = evaluate(pred, gold)
+    log.info("Chargement %.2fs, évaluation %.2fs", t1 - t0, perf_counter() - t1)
+    print(format_report(report), end="")
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+__all__ = ["CueArrays", "evaluate", "format_report", "load_columnar", "load_cues", "load_jsonl"]
+
+
+if __name__ == "__main__":
+    main()
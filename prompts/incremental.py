@@ -0,0 +1,209 @@
+"""Réannotation incrémentale : après la modification de quelques règles, seules les phrases
+qu'elles peuvent affecter sont réannotées.
+
+Avec --incremental, le runner écrit à côté de la sortie JSONL (fichier ordinaire seulement) un
+fichier `<sortie>.rules.json` (rules_snapshot) : pour chaque règle, dans l'ordre d'évaluation,
+son groupe, son id, son empreinte (loaders.rule_fingerprint) et sa définition; plus les options
+qui changent la forme des enregistrements (--segment, --scopes et l'empreinte des fichiers de
+portées). Un passage sans --incremental réécrit la sortie et supprime cet état, devenu faux.
+
+Au passage suivant, plan_update compare cet état aux règles chargées. Une règle ajoutée,
+modifiée ou supprimée est « changée » (pour une règle modifiée, l'ancienne et la nouvelle
+version le sont toutes deux). Une phrase dont aucune règle changée ne matche a exactement le
+même résultat qu'avant : les règles changées n'y produisent ni cue ni intervalle vu, et les
+règles inchangées y sont évaluées dans le même ordre relatif, donc avec la même
+déduplication. Son ancienne ligne est recopiée telle quelle; toutes les autres sont
+réannotées entièrement (c'est ce qui garantit la même déduplication qu'une réexécution
+complète). Si l'ordre relatif des règles inchangées a changé, ou si les options diffèrent,
+tout est réannoté.
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import os
+from collections import Counter
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import regex as reg
+
+from .anchors import anchor_literals, may_match
+from .budget import TimeBudget
+from .detector import rule_is_applied
+from .loaders import _iter_yaml_files, pattern_flags, rule_definition, rule_fingerprint
+from .segmenter import split_sentences
+
+log = logging.getLogger("prompts.incremental")
+
+# Incrémenter si le format du fichier d'état change (un état d'une autre version force une réexécution complète).
+SIDECAR_VERSION = 1
+
+
+def sidecar_path(output: Path) -> Path:
+    return Path(f"{output}.rules.json")
+
+
+def _scopes_digest(rules_dir: Path) -> str:
+    """Empreinte des fichiers dont dépendent les portées (20_scopes et ressources)."""
+    h = hashlib.sha256()
+    for sub in ("20_scopes", "ressources"):
+        for f in _iter_yaml_files(Path(rules_dir) / sub):
+            h.update(f"\0{sub}/{f.name}\0".encode("utf-8"))
+            h.update(hashlib.sha256(f.read_bytes()).digest())
+    return h.hexdigest()
+
+
+def _options(rules_dir: Path, segment: bool, scopes: bool) -> Dict[str, Any]:
+    return {"segment": bool(segment), "scopes": bool(scopes), "scopes_digest": _scopes_digest(rules_dir) if scopes else None}
+
+
+def rules_snapshot(markers_by_group, rules_dir: Path, segment: bool = False, scopes: bool = False) -> Dict[str, Any]:
+    """État à écrire à côté de la sortie (voir le docstring du module)."""
+    return {
+        "version": SIDECAR_VERSION,
+        "options": _options(rules_dir, segment, scopes),
+        "rules": [{"group": gid, "id": r.get("id"), "fingerprint": rule_fingerprint(r), "definition": rule_definition(r)}
+                  for gid, rules in markers_by_group.items() for r in rules],
+    }
+
+
+def write_sidecar(path: Path, snapshot: Dict[str, Any]) -> None:
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(snapshot, ensure_ascii=False, default=str), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def read_sidecar(path: Path) -> Optional[Dict[str, Any]]:
+    """État d'un passage précédent, ou None (absent, illisible ou d'une autre version)."""
+    try:
+        snapshot = json.loads(Path(path).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log.warning("État incrémental illisible (%s) : %s", path, e)
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("version") != SIDECAR_VERSION:
+        return None
+    return snapshot
+
+
+def _checked_rule(rule: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Motif et ancres d'une règle à vérifier, ou None si la règle ne peut rien produire."""
+    if not rule_is_applied(rule):
+        return None
+    if "_compiled" in rule:  # règle chargée
+        return rule if rule["_compiled"] else None
+    pat = rule.get("when_pattern")  # définition d'un état précédent
+    if not pat:
+        return None
+    flags = pattern_flags(rule)
+    return {"id": rule.get("id"), "options": rule.get("options") or {}, "_compiled": reg.compile(pat, flags),
+            "_anchors": anchor_literals(pat, flags)}
+
+
+def _split_kept(fingerprints: List[str], common: Counter) -> Tuple[List[str], List[int]]:
+    """Empreintes conservées (dans l'ordre) et indices des règles changées."""
+    remaining = Counter(common)
+    kept, changed = [], []
+    for i, fp in enumerate(fingerprints):
+        if remaining[fp] > 0:
+            remaining[fp] -= 1
+            kept.append(fp)
+        else:
+            changed.append(i)
+    return kept, changed
+
+
+class IncrementalPlan:
+    """Règles changées à vérifier sur chaque phrase, et décision de réutilisation des lignes."""
+
+    def __init__(self, changed: List[Dict[str, Any]], segment: bool = False, budget: Optional[TimeBudget] = None):
+        self.changed = changed
+        self.segment = segment
+        self.budget = budget or TimeBudget()
+        self.reused = 0
+        self.rerun = 0
+
+    def affects(self, text: str) -> bool:
+        """Vrai si une règle changée matche `text` (dans le doute, un dépassement de budget aussi)."""
+        folded = text.casefold()  # même préfiltre qu'annotate_sentence
+        deadline = self.budget.deadline()
+        for r in self.changed:
+            if not may_match(r.get("_anchors"), folded):
+                continue
+            timeout = self.budget.for_rule(r, deadline)
+            try:
+                if timeout is not None and timeout <= 0:
+                    return True
+                m = r["_compiled"].search(text, timeout=timeout) if timeout is not None else r["_compiled"].search(text)
+            except TimeoutError:
+                return True
+            if m is not None:
+                return True
+        return False
+
+    def reuse(self, sid, text: str, old_line: Optional[str]) -> Optional[str]:
+        """L'ancienne ligne de la phrase `sid` si elle reste valable, sinon None (à réannoter)."""
+        line = self._reusable(sid, text, old_line)
+        if line is None:
+            self.rerun += 1
+        else:
+            self.reused += 1
+        return line
+
+    def _reusable(self, sid, text: str, old_line: Optional[str]) -> Optional[str]:
+        if not old_line:
+            return None
+        try:
+            old = json.loads(old_line)
+        except ValueError:
+            return None
+        if old.get("id") != sid or old.get("text") != text or "skipped" in old:
+            return None
+        sentences = [text[a:b] for a, b in split_sentences(text)] if self.segment else [text]
+        if any(self.affects(s) for s in sentences):
+            return None
+        return old_line if old_line.endswith("\n") else old_line + "\n"
+
+    def stats(self) -> Dict[str, int]:
+        return {"reused": self.reused, "rerun": self.rerun}
+
+    def reset_stats(self) -> None:
+        self.reused = self.rerun = 0
+
+
+def plan_update(previous: Optional[Dict[str, Any]], markers_by_group, rules_dir: Path, segment: bool = False,
+                scopes: bool = False, budget: Optional[TimeBudget] = None) -> Tuple[Optional[IncrementalPlan], str]:
+    """Plan de réannotation depuis l'état `previous` (read_sidecar).
+
+    Retourne (plan, "") ou (None, raison) si tout doit être réannoté.
+    """
+    if previous is None:
+        return None, "pas d'état précédent"
+    if previous.get("options") != _options(rules_dir, segment, scopes):
+        return None, "options (--segment, --scopes) ou règles de portée modifiées"
+    old_rules = previous.get("rules", [])
+    new_rules = [r for rules in markers_by_group.values() for r in rules]
+    old_fps = [e["fingerprint"] for e in old_rules]
+    new_fps = [rule_fingerprint(r) for r in new_rules]
+    common = Counter(old_fps) & Counter(new_fps)
+    old_kept, old_changed = _split_kept(old_fps, common)
+    new_kept, new_changed = _split_kept(new_fps, common)
+    if old_kept != new_kept:
+        return None, "ordre des règles inchangées modifié"
+    t0 = perf_counter()
+    checked = [_checked_rule(old_rules[i]["definition"]) for i in old_changed]
+    checked += [_checked_rule(new_rules[i]) for i in new_changed]
+    changed = [r for r in checked if r is not None]
+    ids = sorted({str(old_rules[i].get("id")) for i in old_changed} | {str(new_rules[i].get("id")) for i in new_changed})
+    log.info("Mode incrémental : %d règle(s) changée(s) (%s), %d motif(s) à vérifier (%.2fs)",
+             len(ids), ", ".join(ids) or "aucune", len(changed), perf_counter() - t0)
+    return IncrementalPlan(changed, segment, budget), ""
+
+
+__all__ = ["IncrementalPlan", "SIDECAR_VERSION", "plan_update", "read_sidecar", "rules_snapshot", "sidecar_path",
+           "write_sidecar"]
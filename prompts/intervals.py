@@ -0,0 +1,119 @@
+"""Index des intervalles déjà retenus dans une phrase (déduplication des matches).
+
+Les requêtes de chevauchement et d'inclusion se ramènent au maximum des fins des intervalles
+dont le début est avant une position donnée. Ce maximum préfixe est tenu dans un arbre de
+Fenwick indexé par la position de début (des offsets de caractères >= 0) : insertion et
+requête en O(log L), L = plus grand début vu, quel que soit l'ordre d'arrivée des matches.
+Doublons de début et d'intervalle exact : ensembles.
+"""
+
+from __future__ import annotations
+from typing import Iterable, Iterator, List, Set, Tuple
+
+# Politiques de déduplication (option de règle `dedup`) :
+#   start     : rejette un match dont le début a déjà été vu (comportement historique)
+#   exact     : rejette un match d'intervalle identique à un intervalle vu
+#   overlap   : rejette un match qui chevauche un intervalle vu
+#   contained : rejette un match inclus dans un intervalle vu
+#   none      : aucune déduplication
+DEDUP_MODES = ("start", "exact", "overlap", "contained", "none")
+DEFAULT_DEDUP = "start"
+
+
+class IntervalIndex:
+    """Ensemble d'intervalles [start, end) d'une phrase, interrogeable en O(log L)."""
+
+    __slots__ = ("_intervals", "_tree", "_start_set", "_exact")
+
+    def __init__(self, intervals: Iterable[Tuple[int, int]] = ()):
+        self._intervals: List[Tuple[int, int]] = []  # ordre d'insertion
+        self._tree: List[int] = [-1] * 65  # Fenwick (1-indexé) : max des fins par début; capacité = len - 1
+        self._start_set: Set[int] = set()
+        self._exact: Set[Tuple[int, int]] = set()
+        for start, end in intervals:
+            self.add(start, end)
+
+    def _update(self, start: int, end: int) -> None:
+        tree = self._tree
+        i, n = start + 1, len(tree) - 1
+        while i <= n:
+            if tree[i] < end:
+                tree[i] = end
+            i += i & -i
+
+    def _max_end_before(self, pos: int) -> int:
+        """Plus grande fin des intervalles qui commencent avant `pos` (-1 s'il n'y en a pas)."""
+        tree = self._tree
+        i = min(pos, len(tree) - 1)
+        best = -1
+        while i > 0:
+            if tree[i] > best:
+                best = tree[i]
+            i -= i & -i
+        return best
+
+    def add(self, start: int, end: int) -> None:
+        if start < 0:
+            raise ValueError(f"début d'intervalle négatif: {start}")
+        if start >= len(self._tree) - 1:  # capacité doublée jusqu'à couvrir `start`, arbre reconstruit
+            size = len(self._tree) - 1
+            while size <= start:
+                size *= 2
+            self._tree = [-1] * (size + 1)
+            for s, e in self._intervals:
+                self._update(s, e)
+        self._update(start, end)
+        self._intervals.append((start, end))
+        self._start_set.add(start)
+        self._exact.add((start, end))
+
+    def append(self, interval: Tuple[int, int]) -> None:
+        """Compatibilité avec l'ancienne liste `seen_intervals`."""
+        self.add(interval[0], interval[1])
+
+    def has_start(self, start: int) -> bool:
+        return start in self._start_set
+
+    def has_exact(self, start: int, end: int) -> bool:
+        return (start, end) in self._exact
+
+    def overlaps(self, start: int, end: int) -> bool:
+        """Vrai si un intervalle vu partage au moins un caractère avec [start, end)."""
+        return self._max_end_before(end) > start  # intervalles qui commencent avant `end`
+
+    def contains(self, start: int, end: int) -> bool:
+        """Vrai si [start, end) est inclus dans un intervalle vu."""
+        return self._max_end_before(start + 1) >= end  # intervalles qui commencent au plus tard à `start`
+
+    def is_duplicate(self, start: int, end: int, mode: str = DEFAULT_DEDUP) -> bool:
+        if mode == "start":
+            return start in self._start_set
+        if mode == "exact":
+            return (start, end) in self._exact
+        if mode == "overlap":
+            return self.overlaps(start, end)
+        if mode == "contained":
+            return self.contains(start, end)
+        if mode == "none":
+            return False
+        raise ValueError(f"dedup inconnu: {mode!r} (attendu: {', '.join(DEDUP_MODES)})")
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        """Intervalles par début croissant (à début égal, dans l'ordre d'insertion)."""
+        return iter(sorted(self._intervals, key=lambda iv: iv[0]))
+
+    def __len__(self) -> int:
+        return len(self._intervals)
+
+    def __repr__(self) -> str:
+        return f"IntervalIndex({list(self)!r})"
+
+
+def as_interval_index(seen) -> IntervalIndex:
+    """Accepte un IntervalIndex, une liste d'intervalles (ancienne API) ou None."""
+    if isinstance(seen, IntervalIndex):
+        return seen
+    return IntervalIndex(seen or ())
+
+
+__all__ = ["IntervalIndex", "DEDUP_MODES", "DEFAULT_DEDUP", "as_interval_index"]
@@ -0,0 +1,85 @@
+"""Linter des motifs de règles : quantificateurs imbriqués.
+
+Un motif comme `(?:\\w+\\s*)+` répète un sous-motif qui se répète lui-même :
+sur une phrase qui ne matche pas, le moteur essaie toutes les façons de répartir le texte
+entre les deux répétitions (retour arrière exponentiel). Le linter relit le motif avec le
+parseur de `re` (comme anchors.py) et signale toute répétition non bornée (ou de borne
+supérieure > NESTED_MAX) dont le corps contient une autre répétition non bornée, sauf si ce
+corps exige un littéral (`(?:\\s*,?\\s*ni\\s+\\w+)*`) : les itérations sont alors délimitées.
+
+Les répétitions bornées et courtes (`(?:\\s+[\\w']+){0,2}`) restent tolérées : leur coût est
+polynomial. Un motif que `re` ne sait pas lire, ou lirait mal (syntaxe propre à `regex`,
+voir anchors._parse), n'est pas analysé.
+"""
+
+from __future__ import annotations
+from typing import List
+
+from .anchors import _parse, _required
+
+try:  # Python >= 3.11
+    from re import _constants as sre_constants
+except ImportError:  # pragma: no cover - Python < 3.11
+    import sre_constants
+
+_SUBPATTERN = sre_constants.SUBPATTERN
+_BRANCH = sre_constants.BRANCH
+_ASSERT = sre_constants.ASSERT
+_ASSERT_NOT = sre_constants.ASSERT_NOT
+_MAXREPEAT = sre_constants.MAXREPEAT
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+_ATOMIC_GROUP = getattr(sre_constants, "ATOMIC_GROUP", None)
+_POSSESSIVE_REPEAT = getattr(sre_constants, "POSSESSIVE_REPEAT", None)  # pas de retour arrière
+
+# Au-delà de cette borne supérieure, une répétition externe est traitée comme non bornée.
+NESTED_MAX = 10
+
+
+def _children(op, av):
+    """Sous-séquences d'un nœud du parseur (groupes, alternatives, assertions)."""
+    if op is _SUBPATTERN:
+        return [av[-1]]
+    if op is _BRANCH:
+        return list(av[1])
+    if op in (_ASSERT, _ASSERT_NOT):
+        return [av[1]]
+    if _ATOMIC_GROUP is not None and op is _ATOMIC_GROUP:
+        return [av]
+    if op in _REPEATS or (_POSSESSIVE_REPEAT is not None and op is _POSSESSIVE_REPEAT):
+        return [av[2]]
+    return []
+
+
+def _has_unbounded_repeat(items) -> bool:
+    for op, av in items:
+        if op in _REPEATS and av[1] == _MAXREPEAT:
+            return True
+        if any(_has_unbounded_repeat(sub) for sub in _children(op, av)):
+            return True
+    return False
+
+
+def _walk(items, out: List[str]) -> None:
+    for op, av in items:
+        if op in _REPEATS:
+            lo, hi, body = av
+            if (hi == _MAXREPEAT or hi > NESTED_MAX) and _has_unbounded_repeat(body) and not _required(body):
+                bound = "∞" if hi == _MAXREPEAT else str(hi)
+                out.append(f"quantificateurs imbriqués ({{{lo},{bound}}} autour d'une répétition non bornée) : "
+                           f"retour arrière potentiellement exponentiel")
+                continue  # un seul avertissement par répétition externe
+        for sub in _children(op, av):
+            _walk(sub, out)
+
+
+def lint_pattern(pattern: str, flags: int = 0) -> List[str]:
+    """Avertissements pour `pattern` (liste vide si rien à signaler ou motif illisible par `re`)."""
+    parsed = _parse(pattern, flags)
+    if parsed is None:
+        return []
+    out: List[str] = []
+    _walk(list(parsed), out)
+    return out
+
+
+__all__ = ["lint_pattern", "NESTED_MAX"]
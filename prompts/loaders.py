@@ -1,12 +1,20 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Tuple, Optional
+import hashlib
+import json
+import os
+import pickle
 import re
+import sys
 import yaml
 import regex as reg
 import logging
 log = logging.getLogger("prompts.loaders")
-from .debug_print import debug_print
+from .debug_print import debug_print, trace, TRACE
+from .anchors import anchor_literals
+from .lint import lint_pattern
+from .intervals import DEDUP_MODES
 
 def _iter_yaml_files(folder: Path) -> List[Path]: # Parcourt le dossier donné et retourne une liste de tous les fichiers YAML valides (Path objects)
     return sorted([  
@@ -35,7 +43,13 @@ def infer_group_from_filename(name: str) -> str:
         return "adversative"
     return "autres_marqueurs"
 
-def load_markers(rules_dir: Path):
+def pattern_flags(rule: Dict[str, Any]) -> int:
+    """Flags de compilation de `when_pattern` : VERBOSE, plus IGNORECASE si options.case_insensitive."""
+    flags = reg.IGNORECASE if (rule.get("options") or {}).get("case_insensitive") else 0  # Ignore la casse si demandé
+    return flags | reg.VERBOSE                                                          # Permet les commentaires et espaces dans la regex
+
+
+def _parse_markers(rules_dir: Path):
     d = rules_dir / "10_markers"  # dossier contenant les fichiers YAML de règles
     grouped = {}  # dictionnaire des règles regroupées par type
     for f in _iter_yaml_files(d):  # itère sur chaque fichier YAML valide
@@ -52,6 +66,13 @@ def load_markers(rules_dir: Path):
             gid = rule.get("group") or infer_group_from_filename(f.name)
             # debug_print(f"Assignation du groupe gid='{gid}' pour la règle: id='{rule.get('id', 'N/A')}'")
             rule["group"] = gid
+            dedup = (rule.get("options") or {}).get("dedup")
+            if dedup is not None and dedup not in DEDUP_MODES:
+                raise ValueError(f"{f.name}: règle {rule.get('id')!r} : dedup={dedup!r} invalide (attendu: {', '.join(DEDUP_MODES)})")
+            timeout = (rule.get("options") or {}).get("timeout")
+            if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0):
+                raise ValueError(f"{f.name}: règle {rule.get('id')!r} : timeout={timeout!r} invalide (secondes > 0 attendues)")
+            lint = []                                                      # Avertissements du linter (quantificateurs imbriqués)
             pat = rule.get("when_pattern")                                # Récupère le motif regex brut défini dans la règle
             if pat:                                                       # Si un motif regex est présent
                 clean_pattern = pat.replace('\n', ' ')                    # Remplace les sauts de ligne par des espaces
@@ -62,18 +83,27 @@ def load_markers(rules_dir: Path):
                 clean_pattern = reg.sub(r'\(\s+', '(', clean_pattern)         # Supprime l'espace après "("
                 clean_pattern = reg.sub(r'\s+\)', ')', clean_pattern)         # Supprime l'espace avant ")"
                 clean_pattern = reg.sub(r'>\s+', '>', clean_pattern)          # Supprime l'espace après ">"
-                flags = reg.IGNORECASE if rule.get("options", {}).get("case_insensitive") else 0  # Ignore la casse si demandé
-                flags |= reg.VERBOSE                                         # Permet les commentaires et espaces dans la regex
+                flags = pattern_flags(rule)                                  # IGNORECASE si demandé, VERBOSE toujours
                 rule["_compiled"] = reg.compile(pat, flags)                  # Compile le motif original et l'ajoute à la règle
                 rule["_clean_pattern"] = clean_pattern                       # Stocke le motif nettoyé pour affichage ou debug
+                rule["_anchors"] = anchor_literals(pat, flags)               # Littéraux requis pour le préfiltre (None = toujours évaluer)
+                lint.extend(f"when_pattern: {w}" for w in lint_pattern(pat, flags))
 
             comp_guards = []                                                # Liste des regex de garde négatives compilées
+            guard_anchors = []                                              # Littéraux d'ancrage de chaque garde (index des gardes par phrase)
             for g in rule.get("negative_guards", []) or []:                 # Parcourt les gardes éventuelles
                 gp = g.get("pattern") if isinstance(g, dict) else g         # Récupère le motif brut si c'est un dict ou la valeur directement
                 if gp:
                     comp_guards.append(reg.compile(gp, reg.IGNORECASE))     # Compile chaque garde avec insensibilité à la casse
+                    guard_anchors.append(anchor_literals(gp, reg.IGNORECASE))
+                    lint.extend(f"garde {gp!r}: {w}" for w in lint_pattern(gp, reg.IGNORECASE))
             if comp_guards:
                 rule["_guards"] = comp_guards                                # Ajoute les gardes compilées à la règle
+                rule["_guard_anchors"] = guard_anchors
+            if lint:
+                rule["_lint"] = lint
+                for w in lint:
+                    log.warning("%s: règle %s : %s", f.name, rule.get("id"), w)
             grouped.setdefault(gid, []).append(rule)                        # Ajoute la règle dans son groupe correspondant
     # for g, L in grouped.items():
         # debug_print(f"Markers '{g}': {len(L)} règles")
@@ -86,7 +116,10 @@ def load_markers(rules_dir: Path):
     #   - "group" : le groupe auquel la règle appartient (str)
     #   - "_compiled" : motif regex compilé avec reg.compile (re.Pattern), si applicable
     #   - "_clean_pattern" : motif regex nettoyé (str), pour debug ou affichage
+    #   - "_anchors" : littéraux dont l'un doit apparaître pour que le motif matche (frozenset ou None)
     #   - "_guards" : liste de regex compilées correspondant aux negative_guards, si présentes
+    #   - "_guard_anchors" : littéraux d'ancrage de chaque garde (même ordre que "_guards")
+    #   - "_lint" : avertissements du linter (quantificateurs imbriqués), si présents
     # Type du retour : Dict[str, List[Dict[str, Any]]]
     # for gid, rules in grouped.items():
         # debug_print(f"Groupe '{gid}' contient {len(rules)} règles", max_print=1)
@@ -96,4 +129,125 @@ def load_markers(rules_dir: Path):
                         # f"Type={type(rules[0]).__name__}", max_print=1)
     return grouped
 
-__all__ = ["_iter_yaml_files", "infer_group_from_filename", "load_markers"]
+
+def _trace_loaded(grouped, source: str) -> None:
+    """Un événement `rule_loaded` par règle, que les règles viennent des YAML ou du cache."""
+    if not log.isEnabledFor(TRACE):
+        return
+    for gid, rules in grouped.items():
+        for rule in rules:
+            trace(log, "rule_loaded", rule.get("id"), file=Path(rule["_file"]).name, group=gid,
+                  anchors=sorted(rule.get("_anchors") or ()), guards=len(rule.get("_guards") or ()),
+                  dedup=(rule.get("options") or {}).get("dedup") or "start", source=source)
+
+
+# ——— Cache disque des règles compilées ———
+# Les motifs `regex` se sérialisent avec leur code compilé (regex._pickle) : la relecture ne
+# réanalyse pas les motifs. Le gain à chaud est mesuré par benchmarks.suite (load_markers[warm]).
+
+# Incrémenter si le format des règles produites par _parse_markers change (invalide les caches existants).
+RULE_CACHE_VERSION = 3
+
+# Modules dont dépendent les champs calculés du cache (_anchors, _guard_anchors, _lint) : toute
+# modification de leur source invalide le cache, comme une nouvelle version de `regex` ou de Python
+# (le code compilé des motifs n'est pas portable entre versions).
+_CACHE_SOURCES = tuple(Path(__file__).with_name(name) for name in ("loaders.py", "anchors.py", "lint.py"))
+
+
+def rule_cache_path(rules_dir: Path) -> Path:
+    return rules_dir / ".cache" / "10_markers.pkl"
+
+
+def _rules_signature(rules_dir: Path) -> str:
+    """Empreinte des fichiers de règles (chemins, mtimes, tailles et contenus) et du code qui les compile."""
+    h = hashlib.sha256(f"v{RULE_CACHE_VERSION}\0regex {reg.__version__}\0py {sys.version_info[:2]}".encode())
+    for src in _CACHE_SOURCES:
+        try:
+            h.update(hashlib.sha256(src.read_bytes()).digest())
+        except OSError:  # sources absentes (application empaquetée) : seule la version compte
+            h.update(f"\0{src.name}\0".encode("utf-8"))
+    for f in _iter_yaml_files(rules_dir / "10_markers"):
+        st = f.stat()
+        h.update(f"\0{f.resolve()}\0{st.st_mtime_ns}\0{st.st_size}\0".encode("utf-8"))
+        h.update(hashlib.sha256(f.read_bytes()).digest())
+    return h.hexdigest()
+
+
+def _read_rule_cache(path: Path, signature: str) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+    try:
+        with open(path, "rb") as fh:
+            cached_sig, grouped = pickle.load(fh)
+    except FileNotFoundError:
+        return None
+    except Exception as e:  # cache corrompu ou produit par une version incompatible : on reconstruit
+        log.warning("Cache de règles illisible (%s), reconstruction: %s", path, e)
+        return None
+    return grouped if cached_sig == signature else None
+
+
+def _write_rule_cache(path: Path, signature: str, grouped) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp, "wb") as fh:
+            pickle.dump((signature, grouped), fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)  # écriture atomique : un lecteur concurrent voit l'ancien ou le nouveau cache
+    except OSError as e:  # dossier de règles en lecture seule, etc. : le cache est optionnel
+        log.warning("Impossible d'écrire le cache de règles %s: %s", path, e)
+        tmp.unlink(missing_ok=True)
+
+
+# ——— Empreintes des règles (caches de résultats, mode incrémental) ———
+# Champs purement documentaires : les modifier ne change pas les cues produites.
+DOC_KEYS = frozenset({"notes", "examples", "description"})
+
+
+def rule_definition(rule: Dict[str, Any]) -> Dict[str, Any]:
+    """Définition d'une règle : champs publics (YAML + group), hors DOC_KEYS."""
+    return {k: v for k, v in rule.items() if not k.startswith("_") and k not in DOC_KEYS}
+
+
+def rule_fingerprint(rule: Dict[str, Any]) -> str:
+    """Empreinte de la définition d'une règle (rule_definition)."""
+    blob = json.dumps(rule_definition(rule), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def ruleset_fingerprint(markers_by_group) -> str:
+    """Empreinte d'un jeu de règles chargé : groupes, ordre des règles et leurs définitions.
+
+    L'ordre compte (la déduplication dépend de l'ordre d'évaluation).
+    """
+    h = hashlib.sha256()
+    for gid, rules in markers_by_group.items():
+        h.update(f"\0g{gid}".encode("utf-8"))
+        for rule in rules:
+            h.update(rule_fingerprint(rule).encode("ascii"))
+    return h.hexdigest()
+
+
+def load_markers(rules_dir: Path, use_cache: bool = False):
+    """Charge les règles de `rules_dir/10_markers` (voir _parse_markers pour le format).
+
+    Avec `use_cache`, le résultat est relu depuis `rules_dir/.cache/10_markers.pkl` tant que
+    l'empreinte des fichiers YAML (chemins, mtimes, contenus) est inchangée; toute
+    modification d'un YAML invalide le cache, qui est alors reconstruit.
+    """
+    if not use_cache:
+        grouped = _parse_markers(rules_dir)
+        _trace_loaded(grouped, "yaml")
+        return grouped
+    path = rule_cache_path(rules_dir)
+    signature = _rules_signature(rules_dir)
+    grouped = _read_rule_cache(path, signature)
+    if grouped is not None:
+        log.debug("Règles chargées depuis le cache %s", path)
+        _trace_loaded(grouped, "cache")
+        return grouped
+    grouped = _parse_markers(rules_dir)
+    _write_rule_cache(path, signature, grouped)
+    _trace_loaded(grouped, "yaml")
+    return grouped
+
+__all__ = ["_iter_yaml_files", "infer_group_from_filename", "load_markers", "pattern_flags", "rule_cache_path",
+           "rule_definition", "rule_fingerprint", "ruleset_fingerprint"]
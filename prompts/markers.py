@@ -5,6 +5,7 @@ from typing import List, Dict, Any, Tuple, Optional
 import inspect
 import regex as reg
 from .debug_print import debug_print
+from .normalize import NormalizedText, normalize
 
 log = logging.getLogger("prompts.markers")
 
@@ -20,11 +21,96 @@ def _guard_hits(rule: Dict[str, Any], text: str, match=None) -> bool:
     return any(g.search(window) for g in guards)
 
 
-def _find_cleaned_text_positions(original_text: str, cleaned_text: str, approx_start: int, window_size: int = 50) -> List[Tuple[int, int]]:
+GUARD_WINDOW = 40  # contexte (caractères) de part et d'autre du match examiné par les gardes
+
+
+def build_guard_index(rule: Dict[str, Any], text: str, folded: str):
+    """Précalcule, une fois par phrase, quelles gardes de la règle peuvent matcher.
+
+    Retourne une entrée par garde de `rule["_guards"]` :
+      - False : aucun littéral d'ancrage dans la phrase, la garde ne peut matcher nulle part;
+      - None  : garde sans ancre, toujours cherchée dans la fenêtre;
+      - ses littéraux d'ancrage (présents dans la phrase), à localiser dans chaque fenêtre.
+    Retourne [] si aucune garde ne peut matcher dans la phrase, et None si le texte
+    casefold n'est pas aligné caractère à caractère sur l'original (ex. "ß").
+    """
+    if len(folded) != len(text):
+        return None
+    guards = rule.get("_guards") or []
+    anchors = rule.get("_guard_anchors") or [None] * len(guards)
+    index = [a if not a or any(lit in folded for lit in a) else False for a in anchors]
+    return index if any(entry is not False for entry in index) else []
+
+
+def guard_hits_indexed(rule: Dict[str, Any], text: str, folded: str, match, index) -> bool:
+    """Même résultat que _guard_hits(rule, text, match), sans découper la fenêtre inutilement.
+
+    Une garde ne peut matcher dans la fenêtre [start-40, end+40] que si l'un de ses littéraux
+    d'ancrage y figure entièrement : on le cherche par `str.find` borné dans le texte casefold
+    (sans copie), et la recherche regex sur la fenêtre découpée, comme dans _guard_hits,
+    n'a lieu que pour ces candidats.
+    """
+    if index is None:
+        return _guard_hits(rule, text, match)
+    if not index:
+        return False
+    a = max(0, match.start() - GUARD_WINDOW)
+    b = min(len(text), match.end() + GUARD_WINDOW)
+    window = None
+    for g, lits in zip(rule["_guards"], index):
+        if lits is False:
+            continue
+        if lits is not None and all(folded.find(lit, a, b) == -1 for lit in lits):
+            continue  # aucun littéral requis dans la fenêtre : la garde ne peut pas matcher
+        if window is None:
+            window = text[a:b]
+        if g.search(window):
+            return True
+    return False
+
+
+class SentenceGuards:
+    """Gardes d'une règle pour tous les matches d'une même phrase.
+
+    Le premier match est vérifié par la recherche fenêtrée directe (_guard_hits) : c'est la
+    moins chère quand la règle ne se déclenche qu'une fois. Dès le deuxième, l'index des
+    gardes de la phrase est construit une fois puis réutilisé (guard_hits_indexed).
+    """
+
+    __slots__ = ("rule", "text", "folded", "index", "checks")
+
+    def __init__(self, rule: Dict[str, Any], text: str, folded: Optional[str] = None):
+        self.rule = rule
+        self.text = text
+        self.folded = folded
+        self.index = None
+        self.checks = 0
+
+    def hits(self, match) -> bool:
+        self.checks += 1
+        if self.checks == 1:
+            return _guard_hits(self.rule, self.text, match)
+        if self.checks == 2:
+            if self.folded is None:
+                self.folded = self.text.casefold()
+            self.index = build_guard_index(self.rule, self.text, self.folded)
+        return guard_hits_indexed(self.rule, self.text, self.folded, match, self.index)
+
+
+def _find_cleaned_text_positions(original_text: str, cleaned_text: str, approx_start: int, window_size: int = 50,
+                                 normalized: Optional[NormalizedText] = None) -> List[Tuple[int, int]]:
     """
     Version corrigée pour trouver les positions exactes des segments nettoyés
     dans le texte original, sans remonter avant approx_start.
+
+    La recherche (insensible à la casse et aux apostrophes typographiques) se fait par
+    str.find dans le texte normalisé de la phrase, borné à la fenêtre, puis les offsets sont
+    ramenés au texte original. `normalized` (NormalizedText de la phrase) est construit ici
+    s'il n'est pas fourni.
     """
+    nt = normalized if normalized is not None else NormalizedText(original_text)
+    norm = nt.norm
+    identity = nt.identity  # cas courant : pas de conversion d'offsets
     positions: List[Tuple[int, int]] = []
     current_start = approx_start
 
@@ -32,30 +118,23 @@ def _find_cleaned_text_positions(original_text: str, cleaned_text: str, approx_s
         # Fenêtre de recherche uniquement à droite
         window_start = current_start
         window_end = min(len(original_text), current_start + len(segment) + window_size)
-        window = original_text[window_start:window_end]
-
-        # Normaliser les apostrophes pour la recherche
-        normalized_segment = segment.replace("’", "'").replace("‘", "'")
-        normalized_window = window.replace("’", "'").replace("‘", "'")
-
-        # Chercher le segment dans la fenêtre
-        escaped_segment = re.escape(normalized_segment)
-        match = re.search(escaped_segment, normalized_window, re.IGNORECASE)
 
-        if match:
-            real_start = window_start + match.start()
-            real_end = window_start + match.end()
+        # Chercher le segment normalisé dans la fenêtre normalisée
+        needle = normalize(segment)
+        if identity:
+            k = norm.find(needle, window_start, window_end)
         else:
-            # Fallback plus souple (ignorer espaces multiples)
-            flexible_pattern = re.escape(normalized_segment).replace(r'\\ ', r'\\s+')
-            match = re.search(flexible_pattern, normalized_window, re.IGNORECASE)
-            if match:
-                real_start = window_start + match.start()
-                real_end = window_start + match.end()
+            k = norm.find(needle, nt.to_norm(window_start), nt.to_norm(window_end))
+
+        if k >= 0:
+            if identity:
+                real_start, real_end = k, k + len(needle)
             else:
-                # Dernier recours : utiliser position approximative
-                real_start = current_start
-                real_end = current_start + len(segment)
+                real_start, real_end = nt.to_orig(k), nt.to_orig(k + len(needle))
+        else:
+            # Dernier recours : utiliser position approximative
+            real_start = current_start
+            real_end = current_start + len(segment)
 
         # Éviter chevauchement avec segment précédent
         if positions and real_start < positions[-1][1]:
@@ -67,21 +146,43 @@ def _find_cleaned_text_positions(original_text: str, cleaned_text: str, approx_s
     # print(f"[DEBUG _find_cleaned_text_positions] '{cleaned_text}' → {positions}")
     return positions
 
+# Particules de négation, compilées une fois (recherchées dans le texte du match)
+_NEG_TERMS = r"(pas|plus|jamais|rien|personne|guère|point|nul)"
+_BIPARTITE = re.compile(r"(?:\bne\b|n['’]).*?\b" + _NEG_TERMS + r"\b", re.IGNORECASE)
+_PART1 = re.compile(r"(?:\bne\b|n['’])", re.IGNORECASE)
+_PART2 = re.compile(r"\b" + _NEG_TERMS + r"\b", re.IGNORECASE)
+_N_APOSTROPHE = re.compile(r"^n['’]", re.IGNORECASE)
+# Ordre de priorité : la première particule présente dans le match l'emporte
+_SINGLE_NEG = [re.compile(p, re.IGNORECASE) for p in (
+    r"(?:\bne\b|n['’])",
+    r"\b(pas)\b",
+    r"\b(plus)\b",
+    r"\b(jamais)\b",
+    r"\b(rien)\b",
+    r"\b(personne)\b",
+    r"\b(guère)\b",
+    r"\b(point)\b",
+    r"\b(nul)\b",
+    r"\b(aucun|aucune)\b",
+    r"\b(sans)\b",
+    r"\b(ni)\b",
+    r"\b(non)\b",
+    r"\b(absence)\b",
+)]
+
 def _extract_negation_markers_only(text: str, match, rule: Dict[str, Any]) -> Tuple[str, int, int]:
     match_text = match.group(0)
     match_start = match.start()
     match_end = match.end()
-    bipartite_pattern = r"(?:\bne\b|n['’]).*?\b(pas|plus|jamais|rien|personne|guère|point|nul)\b"
-    bipartite_match = re.search(bipartite_pattern, match_text, re.IGNORECASE)
+    bipartite_match = _BIPARTITE.search(match_text)
     if bipartite_match:
-        part1_pattern = r"(?:\bne\b|n['’])"
-        part2_pattern = r"\b(pas|plus|jamais|rien|personne|guère|point|nul)\b"
-        part1_match = re.search(part1_pattern, match_text, re.IGNORECASE)
-        part2_match = re.search(part2_pattern, match_text, re.IGNORECASE)
+        part1_match = _PART1.search(match_text)
+        part2_match = _PART2.search(match_text)
         if part1_match and part2_match:
             part1_text = part1_match.group(0)
-            if re.match(r"^n['’]", part1_text, re.IGNORECASE):
-                part1_text = re.match(r"^n['’]", part1_text, re.IGNORECASE).group(0)
+            n_apostrophe = _N_APOSTROPHE.match(part1_text)
+            if n_apostrophe:
+                part1_text = n_apostrophe.group(0)
             part2_text = part2_match.group(0)
             cleaned_label = f"{part1_text} {part2_text}"
             p1_start = match_start + part1_match.start()
@@ -89,24 +190,8 @@ def _extract_negation_markers_only(text: str, match, rule: Dict[str, Any]) -> Tu
             p2_start = match_start + part2_match.start()
             p2_end = match_start + part2_match.end()
             return cleaned_label, p1_start, p2_end
-    single_neg_patterns = [
-        r"(?:\bne\b|n['’])",
-        r"\b(pas)\b",
-        r"\b(plus)\b",
-        r"\b(jamais)\b",
-        r"\b(rien)\b",
-        r"\b(personne)\b",
-        r"\b(guère)\b",
-        r"\b(point)\b",
-        r"\b(nul)\b",
-        r"\b(aucun|aucune)\b",
-        r"\b(sans)\b",
-        r"\b(ni)\b",
-        r"\b(non)\b",
-        r"\b(absence)\b",
-    ]
-    for pattern in single_neg_patterns:
-        single_match = re.search(pattern, match_text, re.IGNORECASE)
+    for pattern in _SINGLE_NEG:
+        single_match = pattern.search(match_text)
         if single_match:
             particle_text = single_match.group(0)
             particle_start = match_start + single_match.start()
@@ -120,4 +205,4 @@ SURFACE_PREP_MARKERS = {
     "malgré": {"id": "PREP_MALGRÉ", "group": "preposition", "cue_label": "malgré"},
 }
 
-__all__ = ["apply_marker_rule", "inject_surface_markers", "_guard_hits"]
+__all__ = ["apply_marker_rule", "inject_surface_markers", "_guard_hits", "build_guard_index", "guard_hits_indexed", "SentenceGuards"]
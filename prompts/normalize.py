@@ -0,0 +1,136 @@
+"""Texte normalisé d'une phrase, calculé une fois et partagé par les helpers de markers.
+
+NormalizedText(text) expose :
+  - `folded` : text.casefold(), pour le préfiltre par ancres et l'index des gardes ;
+  - `norm`   : NFC + apostrophes typographiques (’ ‘) ramenées à "'" + casse repliée, calculé
+               à la première demande (seules les phrases qui produisent des cues en ont besoin) ;
+  - `to_norm(i)` / `to_orig(k)` : correspondance des offsets original ↔ normalisé.
+
+Le repli de casse reproduit l'égalité de `re.IGNORECASE` caractère par caractère (minuscule
+simple, plus les équivalences supplémentaires du moteur : ı/i, ſ/s...) ; il ne change donc
+pas la longueur du texte. Seule la composition NFC peut le faire : si le texte est déjà NFC
+(cas courant), les offsets sont identiques et aucune table n'est construite.
+"""
+
+from __future__ import annotations
+import re
+import unicodedata
+from typing import List, Optional
+
+try:  # minuscule simple utilisée par le moteur `re`
+    from _sre import unicode_tolower as _tolower
+except ImportError:  # pragma: no cover
+    def _tolower(o: int) -> int:
+        lo = chr(o).lower()
+        return ord(lo) if len(lo) == 1 else o
+
+try:  # Python >= 3.11
+    from re._casefix import _EXTRA_CASES
+except ImportError:  # pragma: no cover - Python < 3.11
+    from sre_compile import _ignorecase_fixes as _EXTRA_CASES
+
+APOSTROPHES = {"’": "'", "‘": "'"}
+
+
+class _FoldTable(dict):
+    """Table str.translate remplie à la demande : un caractère → son représentant de casse."""
+
+    def __missing__(self, o: int) -> str:
+        lo = _tolower(o)
+        ch = chr(min((lo,) + tuple(_EXTRA_CASES.get(lo, ()))))
+        self[o] = ch
+        return ch
+
+
+_FOLD = _FoldTable({ord(k): v for k, v in APOSTROPHES.items()})
+
+# Caractères pour lesquels str.lower() diffère du repli de `re` : membres des classes
+# d'équivalence supplémentaires (ou leurs majuscules) dont le représentant n'est pas la
+# minuscule, et "İ" (minuscule sur deux caractères). "Σ" en fait partie, ce qui couvre aussi
+# le sigma final, dépendant du contexte dans str.lower().
+_special = {0x130, 0x3A3}
+for _lo, _others in _EXTRA_CASES.items():
+    for _o in (_lo,) + tuple(_others):
+        for _c in {chr(_o), chr(_o).upper()}:
+            if len(_c) == 1 and _c.translate(_FOLD) != _c.lower():
+                _special.add(ord(_c))
+_NEEDS_TABLE = re.compile("[" + "".join(re.escape(chr(o)) for o in sorted(_special)) + "]")
+del _special
+
+
+def fold(s: str) -> str:
+    """Apostrophes + casse, sans changer la longueur (voir le docstring du module)."""
+    if _NEEDS_TABLE.search(s) is None:  # cas courant : str.lower() donne le même résultat, en C
+        return s.lower().replace("’", "'").replace("‘", "'")
+    return s.translate(_FOLD)
+
+
+def normalize(s: str) -> str:
+    """Normalisation complète d'un fragment (NFC + fold), comparable à NormalizedText.norm."""
+    if not unicodedata.is_normalized("NFC", s):
+        s = unicodedata.normalize("NFC", s)
+    return fold(s)
+
+
+class NormalizedText:
+    __slots__ = ("text", "folded", "_norm", "_to_orig", "_to_norm")
+
+    def __init__(self, text: str, folded: Optional[str] = None):
+        self.text = text
+        self.folded = text.casefold() if folded is None else folded
+        self._norm: Optional[str] = None
+        self._to_orig: Optional[List[int]] = None  # None : offsets identiques
+        self._to_norm: Optional[List[int]] = None
+
+    @property
+    def norm(self) -> str:
+        if self._norm is None:
+            self._build()
+        return self._norm
+
+    def _build(self) -> None:
+        text = self.text
+        if unicodedata.is_normalized("NFC", text):
+            self._norm = fold(text)
+            return
+        # composition par grappe (caractère de base + marques combinantes) pour garder la trace des offsets
+        pieces: List[str] = []
+        to_orig: List[int] = []
+        to_norm = [0] * (len(text) + 1)
+        start = 0
+        for i in range(1, len(text) + 1):
+            if i < len(text) and unicodedata.combining(text[i]):
+                continue
+            composed = unicodedata.normalize("NFC", text[start:i])
+            k = len(to_orig)
+            to_norm[start] = k
+            for j in range(start + 1, i):  # offset interne à une grappe : arrondi à la grappe suivante
+                to_norm[j] = k + len(composed)
+            pieces.append(composed)
+            to_orig.extend([start] * len(composed))
+            start = i
+        to_norm[len(text)] = len(to_orig)
+        to_orig.append(len(text))
+        self._norm = fold("".join(pieces))
+        self._to_orig = to_orig
+        self._to_norm = to_norm
+
+    @property
+    def identity(self) -> bool:
+        """Vrai si les offsets normalisés sont ceux du texte original (texte déjà NFC)."""
+        if self._norm is None:
+            self._build()
+        return self._to_orig is None
+
+    def to_norm(self, i: int) -> int:
+        if self._norm is None:
+            self._build()
+        return i if self._to_norm is None else self._to_norm[min(i, len(self.text))]
+
+    def to_orig(self, k: int) -> int:
+        if self._norm is None:
+            self._build()
+        return k if self._to_orig is None else self._to_orig[min(k, len(self._to_orig) - 1)]
+
+
+__all__ = ["NormalizedText", "normalize", "fold", "APOSTROPHES"]
@@ -0,0 +1,118 @@
+"""Profil par règle : temps passé et statistiques de déclenchement.
+
+Un RuleProfile est passé (optionnellement) à annotate_sentence / apply_marker_rule :
+sans profil, aucun chronométrage n'est fait. Pour chaque id de règle, on cumule :
+
+    evaluated     phrases où le finditer de la règle a été exécuté
+    prefiltered   phrases écartées par le préfiltre d'ancres (finditer évité)
+    matches       correspondances du motif
+    dedup_drops   correspondances rejetées par la déduplication (seen_intervals)
+    guard_rejects correspondances rejetées par une garde négative
+    cues          cues produites
+    timeouts      phrases ignorées parce que la règle a dépassé le budget regex
+    regex_s       temps dans finditer
+    guard_s       temps dans les gardes négatives
+    extract_s     temps dans _extract_negation_markers_only
+    positions_s   temps dans _find_cleaned_text_positions
+    worst_s       pire temps finditer sur une phrase (et worst_sid) : repère les retours
+                  arrière catastrophiques
+
+Les profils des workers sont fusionnés avec merge().
+"""
+
+from __future__ import annotations
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+_COUNTS = ("evaluated", "prefiltered", "matches", "dedup_drops", "guard_rejects", "cues", "timeouts")
+_TIMES = ("regex_s", "guard_s", "extract_s", "positions_s")
+
+
+def _new_stats(group: str) -> Dict[str, Any]:
+    st: Dict[str, Any] = {"group": group}
+    st.update((k, 0) for k in _COUNTS)
+    st.update((k, 0.0) for k in _TIMES)
+    st["worst_s"] = 0.0
+    st["worst_sid"] = None
+    return st
+
+
+def total_time(st: Dict[str, Any]) -> float:
+    return sum(st[k] for k in _TIMES)
+
+
+class RuleProfile:
+    """Statistiques cumulées par id de règle."""
+
+    def __init__(self):
+        self.rules: Dict[str, Dict[str, Any]] = {}
+        self.sentences = 0
+        self.sid = None  # phrase en cours (renseignée par annotate_sentence)
+
+    def rule(self, rule: Dict[str, Any]) -> Dict[str, Any]:
+        rid = rule.get("id", "UNK_RULE")
+        st = self.rules.get(rid)
+        if st is None:
+            st = self.rules[rid] = _new_stats(rule.get("group", "unknown"))
+        return st
+
+    def record_regex(self, st: Dict[str, Any], elapsed: float) -> None:
+        st["evaluated"] += 1
+        st["regex_s"] += elapsed
+        if elapsed > st["worst_s"]:
+            st["worst_s"] = elapsed
+            st["worst_sid"] = self.sid
+
+    def merge(self, other) -> None:
+        """Ajoute un autre profil (RuleProfile ou sa forme to_dict(), p. ex. venue d'un worker)."""
+        data = other.to_dict() if isinstance(other, RuleProfile) else other
+        self.sentences += data.get("sentences", 0)
+        for rid, ost in data.get("rules", {}).items():
+            st = self.rules.get(rid)
+            if st is None:
+                self.rules[rid] = dict(ost)
+                continue
+            for k in _COUNTS + _TIMES:
+                st[k] += ost[k]
+            if ost["worst_s"] > st["worst_s"]:
+                st["worst_s"], st["worst_sid"] = ost["worst_s"], ost["worst_sid"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"sentences": self.sentences, "rules": self.rules}
+
+    def reset(self) -> None:
+        self.rules = {}
+        self.sentences = 0
+
+    def format_table(self, sort_by: str = "total") -> str:
+        """Tableau texte trié (par défaut : temps total décroissant)."""
+        def key(item):
+            st = item[1]
+            return total_time(st) if sort_by == "total" else st[sort_by]
+        header = (f"{'règle':<32} {'groupe':<16} {'éval.':>7} {'préf.':>7} {'matches':>7} {'dedup':>6} "
+                  f"{'garde':>6} {'cues':>6} {'timeout':>7} {'regex ms':>9} {'garde ms':>9} {'extr. ms':>9} {'pos. ms':>9} "
+                  f"{'total ms':>9} {'pire ms':>8} {'pire sid':>8}")
+        lines = [header, "-" * len(header)]
+        for rid, st in sorted(self.rules.items(), key=key, reverse=True):
+            lines.append(
+                f"{rid[:32]:<32} {str(st['group'])[:16]:<16} {st['evaluated']:>7} {st['prefiltered']:>7} "
+                f"{st['matches']:>7} {st['dedup_drops']:>6} {st['guard_rejects']:>6} {st['cues']:>6} {st['timeouts']:>7} "
+                f"{st['regex_s'] * 1e3:>9.2f} {st['guard_s'] * 1e3:>9.2f} {st['extract_s'] * 1e3:>9.2f} "
+                f"{st['positions_s'] * 1e3:>9.2f} {total_time(st) * 1e3:>9.2f} {st['worst_s'] * 1e3:>8.2f} "
+                f"{str(st['worst_sid']):>8}"
+            )
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path, sort_by: str = "total") -> Optional[Path]:
+        """Écrit le rapport JSON dans `path` et le tableau dans `path` suffixé .txt ; retourne ce dernier."""
+        path = Path(path)
+        path.write_text(json.dumps(self.to_dict(), ensure_ascii=False, indent=2), encoding="utf-8")
+        table_path = path.with_suffix(".txt")
+        if table_path == path:
+            table_path = path.with_name(path.name + ".table.txt")
+        table_path.write_text(self.format_table(sort_by), encoding="utf-8")
+        return table_path
+
+
+__all__ = ["RuleProfile", "total_time"]
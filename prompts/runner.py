@@ -7,13 +7,30 @@ from __future__ import annotations
 import argparse
 import json
 import logging
+import os
+import time
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from .detector import load_markers, annotate_sentence
+from .detector import load_markers
+from .annotator import annotate_record, annotate_document_record
+from .scopes import load_strategies
+from .debug_print import JsonTraceFormatter, enable_tracing
+from .profiling import RuleProfile
+from .budget import TimeBudget
+from .cue_cache import CueCache
+from .incremental import IncrementalPlan, plan_update, read_sidecar, rules_snapshot, sidecar_path, write_sidecar
 
 
 def make_logger(level: str = "INFO") -> logging.Logger:
-    logging.basicConfig(level=getattr(logging, level.upper(), logging.INFO))
+    lvl = getattr(logging, level.upper(), logging.INFO)
+    logging.basicConfig(level=lvl)
+    for h in logging.getLogger().handlers:
+        h.setLevel(lvl)  # la console garde le niveau --log même si --trace abaisse celui des loggers "prompts"
     return logging.getLogger("prompts.runner")
 
 # def normalize_text_for_regex(text: str) -> str:
@@ -22,36 +39,289 @@ def make_logger(level: str = "INFO") -> logging.Logger:
 #     text = text.lower()                 # minuscule pour faciliter les regex
 #     text = unicodedata.normalize('NFC', text)  # Unicode standard
 #     return text
-    
+
+
+def _iter_sentences(fin: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    """Numérote les lignes non vides (sid à partir de 1), comme la boucle série."""
+    sid = 0
+    for line in fin:
+        text = line.strip()
+        if not text:
+            continue
+        sid += 1
+        yield sid, text
+
+
+def _iter_chunks(items: Iterator[Tuple[int, str]], size: int) -> Iterator[List[Tuple[int, str]]]:
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _annotate_minimal(text: str, sid: int, markers_by_group, segment: bool = False, strategies_by_group=None,
+                      profile=None, budget=None, cache=None) -> Dict[str, Any]:
+    # normalized_text = normalize_text_for_regex(text)
+    # obj = annotate_sentence(text, sid, markers_by_group, strategies_by_id, order_by_group)
+    if segment:  # ligne = document : découpage en phrases, offsets ramenés à la ligne
+        return annotate_document_record(text, sid, markers_by_group, strategies_by_group, profile, budget, cache)
+    return annotate_record(text, sid, markers_by_group, strategies_by_group, profile, budget, cache)
+
+
+def _annotate_line(text: str, sid: int, markers_by_group, segment: bool = False, strategies_by_group=None, profile=None,
+                   budget=None, cache=None) -> str:
+    minimal = _annotate_minimal(text, sid, markers_by_group, segment, strategies_by_group, profile, budget, cache)
+    return json.dumps(minimal, ensure_ascii=False) + "\n"
+
+
+def _annotate_item(item: Tuple, w: Dict[str, Any]):
+    """Ligne JSONL d'une phrase (sid, text) ou, en mode incrémental, (sid, text, ancienne ligne);
+    en sortie colonne, l'enregistrement lui-même (écrit par columnar.ColumnarWriter)."""
+    sid, text = item[0], item[1]
+    plan = w["incremental"]
+    if plan is not None:
+        line = plan.reuse(sid, text, item[2])
+        if line is not None:
+            return line
+    annotate = _annotate_minimal if w["columnar"] else _annotate_line
+    return annotate(text, sid, w["markers"], w["segment"], w["strategies"], w["profile"], w["budget"], w["cache"])
+
+
+def _load_pipeline(rules_dir: Path, use_cache: bool, segment: bool, scopes: bool, profile: bool = False,
+                   rule_timeout: Optional[float] = None, sentence_timeout: Optional[float] = None,
+                   cue_cache: int = 0, cue_cache_db: Optional[str] = None, incremental: Optional[IncrementalPlan] = None,
+                   markers_by_group=None, columnar: bool = False) -> Dict[str, Any]:
+    if markers_by_group is None:
+        markers_by_group = load_markers(rules_dir, use_cache=use_cache)
+    cache = None
+    if cue_cache > 0 or cue_cache_db:
+        cache = CueCache(markers_by_group, maxsize=cue_cache, path=Path(cue_cache_db) if cue_cache_db else None)
+    return {
+        "markers": markers_by_group,
+        "strategies": load_strategies(rules_dir) if scopes else None,
+        "segment": segment,
+        "profile": RuleProfile() if profile else None,
+        "budget": TimeBudget(rule_timeout, sentence_timeout),
+        "cache": cache,
+        "incremental": incremental,
+        "columnar": columnar,
+    }
+
+
+def _counters(w: Dict[str, Any]) -> Optional[Dict[str, int]]:
+    """Compteurs du cache de cues et du mode incrémental depuis le dernier appel (remis à zéro)."""
+    out: Dict[str, int] = {}
+    for key in ("cache", "incremental"):
+        obj = w[key]
+        if obj is not None:
+            out.update((k, v) for k, v in obj.stats().items() if k != "size")
+            obj.reset_stats()
+    return out or None
+
+
+# État propre à chaque processus worker : les règles sont chargées une seule fois par process.
+_WORKER: Dict[str, Any] = {}
+
+
+def _enable_trace_file(path: str) -> None:
+    """Écrit les traces (niveau TRACE, une ligne JSON par événement) dans `path`."""
+    handler = logging.FileHandler(path, mode="w", encoding="utf-8")
+    handler.setFormatter(JsonTraceFormatter())
+    enable_tracing(handler)
+
+
+def _init_worker(rules_dir: str, use_cache: bool, segment: bool, scopes: bool, trace_path: str = None,
+                 profile: bool = False, rule_timeout: Optional[float] = None, sentence_timeout: Optional[float] = None,
+                 cue_cache: int = 0, cue_cache_db: Optional[str] = None, incremental: Optional[IncrementalPlan] = None,
+                 columnar: bool = False) -> None:
+    if trace_path:
+        _enable_trace_file(f"{trace_path}.{os.getpid()}")  # un fichier par worker : pas d'écritures entrelacées
+    _WORKER.update(_load_pipeline(Path(rules_dir), use_cache, segment, scopes, profile, rule_timeout, sentence_timeout,
+                                  cue_cache, cue_cache_db, incremental, columnar=columnar))
+
+
+def _annotate_chunk(chunk: List[Tuple]) -> Tuple[List[Any], Optional[Dict[str, Any]], Optional[Dict[str, int]]]:
+    """Retourne les lignes JSONL (ou enregistrements, en sortie colonne) du chunk et, le cas échéant, les statistiques du chunk (profil,
+    compteurs du cache de cues et du mode incrémental) à fusionner dans le processus parent."""
+    w = _WORKER
+    profile = w["profile"]
+    lines = [_annotate_item(item, w) for item in chunk]
+    stats = None
+    if profile is not None:
+        stats = profile.to_dict()
+        profile.reset()
+    if w["cache"] is not None:
+        w["cache"].flush()  # les workers sont arrêtés sans atexit : on valide les écritures SQLite à chaque chunk
+    return lines, stats, _counters(w)
+
+
+class _Throughput:
+    """Compteur phrases/s, journalisé au plus toutes les `every` secondes."""
+
+    def __init__(self, log: logging.Logger, every: float = 10.0):
+        self.log = log
+        self.every = every
+        self.count = 0
+        self.t0 = time.perf_counter()
+        self._last = self.t0
+
+    def add(self, n: int) -> None:
+        self.count += n
+        now = time.perf_counter()
+        if now - self._last >= self.every:
+            self._last = now
+            self.log.info("%d phrases (%.0f phrases/s)", self.count, self.rate())
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.t0
+
+    def rate(self) -> float:
+        elapsed = self.elapsed()
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+
+def _with_previous(items: Iterator[Tuple[int, str]], fprev) -> Iterator[Tuple[int, str, Optional[str]]]:
+    """Associe à chaque phrase la ligne de même rang de la sortie précédente (None au-delà)."""
+    for sid, text in items:
+        yield sid, text, fprev.readline() or None
+
+
+def _run_serial(items: Iterator[Tuple], fout, pipeline: Dict[str, Any], meter: _Throughput) -> None:
+    for item in items:
+        fout.write(_annotate_item(item, pipeline))
+        meter.add(1)
+
+
+def _write_chunk(fout, result: Tuple[List[Any], Optional[Dict[str, Any]], Optional[Dict[str, int]]], meter: _Throughput,
+                 profile: Optional[RuleProfile], totals: Optional[Dict[str, int]] = None) -> None:
+    lines, stats, counters = result
+    fout.writelines(lines)
+    meter.add(len(lines))
+    if stats is not None and profile is not None:
+        profile.merge(stats)
+    if counters is not None and totals is not None:
+        for k, v in counters.items():
+            totals[k] = totals.get(k, 0) + v
+
+
+def _run_parallel(items: Iterator[Tuple], fout, init_args: Tuple, workers: int, chunk_size: int, meter: _Throughput,
+                  profile: Optional[RuleProfile] = None, totals: Optional[Dict[str, int]] = None) -> None:
+    # Fenêtre glissante de chunks en vol : l'entrée est lue au fil de l'eau (mémoire bornée)
+    # et les résultats sont écrits dans l'ordre de soumission, donc dans l'ordre d'entrée.
+    max_pending = workers * 4
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+        pending = deque()
+        for chunk in _iter_chunks(items, chunk_size):
+            pending.append(pool.submit(_annotate_chunk, chunk))
+            if len(pending) >= max_pending:
+                _write_chunk(fout, pending.popleft().result(), meter, profile, totals)
+        while pending:
+            _write_chunk(fout, pending.popleft().result(), meter, profile, totals)
+
+
+def _open_output(path: Path, fmt: str):
+    """Fichier JSONL, ou columnar.ColumnarWriter (même usage : write / writelines, `with`)."""
+    if fmt == "jsonl":
+        return open(path, "w", encoding="utf-8")
+    from .columnar import ColumnarWriter  # NumPy (et pyarrow) ne sont requis que pour ce format
+    return ColumnarWriter(path, fmt)
+
+
 def main() -> None:
     ap = argparse.ArgumentParser(description="Runner permissif v3 (no-NLP, pipeline renforcé)")
     ap.add_argument("--rules", required=True, help="Chemin dossier rules/")
     ap.add_argument("--input", required=True, help="Fichier texte (1 phrase/ligne)")
-    ap.add_argument("--output", required=True, help="Sortie JSONL")
+    ap.add_argument("--output", required=True, help="Sortie JSONL (ou colonne, voir --output-format)")
+    ap.add_argument("--output-format", choices=("jsonl", "columnar", "parquet", "npz"), default="jsonl",
+                    help="columnar = parquet si pyarrow est installé, sinon npz (voir prompts.columnar)")
+    ap.add_argument("--workers", type=int, default=1, help="Nombre de processus d'annotation (1 = série)")
+    ap.add_argument("--chunk-size", type=int, default=256, help="Phrases envoyées par lot à chaque worker")
+    ap.add_argument("--segment", action="store_true", help="Chaque ligne est un document, découpé en phrases avant annotation")
+    ap.add_argument("--scopes", action="store_true", help="Ajoute les portées (étape 2, rules/20_scopes)")
+    ap.add_argument("--no-rule-cache", action="store_true", help="Désactive le cache disque des règles compilées")
+    ap.add_argument("--trace", metavar="FICHIER", help="Traces par règle (sentence, match, dedup_drop, guard_reject, cue) en JSONL; suffixé par le pid avec --workers")
+    ap.add_argument("--profile", metavar="FICHIER", help="Profil par règle (temps regex/gardes/extraction, matches, rejets) en JSON, et tableau trié en .txt")
+    ap.add_argument("--rule-timeout", type=float, default=0.0, help="Budget regex par règle et par phrase, en secondes (0 = illimité, défaut; options.timeout d'une règle prime)")
+    ap.add_argument("--sentence-timeout", type=float, default=0.0, help="Budget regex total par phrase, en secondes (0 = illimité, défaut); au-delà la phrase est ignorée")
+    ap.add_argument("--cue-cache", type=int, default=50_000, help="Taille du cache mémoire des cues par texte de phrase (0 = désactivé; ignoré avec --profile et --trace); par worker")
+    ap.add_argument("--cue-cache-db", metavar="FICHIER", help="Cache de cues persistant (SQLite), partagé entre exécutions et workers")
+    ap.add_argument("--incremental", action="store_true", help="Ne réannote que les phrases touchées par les règles modifiées depuis la sortie précédente (état dans <sortie>.rules.json)")
     ap.add_argument("--log", default="INFO")
     args = ap.parse_args()
+    columnar = args.output_format != "jsonl"
+    if columnar and (args.incremental or args.scopes):
+        ap.error("--output-format colonne : incompatible avec --incremental et --scopes")
+    if args.output_format == "parquet":
+        from .columnar import default_format
+        if default_format() != "parquet":
+            ap.error("--output-format parquet : pyarrow n'est pas installé (utiliser npz ou columnar)")
 
     log = make_logger(args.log)
+    if (args.profile or args.trace) and (args.cue_cache > 0 or args.cue_cache_db):
+        # une phrase servie par le cache n'est pas évaluée : le profil et les traces ne couvriraient que les phrases distinctes
+        log.info("%s : cache de cues désactivé", "--profile" if args.profile else "--trace")
+        args.cue_cache, args.cue_cache_db = 0, None
+    if args.trace and args.workers <= 1:
+        _enable_trace_file(args.trace)
 
     rules_dir = Path(args.rules)
-    markers_by_group = load_markers(rules_dir)
-
-    sid = 0
-    with open(args.input, "r", encoding="utf-8") as fin, open(args.output, "w", encoding="utf-8") as fout:
-        for line in fin:
-            text = line.strip()
-            if not text:
-                continue
-            sid += 1
-            seen_intervals = []  # ← réinitialisation ici
-            # normalized_text = normalize_text_for_regex(text)
-            # obj = annotate_sentence(text, sid, markers_by_group, strategies_by_id, order_by_group)
-            obj = annotate_sentence(text, sid, markers_by_group, seen_intervals)
-            minimal = {"id": obj.get("id"), "text": obj.get("text"), "cues": obj.get("cues", [])}
-            # cue_ids = [c["id"] for c in minimal["cues"]]
-            # print(f"Sentence {sid} cue IDs: {cue_ids}")
-            fout.write(json.dumps(minimal, ensure_ascii=False) + "\n")
-    log.info("Terminé: %d phrases → %s", sid, args.output)
+    use_cache = not args.no_rule_cache
+    # construit aussi le cache de règles une fois avant le démarrage des workers
+    markers_by_group = load_markers(rules_dir, use_cache=use_cache)
+    output = Path(args.output)
+    plan = None
+    incremental = args.incremental
+    if incremental and output.exists() and not output.is_file():  # /dev/stdout, tube... : ni relecture ni état
+        log.warning("Mode incrémental ignoré : %s n'est pas un fichier ordinaire", output)
+        incremental = False
+    if incremental:
+        previous = read_sidecar(sidecar_path(output)) if output.exists() else None
+        plan, reason = plan_update(previous, markers_by_group, rules_dir, args.segment, args.scopes,
+                                   TimeBudget(args.rule_timeout, args.sentence_timeout))
+        if plan is None:
+            log.info("Mode incrémental : réannotation complète (%s)", reason)
+    # en incrémental, l'ancienne sortie est relue pendant l'écriture de la nouvelle, remplacée à la fin
+    write_path = output.with_name(output.name + ".tmp") if plan is not None else output
+    meter = _Throughput(log)
+    profiling = bool(args.profile)
+    with open(args.input, "r", encoding="utf-8") as fin, _open_output(write_path, args.output_format) as fout, \
+            (open(output, "r", encoding="utf-8") if plan is not None else nullcontext()) as fprev:
+        items = _iter_sentences(fin)
+        if plan is not None:
+            items = _with_previous(items, fprev)
+        if args.workers > 1:
+            init_args = (str(rules_dir), use_cache, args.segment, args.scopes, args.trace, profiling,
+                         args.rule_timeout, args.sentence_timeout, args.cue_cache, args.cue_cache_db, plan, columnar)
+            profile = RuleProfile() if profiling else None
+            totals: Dict[str, int] = {}
+            _run_parallel(items, fout, init_args, args.workers, max(1, args.chunk_size), meter, profile, totals)
+        else:
+            pipeline = _load_pipeline(rules_dir, use_cache, args.segment, args.scopes, profiling, args.rule_timeout,
+                                      args.sentence_timeout, args.cue_cache, args.cue_cache_db, plan, markers_by_group,
+                                      columnar)
+            profile = pipeline["profile"]
+            _run_serial(items, fout, pipeline, meter)
+            totals = _counters(pipeline) or {}
+            if pipeline["cache"] is not None:
+                pipeline["cache"].close()
+    if plan is not None:
+        os.replace(write_path, output)
+    if incremental:  # état relu par le prochain passage --incremental
+        write_sidecar(sidecar_path(output), rules_snapshot(markers_by_group, rules_dir, args.segment, args.scopes))
+    elif output.is_file():  # la sortie vient d'être réécrite : un état précédent ne la décrit plus
+        sidecar_path(output).unlink(missing_ok=True)
+    log.info("Terminé: %d phrases → %s (%.2fs, %.0f phrases/s)", meter.count, args.output, meter.elapsed(), meter.rate())
+    if "hits" in totals:
+        hits, total = totals["hits"], totals["hits"] + totals["misses"]
+        log.info("Cache de cues : %d/%d phrases (%.1f%%), dont %d depuis le disque",
+                 hits, total, 100.0 * hits / total if total else 0.0, totals["disk_hits"])
+    if "reused" in totals:
+        log.info("Mode incrémental : %d phrases reprises de la sortie précédente, %d réannotées",
+                 totals["reused"], totals["rerun"])
+    if profile is not None:
+        table_path = profile.write(Path(args.profile))
+        log.info("Profil par règle → %s (tableau: %s)", args.profile, table_path)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,312 @@
+"""Étape 2 : résolution des portées à partir des règles `rules/20_scopes`.
+
+Les stratégies sont indexées par `when_group` au chargement; chaque phrase est
+tokenisée une seule fois, et chaque cue est résolu par bisect sur les offsets des
+tokens puis par une fenêtre bornée (`max_token_gap` / `window_tokens`) : le coût reste
+linéaire en la taille de la phrase.
+
+Le pipeline étant sans NLP, les stratégies sont exécutées en surface :
+  - SKIP_IF_PATTERN / SKIP_IF_LEXICALIZED : le cue ne reçoit pas de portée;
+  - SUBJECT_VERB_OBJECT : du début du sujet (tokens à gauche du cue, jusqu'à une
+    ponctuation) jusqu'à la fin de la fenêtre droite;
+  - les autres stratégies de portée (…_SMART, DE_GN_COMPLET, NI_SIMPLE_SPLIT, …) :
+    fenêtre droite après le cue, arrêtée sur `stop_punct` ou sur le cue suivant, sans
+    "de/d’" initial si `strip_leading_de`/`de_strip`.
+Les stratégies qui exigent une analyse en dépendances (GOVERNOR_SUPPORT_AUTO,
+RESOLVE_COOCURRENCE, SKIP_IF_NOT_ASSERTIVE) sont chargées mais ignorées; la stratégie
+suivante du groupe est essayée. Un cue reçoit au plus une portée : celle de la première
+stratégie applicable (ordre : priorité, puis ordre des fichiers).
+"""
+
+from __future__ import annotations
+import logging
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import regex as reg
+import yaml
+
+from .types import Token, Strategy
+from .loaders import _iter_yaml_files
+
+log = logging.getLogger("prompts.scopes")
+
+SKIP_STRATEGIES = {"SKIP_IF_PATTERN", "SKIP_IF_LEXICALIZED"}
+LEFT_RIGHT_STRATEGIES = {"SUBJECT_VERB_OBJECT"}
+RIGHT_STRATEGIES = {
+    "WINDOW_RIGHT_SMART", "DET_NEG_GN_SMART", "LEXICAL_SMART", "DIAGNOSTIC_DE_COMPLET_SMART",
+    "LOCUTION_DE_SMART", "DE_GN_COMPLET", "SANS_SMART_SUPPORT_PLUS_TARGET",
+    "SANS_SIMPLE_SUPPORT_PLUS_GN", "NI_COORD_SMART", "NI_SIMPLE_SPLIT",
+}
+_PRIORITY_RANK = {"very_high": 0, "high": 1, "normal": 2, "low": 3}
+
+DEFAULT_WINDOW_TOKENS = 8
+DEFAULT_STOP_PUNCT = (".", ";", ":")
+_LEADING_DE = {"de", "d'", "d’", "des", "du"}
+_LEFT_STOP = {",", "(", ")", "«", "»"}
+
+_TOKEN_RE = reg.compile(r"\w+(?:-\w+)*['’]?|[^\w\s]")
+
+
+def tokenize(text: str) -> List[Token]:
+    """Tokens surface : mots (élision "n'"/"l’" rattachée à gauche) et ponctuations."""
+    return [{"text": m.group(0), "start": m.start(), "end": m.end()} for m in _TOKEN_RE.finditer(text)]
+
+
+def _load_lexicons(rules_dir: Path) -> Dict[str, List[str]]:
+    lexicons: Dict[str, List[str]] = {}
+    for f in _iter_yaml_files(rules_dir / "ressources"):
+        data = yaml.safe_load(f.read_text(encoding="utf-8"))
+        if isinstance(data, dict):
+            lexicons.update({k: v for k, v in data.items() if isinstance(v, list)})
+    return lexicons
+
+
+def _as_pattern_list(value) -> List[str]:
+    """`lexicalized_patterns` est une liste YAML, ou un bloc texte de lignes `- "motif"`."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        items = []
+        for line in value.splitlines():
+            line = line.strip()
+            if line.startswith("-"):
+                line = line[1:].strip()
+            line = line.strip("\"'")
+            if line:
+                items.append(line)
+        return items
+    return [str(v) for v in value]
+
+
+def _compile_strategy(st: Dict[str, Any], lexicons: Dict[str, List[str]]) -> None:
+    opts = st.get("options") or {}
+    kind = st.get("scope_strategy")
+    if kind == "SKIP_IF_PATTERN" and opts.get("pattern"):
+        flags = reg.IGNORECASE if opts.get("case_insensitive") else 0
+        st["_pattern"] = reg.compile(opts["pattern"], flags)
+    elif kind == "SKIP_IF_LEXICALIZED":
+        pats = _as_pattern_list(opts.get("lexicalized_patterns") or st.get("lexicalized_patterns"))
+        for name in (opts.get("external_lexicons") or st.get("external_lexicons") or []):
+            pats.extend(reg.escape(str(x)) for x in lexicons.get(name, []))
+        st["_lexicalized"] = [reg.compile(p, reg.IGNORECASE) for p in pats]
+    if opts.get("labels_filter"):
+        st["_labels_filter"] = frozenset(str(x).lower() for x in opts["labels_filter"])
+    guards = st.get("guards") or {}
+    deny = guards.get("deny_if_surface") if isinstance(guards, dict) else None
+    if deny:
+        st["_deny_surface"] = [reg.compile(d["pattern"] if isinstance(d, dict) else d, reg.IGNORECASE) for d in deny]
+    deny_group = guards.get("deny_if_group_present") if isinstance(guards, dict) else None
+    if deny_group:
+        st["_deny_labels"] = frozenset(str(x).lower() for x in deny_group.get("labels") or [])
+
+
+def load_strategies(rules_dir: Path) -> Dict[str, List[Strategy]]:
+    """Charge `rules_dir/20_scopes/*.yaml` et indexe les stratégies par `when_group`.
+
+    Les entrées sans `scope_strategy` (contrôles QC) ou sans `when_group` sont ignorées.
+    Dans chaque groupe, les stratégies sont triées par `priority` (stable : l'ordre des
+    fichiers départage).
+    """
+    lexicons = _load_lexicons(rules_dir)
+    by_group: Dict[str, List[Strategy]] = {}
+    for f in _iter_yaml_files(rules_dir / "20_scopes"):
+        items = yaml.safe_load(f.read_text(encoding="utf-8"))
+        if isinstance(items, dict):  # format { rules: [...] }
+            items = items.get("rules")
+        if not isinstance(items, list):
+            continue
+        for st in items:
+            if not st.get("scope_strategy") or not st.get("when_group"):
+                continue
+            st["_file"] = str(f)
+            _compile_strategy(st, lexicons)
+            by_group.setdefault(st["when_group"], []).append(st)
+    for strategies in by_group.values():
+        strategies.sort(key=lambda s: _PRIORITY_RANK.get(s.get("priority", "normal"), 2))
+    return by_group
+
+
+class _Sentence:
+    """Tokens d'une phrase et tableau des débuts pour les recherches par bisect."""
+
+    __slots__ = ("text", "tokens", "starts", "lowered")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.starts = [t["start"] for t in self.tokens]
+        self.lowered = [t["text"].lower() for t in self.tokens]
+
+
+class _CueIndex:
+    """Bornes des cues d'une phrase par groupe et par label, triées une fois par phrase.
+
+    Le nombre de cues qui chevauchent [a, b) est #(début < b) - #(fin <= a) : deux bisect.
+    """
+
+    __slots__ = ("_by_group",)
+
+    def __init__(self, cues: List[Dict[str, Any]], bounds: List[Tuple[int, int]]):
+        by_group: Dict[Any, Dict[Optional[str], Tuple[List[int], List[int]]]] = {}
+        for cue, (lo, hi) in zip(cues, bounds):
+            labels = by_group.setdefault(cue.get("group"), {})
+            for key in (None, _cue_label(cue)):  # None : tous les labels du groupe
+                starts, ends = labels.setdefault(key, ([], []))
+                starts.append(lo)
+                ends.append(hi)
+        for labels in by_group.values():
+            for starts, ends in labels.values():
+                starts.sort()
+                ends.sort()
+        self._by_group = by_group
+
+    def overlapping(self, group, labels, a: int, b: int) -> int:
+        """Nombre de cues de `group` (restreints à `labels` s'il est non vide) qui chevauchent [a, b)."""
+        by_label = self._by_group.get(group)
+        if not by_label:
+            return 0
+        n = 0
+        for key in (labels or (None,)):
+            bounds = by_label.get(key)
+            if bounds:
+                n += bisect_left(bounds[0], b) - bisect_right(bounds[1], a)
+        return n
+
+
+def _cue_label(cue: Dict[str, Any]) -> str:
+    return str(cue.get("cue_label", "")).lower()
+
+
+def _cue_bounds(cue: Dict[str, Any]) -> Tuple[int, int]:
+    positions = cue.get("positions") or [(cue.get("start", 0), cue.get("end", 0))]
+    return min(a for a, _ in positions), max(b for _, b in positions)
+
+
+def _window(sent: _Sentence, lo: int, hi: int, n_tokens: int) -> Tuple[int, int]:
+    """Intervalle de caractères couvrant `n_tokens` tokens de part et d'autre du cue."""
+    tokens = sent.tokens
+    if not tokens:
+        return lo, hi
+    i = bisect_left(sent.starts, lo)
+    j = bisect_left(sent.starts, hi)
+    a = tokens[max(0, i - n_tokens)]["start"]
+    b = tokens[max(0, min(len(tokens), j + n_tokens) - 1)]["end"]
+    return min(a, lo), max(b, hi)
+
+
+def _right_span(sent: _Sentence, hi: int, opts: Dict[str, Any], limit: int) -> Optional[Tuple[int, int]]:
+    """Fenêtre droite après le cue, arrêtée sur `stop_punct` ou au début du cue suivant (`limit`)."""
+    n = int(opts.get("max_token_gap") or opts.get("window_tokens") or DEFAULT_WINDOW_TOKENS)
+    stop = set(opts.get("stop_punct") or DEFAULT_STOP_PUNCT)
+    j = bisect_left(sent.starts, hi)
+    if opts.get("strip_leading_de") or opts.get("de_strip"):
+        while j < len(sent.tokens) and sent.lowered[j] in _LEADING_DE:
+            j += 1
+    last = None
+    for k in range(j, min(len(sent.tokens), j + n)):
+        tok = sent.tokens[k]["text"]
+        if tok in stop or sent.tokens[k]["start"] >= limit:
+            break
+        if tok[0].isalnum() or tok[0] == "_":  # la portée ne se termine pas sur une ponctuation
+            last = k
+    if last is None:
+        return None
+    return sent.tokens[j]["start"], sent.tokens[last]["end"]
+
+
+def _left_start(sent: _Sentence, lo: int, opts: Dict[str, Any]) -> int:
+    n = int(opts.get("max_token_gap") or DEFAULT_WINDOW_TOKENS)
+    stop = set(opts.get("stop_punct") or DEFAULT_STOP_PUNCT) | _LEFT_STOP
+    i = bisect_left(sent.starts, lo)
+    start = lo
+    for k in range(i - 1, max(-1, i - 1 - n), -1):
+        if sent.tokens[k]["text"] in stop:
+            break
+        start = sent.tokens[k]["start"]
+    return start
+
+
+def _skip_hits(st: Strategy, sent: _Sentence, lo: int, hi: int) -> bool:
+    opts = st.get("options") or {}
+    a, b = _window(sent, lo, hi, int(opts.get("max_token_gap") or DEFAULT_WINDOW_TOKENS))
+    pat = st.get("_pattern")
+    if pat is not None:  # le motif doit toucher le cue ("ne … que")
+        return any(m.start() < hi and m.end() > lo for m in pat.finditer(sent.text, a, b))
+    for lex in st.get("_lexicalized") or []:  # le cue doit être inclus dans l'expression figée
+        if any(m.start() <= lo and m.end() >= hi for m in lex.finditer(sent.text, a, b)):
+            return True
+    return False
+
+
+def _denied(st: Strategy, sent: _Sentence, lo: int, hi: int, cue: Dict[str, Any], cue_index: _CueIndex) -> bool:
+    guards = st.get("guards") or {}
+    if not isinstance(guards, dict):
+        return False
+    deny = guards.get("deny_if_group_present")
+    if deny:
+        n = int(deny.get("window_tokens") or DEFAULT_WINDOW_TOKENS)
+        a, b = _window(sent, lo, hi, n)
+        labels = st.get("_deny_labels")
+        if labels is None:  # stratégie non passée par _compile_strategy
+            labels = frozenset(str(x).lower() for x in deny.get("labels") or [])
+        group = deny.get("group")
+        hits = cue_index.overlapping(group, labels, a, b)
+        if hits and cue.get("group") == group and (not labels or _cue_label(cue) in labels) and lo < b and hi > a:
+            hits -= 1  # le cue lui-même
+        if hits:
+            return True
+    surface = st.get("_deny_surface")
+    if surface:
+        a, b = _window(sent, lo, hi, DEFAULT_WINDOW_TOKENS)
+        return any(p.search(sent.text, a, b) for p in surface)
+    return False
+
+
+def resolve_scopes(text: str, cues: List[Dict[str, Any]], strategies_by_group: Dict[str, List[Strategy]]) -> List[Dict[str, Any]]:
+    """Calcule les portées des `cues` d'une phrase (au plus une par cue).
+
+    Chaque portée : {"id": id de stratégie, "cue_index": indice du cue dans `cues`,
+    "scope": texte couvert, "start": int, "end": int}.
+    """
+    scopes: List[Dict[str, Any]] = []
+    if not cues:
+        return scopes
+    sent = _Sentence(text)
+    bounds = [_cue_bounds(c) for c in cues]
+    cue_starts = sorted(lo for lo, _ in bounds)  # un autre déclencheur termine la portée droite
+    cue_index = _CueIndex(cues, bounds)
+    for ci, cue in enumerate(cues):
+        lo, hi = bounds[ci]
+        label = _cue_label(cue)
+        for st in strategies_by_group.get(cue.get("group"), ()):
+            opts = st.get("options") or {}
+            labels_filter = st.get("_labels_filter")
+            if labels_filter is None and opts.get("labels_filter"):
+                labels_filter = frozenset(str(x).lower() for x in opts["labels_filter"])
+            if labels_filter and label not in labels_filter:
+                continue
+            kind = st.get("scope_strategy")
+            if kind in SKIP_STRATEGIES:
+                if _skip_hits(st, sent, lo, hi):
+                    break
+                continue
+            if kind not in RIGHT_STRATEGIES and kind not in LEFT_RIGHT_STRATEGIES:
+                continue  # stratégie syntaxique non exécutable en surface
+            if _denied(st, sent, lo, hi, cue, cue_index):
+                continue
+            k = bisect_left(cue_starts, hi)
+            span = _right_span(sent, hi, opts, cue_starts[k] if k < len(cue_starts) else len(text))
+            if kind in LEFT_RIGHT_STRATEGIES and opts.get("include_subject", True):
+                left = _left_start(sent, lo, opts)  # sujet : tokens à gauche jusqu'à une ponctuation
+                if span or left < lo:
+                    span = (left, span[1] if span else hi)
+            if not span:
+                continue
+            a, b = span
+            scopes.append({"id": st.get("id"), "cue_index": ci, "scope": text[a:b], "start": a, "end": b})
+            break
+    return scopes
+
+
+__all__ = ["tokenize", "load_strategies", "resolve_scopes"]
@@ -0,0 +1,84 @@
+"""Segmentation en phrases (règles, sans NLP) pour le texte clinique français.
+
+Une fin de phrase est une ponctuation forte (. ! ? …), éventuellement suivie de
+guillemets/parenthèses fermants, puis d'un blanc. Elle est ignorée après une abréviation
+connue ("fig.", "cf.", "Dr.", "p. ex."...), après des points de suspension non suivis d'une
+majuscule, ou si la phrase suivante commencerait par une ponctuation (": , ; )"). Après une
+initiale ("R. F.", "g. a") ou une abréviation qui termine souvent une phrase ("12 mm.",
+"etc."), elle n'est ignorée que si la suite commence par une minuscule, un chiffre ou une
+autre initiale : "vitamine D. Pas de fièvre." est coupé. Les décimaux ("12.5") ne
+contiennent pas de blanc et ne sont donc jamais coupés.
+
+Le corpus étant souvent en minuscules, une minuscule après un point ne suffit pas à
+refuser la coupure.
+"""
+
+from __future__ import annotations
+from typing import List, Tuple
+import regex as reg
+
+ABBREVIATIONS = frozenset({
+    "m", "mme", "mmes", "mlle", "mlles", "mr", "dr", "drs", "pr", "prs",
+    "fig", "figs", "tab", "cf", "ex", "env", "vs", "no", "n°", "nos",
+    "p", "pp", "vol", "réf", "ref", "éd", "coll", "al", "approx", "chap",
+    "st", "ste", "cp", "cps", "inj", "hosp", "sup", "inf", "ant", "post",
+})
+# abréviations qui terminent souvent une phrase : coupure refusée seulement si la suite continue la phrase
+SENTENCE_FINAL_ABBREVIATIONS = frozenset({"mm", "etc"})
+
+# ponctuation forte + fermants éventuels, suivie d'au moins un blanc
+_BOUNDARY = reg.compile(r"(?P<punct>[.!?…]+)(?P<close>[»\"”’')\]]*)(?=\s)")
+_WORD_BEFORE = reg.compile(r"([\w°]+)$")
+_WORD_WINDOW = 32  # le mot avant le point est cherché dans cette fenêtre (les abréviations sont courtes)
+_NEXT_CHAR = reg.compile(r"\s*(\S)")
+_NEXT_INITIAL = reg.compile(r"(?![AÀY]\s)[^\W\d_](?=[.,\s])")  # lettre isolée ("R. F.,", "E. H âgée"), sauf "A"/"À"/"Y"
+
+
+def _continues(text: str, nxt) -> bool:
+    """La suite prolonge la phrase : minuscule, chiffre ou autre initiale ("Madame R. F., 45 ans")."""
+    c = nxt.group(1)
+    return c.islower() or c.isdigit() or _NEXT_INITIAL.match(text, nxt.start(1)) is not None
+
+
+def _is_boundary(text: str, m) -> bool:
+    punct = m.group("punct")
+    nxt = _NEXT_CHAR.match(text, m.end())
+    if not nxt:
+        return False  # fin de texte : la dernière phrase est fermée de toute façon
+    next_char = nxt.group(1)
+    if next_char in ":,;)]»":
+        return False
+    if len(punct) > 1 or punct == "…":  # points de suspension : souvent une élision ("La recherche … détectait")
+        return next_char.isupper()
+    if punct == "." and not m.group("close"):
+        before = _WORD_BEFORE.search(text, max(0, m.start() - _WORD_WINDOW), m.start())
+        if before:
+            word = before.group(1).lower()
+            if word in ABBREVIATIONS:
+                return False
+            if (len(word) == 1 and word.isalpha()) or word in SENTENCE_FINAL_ABBREVIATIONS:  # initiale, "mm.", "etc."
+                return not _continues(text, nxt)
+    return True
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """Retourne les intervalles [start, end) des phrases de `text`, sans blancs de bord."""
+    spans: List[Tuple[int, int]] = []
+    start = 0
+    for m in _BOUNDARY.finditer(text):
+        if _is_boundary(text, m):
+            spans.append((start, m.end()))
+            start = m.end()
+    spans.append((start, len(text)))
+    out: List[Tuple[int, int]] = []
+    for a, b in spans:
+        while a < b and text[a].isspace():
+            a += 1
+        while b > a and text[b - 1].isspace():
+            b -= 1
+        if a < b:
+            out.append((a, b))
+    return out
+
+
+__all__ = ["ABBREVIATIONS", "SENTENCE_FINAL_ABBREVIATIONS", "split_sentences"]
@@ -0,0 +1,295 @@
+"""Serveur d'annotation local : les règles restent chargées et compilées entre les requêtes.
+
+    python -m prompts.server --rules rules [--port 8765 | --unix /tmp/prompts.sock] [--segment] [--scopes]
+
+Points d'entrée (JSON) :
+  POST /annotate  {"sentences": ["...", ...], "start_id": 1}
+                  ou {"items": [{"id": ..., "text": "..."}, ...]}
+                  → {"generation": n, "rules": empreinte, "results": [enregistrements]}
+                  Les enregistrements sont ceux du runner (annotate_record) : mêmes cues
+                  qu'annotate_sentence.
+  GET  /health    → état du jeu de règles servi (génération, nombre de règles, chargement)
+  POST /reload    → rechargement immédiat des règles
+
+Un thread surveille les mtimes/tailles des YAML de rules/10_markers (et 20_scopes, ressources
+avec --scopes). Quand ils changent (et sont restés stables sur deux relevés), un nouveau jeu
+de règles est compilé à part puis installé d'une seule affectation : chaque requête prend le
+jeu courant à son arrivée et le garde jusqu'à sa réponse, les requêtes en cours ne sont donc
+ni interrompues ni mélangées. Un YAML invalide laisse le jeu précédent en service.
+
+Le serveur n'écoute que localhost (ou un socket Unix) : aucune authentification.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .annotator import Annotator
+from .budget import TimeBudget
+from .cue_cache import CueCache
+from .loaders import _iter_yaml_files, load_markers, ruleset_fingerprint
+
+log = logging.getLogger("prompts.server")
+
+# Taille maximale d'un corps de requête (octets).
+MAX_BODY = 64 * 1024 * 1024
+
+
+class _LockedCueCache(CueCache):
+    """CueCache partagé entre les threads du serveur (LRU protégé par un verrou)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+
+    def get(self, text):
+        with self._lock:
+            return super().get(text)
+
+    def put(self, text, cues):
+        with self._lock:
+            super().put(text, cues)
+
+
+class RuleState:
+    """Jeu de règles servi : annotateur prêt à l'emploi et métadonnées (immuable une fois créé)."""
+
+    def __init__(self, annotator: Annotator, generation: int, signature: Dict[str, Tuple[int, int]]):
+        self.annotator = annotator
+        self.generation = generation
+        self.signature = signature
+        self.fingerprint = ruleset_fingerprint(annotator.markers_by_group)
+        self.n_rules = sum(len(rules) for rules in annotator.markers_by_group.values())
+        self.loaded_at = time.time()
+
+    def info(self) -> Dict[str, Any]:
+        return {"generation": self.generation, "rules": self.fingerprint[:16], "n_rules": self.n_rules,
+                "loaded_at": self.loaded_at}
+
+
+class RuleSet:
+    """Source du jeu de règles courant, rechargé quand les fichiers YAML changent."""
+
+    def __init__(self, rules_dir: Path, segment: bool = False, scopes: bool = False,
+                 budget: Optional[TimeBudget] = None, cue_cache: int = 0):
+        self.rules_dir = Path(rules_dir)
+        self.segment = segment
+        self.scopes = scopes
+        self.budget = budget
+        self.cue_cache = cue_cache
+        self._reload_lock = threading.Lock()
+        self._failed: Optional[Dict[str, Tuple[int, int]]] = None  # signature d'un rechargement en échec
+        self.state = self._build(self.signature(), 1)
+
+    def signature(self) -> Dict[str, Tuple[int, int]]:
+        """(mtime_ns, taille) de chaque YAML surveillé."""
+        folders = ["10_markers"] + (["20_scopes", "ressources"] if self.scopes else [])
+        sig = {}
+        for sub in folders:
+            for f in _iter_yaml_files(self.rules_dir / sub):
+                try:
+                    st = f.stat()
+                except FileNotFoundError:  # supprimé entre le listage et le stat
+                    continue
+                sig[str(f)] = (st.st_mtime_ns, st.st_size)
+        return sig
+
+    def _build(self, signature: Dict[str, Tuple[int, int]], generation: int) -> RuleState:
+        markers_by_group = load_markers(self.rules_dir, use_cache=True)
+        cache = _LockedCueCache(markers_by_group, maxsize=self.cue_cache) if self.cue_cache > 0 else None
+        annotator = Annotator(self.rules_dir, markers_by_group=markers_by_group, segment=self.segment,
+                              scopes=self.scopes, budget=self.budget, cache=cache)
+        return RuleState(annotator, generation, signature)
+
+    def reload(self, signature: Optional[Dict[str, Tuple[int, int]]] = None) -> bool:
+        """Recompile les règles et installe le nouveau jeu; False (ancien jeu conservé) en cas d'erreur."""
+        with self._reload_lock:
+            signature = self.signature() if signature is None else signature
+            t0 = time.perf_counter()
+            try:
+                state = self._build(signature, self.state.generation + 1)
+            except Exception as e:  # YAML ou regex invalide : on continue avec les règles en service
+                self._failed = signature
+                log.error("Rechargement des règles impossible, génération %d conservée : %s", self.state.generation, e)
+                return False
+            self._failed = None
+            self.state = state  # une seule affectation : les requêtes voient l'ancien ou le nouveau jeu
+            log.info("Règles rechargées : génération %d, %d règles (%.2fs)", state.generation, state.n_rules,
+                     time.perf_counter() - t0)
+            return True
+
+    def watch(self, interval: float = 1.0, stop: Optional[threading.Event] = None) -> threading.Thread:
+        """Démarre le thread de surveillance (démon) des fichiers de règles."""
+        stop = stop or threading.Event()
+
+        def loop():
+            pending = None  # signature modifiée, en attente d'un second relevé identique
+            while not stop.wait(interval):
+                try:
+                    sig = self.signature()
+                except OSError as e:
+                    log.warning("Surveillance des règles : %s", e)
+                    continue
+                if sig == self.state.signature or sig == self._failed:
+                    pending = None
+                elif sig == pending:  # stable depuis le relevé précédent : écriture terminée
+                    self.reload(sig)
+                    pending = None
+                else:
+                    pending = sig
+
+        thread = threading.Thread(target=loop, name="rules-watcher", daemon=True)
+        thread.start()
+        return thread
+
+
+def _parse_items(payload: Any) -> List[Tuple[Any, str]]:
+    """(sid, texte) de chaque phrase de la requête, dans l'ordre; sans id explicite, les
+    phrases sont numérotées à partir de `start_id` selon leur rang (vides comprises)."""
+    if isinstance(payload, list):
+        payload = {"sentences": payload}
+    if not isinstance(payload, dict):
+        raise ValueError("corps JSON attendu : objet avec \"sentences\" ou \"items\"")
+    start_id = payload.get("start_id", 1)
+    if not isinstance(start_id, int):
+        raise ValueError("\"start_id\" doit être un entier")
+    if "items" in payload:
+        items = payload["items"]
+        if not isinstance(items, list) or not all(isinstance(it, dict) and isinstance(it.get("text"), str) for it in items):
+            raise ValueError("\"items\" doit être une liste de {\"id\": ..., \"text\": \"...\"}")
+        return [(start_id + i if it.get("id") is None else it["id"], it["text"].strip()) for i, it in enumerate(items)]
+    sentences = payload.get("sentences")
+    if not isinstance(sentences, list) or not all(isinstance(t, str) for t in sentences):
+        raise ValueError("\"sentences\" doit être une liste de chaînes")
+    return [(start_id + i, text.strip()) for i, text in enumerate(sentences)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # connexions persistantes : pas de poignée de main par requête
+    server_version = "prompts-server"
+
+    def _send(self, status: int, obj: Dict[str, Any]) -> None:
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not 0 <= length <= MAX_BODY:
+            self.close_connection = True  # corps non lu : la connexion n'est plus synchronisée
+            if length < 0:  # rfile.read(-1) attendrait la fermeture de la connexion
+                raise ValueError(f"Content-Length invalide : {length}")
+            raise ValueError(f"corps trop volumineux ({length} octets > {MAX_BODY})")
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._send(200, dict(self.server.rules.state.info(), status="ok"))
+        else:
+            self._send(404, {"error": f"chemin inconnu : {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path == "/reload":
+            ok = self.server.rules.reload()
+            self._send(200 if ok else 500, dict(self.server.rules.state.info(), reloaded=ok))
+            return
+        if self.path != "/annotate":
+            self._send(404, {"error": f"chemin inconnu : {self.path}"})
+            return
+        state = self.server.rules.state  # jeu de règles figé pour toute la requête
+        try:
+            items = _parse_items(self._read_json())
+        except ValueError as e:  # json.JSONDecodeError en est une sous-classe
+            self._send(400, {"error": str(e)})
+            return
+        ann = state.annotator
+        try:
+            results = [ann.annotate(text, sid) for sid, text in items]
+        except Exception as e:  # erreur d'une règle : réponse 500 plutôt qu'une connexion coupée sans réponse
+            log.exception("Annotation impossible")
+            self._send(500, {"error": f"{type(e).__name__}: {e}", "generation": state.generation})
+            return
+        self._send(200, {"generation": state.generation, "rules": state.fingerprint[:16], "results": results})
+
+    def address_string(self) -> str:
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, fmt: str, *args) -> None:
+        log.debug("%s %s", self.address_string(), fmt % args)
+
+
+class _TCPHandler(_Handler):
+    disable_nagle_algorithm = True  # réponses courtes : pas d'attente de Nagle
+
+
+class AnnotationServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], rules: RuleSet):
+        self.rules = rules
+        super().__init__(address, _TCPHandler)
+
+
+class UnixAnnotationServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, rules: RuleSet):
+        self.rules = rules
+        if os.path.exists(path):
+            os.unlink(path)  # socket laissé par une exécution précédente
+        super().__init__(path, _Handler)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Serveur d'annotation local (règles en mémoire, rechargées à chaud)")
+    ap.add_argument("--rules", required=True, help="Chemin dossier rules/")
+    ap.add_argument("--host", default="127.0.0.1", help="Adresse d'écoute (localhost par défaut)")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--unix", metavar="SOCKET", help="Écoute sur un socket Unix plutôt qu'en TCP")
+    ap.add_argument("--segment", action="store_true", help="Chaque texte est un document, découpé en phrases avant annotation")
+    ap.add_argument("--scopes", action="store_true", help="Ajoute les portées (étape 2, rules/20_scopes)")
+    ap.add_argument("--poll", type=float, default=1.0, help="Intervalle de surveillance des fichiers de règles, en secondes (0 = pas de rechargement automatique)")
+    ap.add_argument("--cue-cache", type=int, default=50_000, help="Taille du cache des cues par texte de phrase (0 = désactivé)")
+    ap.add_argument("--rule-timeout", type=float, default=0.0, help="Budget regex par règle et par phrase, en secondes (0 = illimité, défaut)")
+    ap.add_argument("--sentence-timeout", type=float, default=0.0, help="Budget regex total par phrase, en secondes (0 = illimité, défaut)")
+    ap.add_argument("--log", default="INFO")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log.upper(), logging.INFO))
+
+    rules = RuleSet(Path(args.rules), args.segment, args.scopes, TimeBudget(args.rule_timeout, args.sentence_timeout),
+                    args.cue_cache)
+    if args.poll > 0:
+        rules.watch(args.poll)
+    if args.unix:
+        server = UnixAnnotationServer(args.unix, rules)
+        where = args.unix
+    else:
+        server = AnnotationServer((args.host, args.port), rules)
+        where = f"http://{args.host}:{server.server_address[1]}"
+    log.info("Serveur prêt sur %s (%d règles, génération %d)", where, rules.state.n_rules, rules.state.generation)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.unix and os.path.exists(args.unix):
+            os.unlink(args.unix)
+
+
+__all__ = ["AnnotationServer", "RuleSet", "RuleState", "UnixAnnotationServer", "main"]
+
+
+if __name__ == "__main__":
+    main()
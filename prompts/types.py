@@ -30,6 +30,8 @@ class Rule(TypedDict, total=False):
 
 class Strategy(TypedDict, total=False):
     id: str
+    when_group: str
+    priority: str
     scope_strategy: str
     options: Dict[str, Any]
     guards: Any
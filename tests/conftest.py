@@ -0,0 +1,33 @@
+"""Fixtures communes : dossiers du dépôt, copie jetable des règles, lancement du runner."""
+
+from __future__ import annotations
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+RULES = ROOT / "rules"
+CORPUS = ROOT / "data" / "corpus_raw" / "CAS_Neg_Dalloux.txt"
+
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def run_runner(*args, check: bool = True) -> subprocess.CompletedProcess:
+    """Lance `python -m prompts.runner` depuis la racine du dépôt."""
+    cmd = [sys.executable, "-m", "prompts.runner", "--log", "WARNING", *map(str, args)]
+    proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+    if check and proc.returncode != 0:
+        raise AssertionError(f"{' '.join(cmd)} → {proc.returncode}\n{proc.stderr}")
+    return proc
+
+
+@pytest.fixture
+def rules_copy(tmp_path) -> Path:
+    """Copie des règles (sans cache) que le test peut modifier."""
+    dst = tmp_path / "rules"
+    shutil.copytree(RULES, dst, ignore=shutil.ignore_patterns(".cache"))
+    return dst
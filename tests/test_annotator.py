@@ -0,0 +1,54 @@
+"""Annotator : le flux asynchrone produit exactement le flux synchrone."""
+
+from __future__ import annotations
+import asyncio
+
+import pytest
+
+from conftest import CORPUS, RULES
+from prompts.annotator import Annotator
+from prompts.loaders import load_markers
+
+
+@pytest.fixture(scope="module")
+def markers():
+    return load_markers(RULES, use_cache=False)
+
+
+def _inputs():
+    lines = CORPUS.read_text(encoding="utf-8").splitlines()[:300]
+    # lignes vides (ignorées sans consommer de sid), sids explicites et bytes mélangés
+    items = []
+    for i, line in enumerate(lines):
+        if i % 17 == 0:
+            items.append("   ")
+        if i % 11 == 0:
+            items.append((f"doc-{i}", line))
+        elif i % 13 == 0:
+            items.append(line.encode("utf-8"))
+        else:
+            items.append(line)
+    return items
+
+
+async def _collect(agen):
+    return [rec async for rec in agen]
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+@pytest.mark.parametrize("segment", [False, True], ids=["phrases", "segment"])
+@pytest.mark.parametrize("batch_size", [1, 7, 64])
+def test_async_stream_equals_sync(markers, segment, batch_size):
+    ann = Annotator(RULES, markers_by_group=markers, segment=segment)
+    items = _inputs()
+    expected = list(ann.annotate_stream(items, start_id=5))
+    assert len(expected) == sum(1 for it in items if not isinstance(it, str) or it.strip())
+
+    from_sync = asyncio.run(_collect(ann.aannotate_stream(iter(items), start_id=5, batch_size=batch_size)))
+    from_async = asyncio.run(_collect(ann.aannotate_stream(_aiter(items), start_id=5, batch_size=batch_size)))
+    assert from_sync == expected
+    assert from_async == expected
@@ -0,0 +1,35 @@
+"""benchmarks.suite.compare : régressions signalées, bruit des benchmarks courts ignoré."""
+
+from __future__ import annotations
+
+from benchmarks.suite import compare
+
+
+def _run(*results):
+    return {"results": [dict(name=name, **metrics) for name, metrics in results]}
+
+
+def _rows(rows):
+    return {(r["name"], r["metric"]): r["regression"] for r in rows}
+
+
+def test_regressions_and_improvements():
+    base = _run(("annotate", {"seconds": 2.0, "sentences_per_s": 1000.0, "p99_ms": 4.0, "peak_alloc_kb": 1000}))
+    new = _run(("annotate", {"seconds": 2.1, "sentences_per_s": 800.0, "p99_ms": 3.0, "peak_alloc_kb": 1300}),
+               ("nouveau", {"seconds": 1.0}))  # absent de base : pas comparé
+    rows = _rows(compare(base, new, threshold=0.10, min_seconds=0.1))
+    assert rows == {("annotate", "seconds"): False, ("annotate", "sentences_per_s"): True,
+                    ("annotate", "p99_ms"): False, ("annotate", "peak_alloc_kb"): True}
+
+
+def test_short_benchmarks():
+    base = _run(("load[warm]", {"seconds": 0.007, "peak_rss_kb": 50_000}),
+                ("noise", {"seconds": 0.005, "peak_rss_kb": 50_000}))
+    # cache de règles cassé : le chargement à chaud retombe au temps à froid
+    new = _run(("load[warm]", {"seconds": 0.3, "peak_rss_kb": 50_000}),
+               ("noise", {"seconds": 0.009, "peak_rss_kb": 90_000}))
+    rows = _rows(compare(base, new, threshold=0.10, min_seconds=0.1))
+    assert rows[("load[warm]", "seconds")] is True
+    assert ("noise", "seconds") not in rows  # sous le seuil dans les deux runs
+    assert rows[("noise", "peak_rss_kb")] is True  # la mémoire est toujours comparée
+    assert ("noise", "seconds") in _rows(compare(base, new, threshold=0.10))
@@ -0,0 +1,102 @@
+"""Budget regex : la limite par règle porte sur tout le finditer, chaque phrase ignorée est journalisée."""
+
+from __future__ import annotations
+import logging
+import time
+
+import pytest
+import regex as reg
+
+from prompts.annotator import annotate_record
+from prompts.budget import TimeBudget, bounded_matches
+from prompts.cue_cache import CueCache
+from prompts.loaders import load_markers
+
+
+class _SlowPattern:
+    """finditer dont chaque match prend `delay` secondes : chaque recherche reste sous le timeout."""
+
+    def __init__(self, pattern, delay):
+        self._pat = reg.compile(pattern)
+        self.delay = delay
+
+    def finditer(self, text, timeout=None):
+        for m in self._pat.finditer(text):
+            time.sleep(self.delay)
+            if timeout is not None and self.delay > timeout:
+                raise TimeoutError("recherche trop longue")
+            yield m
+
+
+def _rule(delay, timeout):
+    return {"id": "LENT", "group": "test", "_compiled": _SlowPattern(r"\bpas\b", delay), "_anchors": None,
+            "options": {"timeout": timeout}}
+
+
+def test_bounded_matches_is_cumulative():
+    def slow():
+        for i in range(10):
+            time.sleep(0.02)
+            yield i
+    with pytest.raises(TimeoutError):
+        list(bounded_matches(slow(), 0.05))
+    assert list(bounded_matches(iter(range(5)), 10.0)) == list(range(5))
+
+
+def test_rule_timeout_spans_all_matches(caplog):
+    markers = {"test": [_rule(0.02, 0.05)]}
+    text = " ".join(["pas"] * 10)
+    with caplog.at_level(logging.WARNING, logger="prompts.markers"):
+        rec = annotate_record(text, 42, markers, budget=TimeBudget())
+    assert rec["cues"] == [] and rec["skipped"]["rule"] == "LENT"
+    assert any("42" in r.getMessage() and r.levelno == logging.WARNING for r in caplog.records)
+    # sous le budget, toutes les cues sont produites
+    ok = annotate_record(" ".join(["pas"] * 3), 1, {"test": [_rule(0.001, 1.0)]}, budget=TimeBudget())
+    assert len(ok["cues"]) == 3 and "skipped" not in ok
+
+
+def test_every_dropped_sentence_logged(caplog):
+    markers = {"test": [_rule(0.02, 0.05)]}
+    cache = CueCache(markers, maxsize=100)
+    text = " ".join(["pas"] * 10)
+    with caplog.at_level(logging.WARNING, logger="prompts.markers"):
+        for sid in (1, 2, 3):  # même texte : une phrase ignorée n'est pas mise en cache
+            assert "skipped" in annotate_record(text, sid, markers, budget=TimeBudget(), cache=cache)
+    logged = [r.getMessage() for r in caplog.records if r.levelno == logging.WARNING]
+    assert [m.split()[1] for m in logged] == ["1", "2", "3"]
+
+
+def test_no_budget_by_default():
+    budget = TimeBudget(0.0, 0.0)
+    assert budget.deadline() is None and budget.for_rule({}, None) is None
+
+
+def _load_rule(tmp_path, pattern, options):
+    d = tmp_path / "rules" / "10_markers"
+    d.mkdir(parents=True)
+    (d / "test.yaml").write_text(f"""- id: RETOUR_ARRIERE
+  when_pattern: '{pattern}'
+  group: "test"
+  options: {options}
+""", encoding="utf-8")
+    return load_markers(tmp_path / "rules", use_cache=False)
+
+
+@pytest.mark.parametrize("timeout", ["0", "-1", "'1s'", "true", "[1]"])
+def test_invalid_rule_timeout_rejected(tmp_path, timeout):
+    with pytest.raises(ValueError, match="timeout"):
+        _load_rule(tmp_path, r"\bpas\b", f"{{timeout: {timeout}}}")
+
+
+def test_real_regex_timeout(tmp_path):
+    # retour arrière exponentiel du module regex, interrompu par son propre timeout=
+    markers = _load_rule(tmp_path, "(?:a|aa)+b", "{timeout: 0.05}")
+    assert markers["test"][0]["options"]["timeout"] == 0.05
+    t0 = time.perf_counter()
+    rec = annotate_record("a" * 40 + "c", 7, markers, budget=TimeBudget())
+    assert time.perf_counter() - t0 < 5
+    assert rec["cues"] == [] and rec["skipped"]["rule"] == "RETOUR_ARRIERE"
+    assert "skipped" not in annotate_record("a" * 40 + "b", 8, markers, budget=TimeBudget())
+    # la limite globale par règle (--rule-timeout) passe par le même chemin
+    plain = _load_rule(tmp_path / "plain", "(?:a|aa)+b", "{}")
+    assert annotate_record("a" * 40 + "c", 9, plain, budget=TimeBudget(0.05))["skipped"]["rule"] == "RETOUR_ARRIERE"
@@ -0,0 +1,89 @@
+"""Sortie en colonnes : relue, elle redonne les enregistrements du JSONL."""
+
+from __future__ import annotations
+import json
+from collections import Counter
+
+import pytest
+
+from conftest import CORPUS, run_runner
+from prompts.columnar import ColumnarWriter, default_format, open_columnar
+
+
+def _as_columnar(rec):
+    """Forme JSONL ramenée à ce que relit le format colonne (positions en tuples, skipped booléen)."""
+    out = {"id": rec["id"], "text": rec["text"],
+           "cues": [{"id": c["id"], "cue_label": c["cue_label"], "positions": [tuple(p) for p in c["positions"]],
+                     "group": c["group"]} for c in rec["cues"]]}
+    if "skipped" in rec:
+        out["skipped"] = True
+    return out
+
+
+SAMPLES = [
+    {"id": 1, "text": "Pas de fièvre.", "cues": [{"id": "R1", "cue_label": "pas", "positions": [(0, 3)], "group": "g"}]},
+    {"id": 2, "text": "", "cues": []},
+    {"id": 3, "text": "ni œdème ni douleur — 痛み", "cues": [
+        {"id": "R2", "cue_label": "ni … ni", "positions": [(0, 2), (9, 11)], "group": "conj"},
+        {"id": "R1", "cue_label": None, "positions": [], "group": "g"}]},
+    {"id": 4, "text": "ignorée", "cues": [], "skipped": {"rule": "R9", "reason": "timeout", "timeout": 0.1}},
+]
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 8192])
+def test_writer_round_trip(tmp_path, batch_size):
+    path = tmp_path / "out.npz"
+    with ColumnarWriter(path, "npz", batch_size=batch_size) as w:
+        w.writelines(SAMPLES)
+    col = open_columnar(path)
+    expected = [_as_columnar(dict(r, cues=[dict(c, cue_label=c["cue_label"] or "") for c in r["cues"]]))
+                for r in SAMPLES]
+    assert len(col) == len(SAMPLES) and col.n_cues == 3
+    assert list(col) == expected
+
+
+def test_empty_output(tmp_path):
+    path = tmp_path / "empty.npz"
+    with ColumnarWriter(path, "npz"):
+        pass
+    col = open_columnar(path)
+    assert len(col) == 0 and list(col) == [] and col.rule_counts() == {}
+
+
+@pytest.fixture(scope="module")
+def runs(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("columnar")
+    jsonl, npz = tmp / "out.jsonl", tmp / "out.npz"
+    run_runner("--rules", "rules", "--no-rule-cache", "--input", CORPUS, "--output", jsonl)
+    run_runner("--rules", "rules", "--no-rule-cache", "--input", CORPUS, "--output", npz, "--output-format", "npz",
+               "--workers", 2, "--chunk-size", 100)
+    records = [json.loads(line) for line in jsonl.read_text(encoding="utf-8").splitlines()]
+    return records, open_columnar(npz)
+
+
+def test_npz_equals_jsonl(runs):
+    records, col = runs
+    assert len(col) == len(records)
+    assert list(col) == [_as_columnar(r) for r in records]
+
+
+def test_queries(runs):
+    records, col = runs
+    cues = [(i, c) for i, r in enumerate(records) for c in r["cues"]]
+    assert col.rule_counts() == dict(Counter(c["id"] for _, c in cues))
+    assert col.group_counts() == dict(Counter(c["group"] for _, c in cues))
+    rule = max(col.rule_counts(), key=col.rule_counts().get)
+    assert col.sentences_with(rule=rule).tolist() == sorted({i for i, c in cues if c["id"] == rule})
+    group = cues[0][1]["group"]
+    assert [col.cue(int(j))["group"] for j in col.cues_where(group=group)] == [c["group"] for _, c in cues
+                                                                              if c["group"] == group]
+
+
+def test_parquet_equals_jsonl(tmp_path, runs):
+    pytest.importorskip("pyarrow")
+    assert default_format() == "parquet"
+    records, _ = runs
+    path = tmp_path / "out.parquet"
+    with ColumnarWriter(path, "parquet", batch_size=100) as w:
+        w.writelines(records)
+    assert list(open_columnar(path)) == [_as_columnar(r) for r in records]
@@ -0,0 +1,87 @@
+"""Cache de cues : LRU borné, second niveau SQLite, invalidation par empreinte des règles."""
+
+from __future__ import annotations
+
+import pytest
+
+from conftest import RULES, run_runner
+from prompts.annotator import annotate_record
+from prompts.cue_cache import CueCache
+from prompts.loaders import load_markers
+
+TEXT = "Le patient ne présente pas de fièvre ni de toux."
+
+
+@pytest.fixture(scope="module")
+def markers():
+    return load_markers(RULES, use_cache=False)
+
+
+def _cues(start):
+    return [{"id": "R", "cue_label": "pas", "group": "g", "positions": [(start, start + 3)]}]
+
+
+def test_lru_eviction(markers):
+    cache = CueCache(markers, maxsize=2)
+    cache.put("a", _cues(0))
+    cache.put("b", _cues(1))
+    assert cache.get("a") == _cues(0)  # "a" devient la plus récente
+    cache.put("c", _cues(2))
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == _cues(0) and cache.get("c") == _cues(2)
+    assert cache.stats() == {"hits": 3, "misses": 1, "disk_hits": 0, "size": 2}
+    assert cache.hit_rate == 0.75
+
+
+def test_sqlite_round_trip(markers, tmp_path):
+    db = tmp_path / "cues.sqlite"
+    first = CueCache(markers, maxsize=10, path=db)
+    first.put(TEXT, _cues(27))
+    first.close()
+
+    second = CueCache(markers, maxsize=10, path=db)
+    assert second.get(TEXT) == _cues(27)
+    assert second.get(TEXT) == _cues(27)  # remontée en mémoire : pas de seconde lecture disque
+    assert second.stats() == {"hits": 2, "misses": 0, "disk_hits": 1, "size": 1}
+    second.close()
+
+
+def test_rule_edit_invalidates(rules_copy, tmp_path):
+    db = tmp_path / "cues.sqlite"
+    before = load_markers(rules_copy, use_cache=False)
+    cache = CueCache(before, maxsize=10, path=db)
+    cache.put(TEXT, _cues(27))
+    cache.close()
+    assert CueCache(load_markers(rules_copy, use_cache=False), path=db).fingerprint == cache.fingerprint
+
+    f = rules_copy / "10_markers" / "adversatives.yaml"
+    src = f.read_text(encoding="utf-8")
+    assert "(?:rien|tout)\\s+mais" in src
+    f.write_text(src.replace("(?:rien|tout)\\s+mais", "(?:rien|tout|nul)\\s+mais", 1), encoding="utf-8")
+    edited = CueCache(load_markers(rules_copy, use_cache=False), maxsize=10, path=db)
+    assert edited.fingerprint != cache.fingerprint
+    assert edited.get(TEXT) is None and edited.disk_hits == 0
+    edited.close()
+
+
+def test_cached_record_is_copy_with_current_id(markers):
+    cache = CueCache(markers, maxsize=10)
+    first = annotate_record(TEXT, 1, markers, cache=cache)
+    assert first["cues"] and cache.misses == 1
+    second = annotate_record(TEXT, 2, markers, cache=cache)
+    assert cache.hits == 1
+    assert second["id"] == 2 and second["cues"] == first["cues"]
+    second["cues"][0]["positions"][0] = (100, 103)  # l'appelant modifie sa copie
+    second["cues"][0]["cue_label"] = "modifié"
+    third = annotate_record(TEXT, 3, markers, cache=cache)
+    assert third["id"] == 3 and third["cues"] == first["cues"]
+    assert third["cues"] == annotate_record(TEXT, 4, markers)["cues"]  # même résultat que sans cache
+
+
+def test_runner_logs_hit_rate(tmp_path, rules_copy):
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("\n".join([TEXT, "Pas de douleur.", TEXT, TEXT, "Pas de douleur.", "Aucune toux."]) + "\n",
+                      encoding="utf-8")
+    proc = run_runner("--rules", rules_copy, "--input", corpus, "--output", tmp_path / "out.jsonl", "--log", "INFO")
+    assert "Cache de cues : 3/6 phrases (50.0%), dont 0 depuis le disque" in proc.stderr
@@ -0,0 +1,110 @@
+"""Évaluation vectorisée : mêmes comptes qu'un appariement exhaustif, sur données aléatoires."""
+
+from __future__ import annotations
+import json
+import random
+from collections import Counter
+
+import pytest
+
+from prompts.columnar import ColumnarWriter
+from prompts.evaluate import LEVELS, evaluate, load_cues, load_jsonl
+
+RULES = [("R_PAS", "bipartite"), ("R_SANS", "preposition"), ("R_NI", "conjonction"), ("R_AUCUN", "determinant"),
+         ("R_NON", "lexical"), ("R_PAS2", "bipartite")]
+
+
+def _cue(rnd, length):
+    rule, group = rnd.choice(RULES)
+    positions = []
+    for _ in range(rnd.choice([0, 1, 1, 1, 2, 3])):
+        s = rnd.randrange(length)
+        positions.append([s, min(length, s + rnd.randint(0, 6))])
+    return {"id": rule, "cue_label": "x", "group": group, "positions": positions}
+
+
+def _perturb(rnd, cue, length):
+    x = rnd.random()
+    cue = dict(cue, positions=[list(p) for p in cue["positions"]])
+    if x < 0.15 and cue["positions"]:  # intervalle décalé : chevauchement sans égalité
+        cue["positions"][0][0] = max(0, cue["positions"][0][0] + rnd.choice([-2, 1, 3]))
+    elif x < 0.25:  # ailleurs dans la phrase
+        cue["positions"] = [[min(length, e + 1), min(length, e + 4)] for _, e in cue["positions"]]
+    elif x < 0.35:  # autre règle
+        cue["id"], cue["group"] = rnd.choice(RULES)
+    return cue
+
+
+def _random_pair(seed):
+    rnd = random.Random(seed)
+    gold, pred = [], []
+    ids = rnd.sample(range(1, 400), rnd.randint(1, 120))
+    if rnd.random() < 0.5:
+        ids.sort()  # chemin rapide des ids déjà triés (sortie du runner)
+    for sid in ids:
+        length = rnd.randint(5, 60)
+        cues = [_cue(rnd, length) for _ in range(rnd.randint(0, 5))]
+        gold.append({"id": sid, "text": "t", "cues": cues})
+        if rnd.random() < 0.1:
+            continue  # phrase absente des prédictions
+        predicted = [_perturb(rnd, c, length) for c in cues if rnd.random() > 0.1]
+        predicted += [_cue(rnd, length) for _ in range(rnd.randint(0, 2))]
+        if predicted and rnd.random() < 0.1:
+            predicted.append(dict(predicted[0]))  # doublon
+        pred.append({"id": sid, "text": "t", "cues": predicted})
+    pred.append({"id": 10_000, "text": "hors gold", "cues": [_cue(rnd, 10)]})  # ignorée
+    rnd.shuffle(pred)
+    return pred, gold
+
+
+def _brute(pred, gold):
+    gold_ids = {r["id"] for r in gold}
+
+    def flat(recs, level):
+        return [({"rule": c["id"], "group": c["group"], "all": "*"}[level], r["id"], tuple(map(tuple, c["positions"])))
+                for r in recs if r["id"] in gold_ids for c in r["cues"]]
+
+    def overlaps(c, others):
+        return any(o[0] == c[0] and o[1] == c[1] and any(s < e2 and s2 < e for s, e in c[2] for s2, e2 in o[2])
+                   for o in others)
+    out = {}
+    for level in LEVELS:
+        P, G = flat(pred, level), flat(gold, level)
+        pc, gc = Counter(P), Counter(G)
+        out[level] = {key: {"pred": sum(c[0] == key for c in P), "gold": sum(c[0] == key for c in G),
+                            "exact_tp": sum(min(n, gc[s]) for s, n in pc.items() if s[0] == key),
+                            "overlap_tp_pred": sum(overlaps(c, G) for c in P if c[0] == key),
+                            "overlap_tp_gold": sum(overlaps(c, P) for c in G if c[0] == key)}
+                      for key in {c[0] for c in P + G}}
+    return out
+
+
+def _write(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+    return path
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_matches_brute_force(tmp_path, seed):
+    pred, gold = _random_pair(seed)
+    report = evaluate(load_jsonl(_write(tmp_path / "pred.jsonl", pred)), load_jsonl(_write(tmp_path / "gold.jsonl", gold)))
+    expected = _brute(pred, gold)
+    assert report["sentences"] == len(gold)
+    for level in LEVELS:
+        got = {key: {k: row[k] for k in ("pred", "gold", "exact_tp", "overlap_tp_pred", "overlap_tp_gold")}
+               for key, row in report[level].items() if row["pred"] or row["gold"]}
+        assert got == expected[level], level
+        for row in report[level].values():
+            p = row["exact_tp"] / row["pred"] if row["pred"] else 0.0
+            r = row["exact_tp"] / row["gold"] if row["gold"] else 0.0
+            assert row["exact_precision"] == round(p, 4) and row["exact_recall"] == round(r, 4)
+
+
+def test_columnar_gold(tmp_path):
+    pred, gold = _random_pair(99)
+    pred_path = _write(tmp_path / "pred.jsonl", pred)
+    with ColumnarWriter(tmp_path / "gold.npz", "npz") as w:
+        w.writelines(gold)
+    from_jsonl = evaluate(load_cues(pred_path), load_cues(_write(tmp_path / "gold.jsonl", gold)))
+    from_npz = evaluate(load_cues(pred_path), load_cues(tmp_path / "gold.npz"))
+    assert from_npz == from_jsonl
@@ -0,0 +1,61 @@
+"""--incremental : après modification d'une règle, la sortie est celle d'une réexécution complète."""
+
+from __future__ import annotations
+import re
+
+import pytest
+
+from conftest import CORPUS, run_runner
+from prompts.incremental import sidecar_path
+
+EDITS = [
+    # motif élargi : de nouvelles phrases matchent
+    ("lexical.yaml", r"(?P<adv>nullement|aucunement|guère|point)", r"(?P<adv>nullement|aucunement|guère|point|jamais)"),
+    # règle rendue plus étroite : des cues disparaissent
+    ("lexical.yaml", r"'\b(?P<non>non)\b'", r"'\b(?P<non>non)\b(?=\s+\w)'"),
+    # champ documentaire seulement : tout est repris
+    ("lexical.yaml", "Chaque occurrence de \"non\" est annotée séparément.", "Chaque occurrence est annotée."),
+]
+
+
+def _edit(rules_dir, name, old, new):
+    path = rules_dir / "10_markers" / name
+    text = path.read_text(encoding="utf-8")
+    assert old in text
+    path.write_text(text.replace(old, new, 1), encoding="utf-8")
+
+
+@pytest.mark.parametrize("opts", [(), ("--segment",)], ids=["phrases", "segment"])
+@pytest.mark.parametrize("edit", EDITS, ids=["élargie", "restreinte", "notes"])
+def test_incremental_equals_full(tmp_path, rules_copy, edit, opts):
+    out, full = tmp_path / "out.jsonl", tmp_path / "full.jsonl"
+    run_runner("--rules", rules_copy, "--input", CORPUS, "--output", out, "--incremental", *opts)
+    assert sidecar_path(out).exists()
+    before = out.read_bytes()
+
+    _edit(rules_copy, *edit)
+    proc = run_runner("--rules", rules_copy, "--input", CORPUS, "--output", out, "--incremental", "--log", "INFO", *opts)
+    run_runner("--rules", rules_copy, "--input", CORPUS, "--output", full, *opts)
+    assert out.read_bytes() == full.read_bytes()
+
+    reused = re.search(r"(\d+) phrases reprises de la sortie précédente, (\d+) réannotées", proc.stderr)
+    assert reused and int(reused.group(1)) > 0
+    if edit[1].startswith("Chaque"):
+        assert int(reused.group(2)) == 0 and before == full.read_bytes()
+
+
+def test_sidecar_only_with_incremental(tmp_path, rules_copy):
+    out = tmp_path / "out.jsonl"
+    run_runner("--rules", rules_copy, "--input", CORPUS, "--output", out)
+    assert not sidecar_path(out).exists()
+    run_runner("--rules", rules_copy, "--input", CORPUS, "--output", out, "--incremental")
+    assert sidecar_path(out).exists()
+    # une réécriture sans --incremental rend l'état caduc : il est supprimé
+    run_runner("--rules", rules_copy, "--input", CORPUS, "--output", out, "--segment")
+    assert not sidecar_path(out).exists()
+
+
+def test_non_regular_output(rules_copy):
+    proc = run_runner("--rules", rules_copy, "--input", CORPUS, "--output", "/dev/null", "--incremental")
+    assert "fichier ordinaire" in proc.stderr
+    assert not sidecar_path("/dev/null").exists()
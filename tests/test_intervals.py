@@ -0,0 +1,59 @@
+"""IntervalIndex : mêmes réponses qu'une recherche exhaustive, insertions dans le désordre comprises."""
+
+from __future__ import annotations
+import random
+import time
+
+import pytest
+
+from prompts.intervals import DEDUP_MODES, IntervalIndex, as_interval_index
+
+
+def _brute(seen, start, end, mode):
+    if mode == "start":
+        return any(s == start for s, _ in seen)
+    if mode == "exact":
+        return (start, end) in seen
+    if mode == "overlap":
+        return any(s < end and start < e for s, e in seen)
+    if mode == "contained":
+        return any(s <= start and end <= e for s, e in seen)
+    return False
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_brute_force(seed):
+    rnd = random.Random(seed)
+    length = rnd.choice([10, 80, 300])
+    index, seen = IntervalIndex(), []
+    for _ in range(rnd.randint(1, 200)):
+        start = rnd.randrange(length)
+        end = start + rnd.randint(0, 12)
+        for mode in DEDUP_MODES:
+            assert index.is_duplicate(start, end, mode) == _brute(seen, start, end, mode), (seen, start, end, mode)
+        if rnd.random() < 0.6:
+            index.add(start, end)
+            seen.append((start, end))
+    assert len(index) == len(seen)
+    assert list(index) == sorted(seen, key=lambda iv: iv[0])
+    assert list(as_interval_index(seen)) == list(index)
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        IntervalIndex().is_duplicate(0, 1, "bogus")
+
+
+def _build_reversed(n):
+    t0 = time.perf_counter()
+    index = IntervalIndex()
+    for start in range(n - 1, -1, -1):  # chaque insertion en tête de l'ordre des débuts
+        index.add(start, start + 3)
+        index.overlaps(start, start + 1)
+    return time.perf_counter() - t0
+
+
+def test_out_of_order_inserts_scale():
+    small = min(_build_reversed(5_000) for _ in range(3))
+    large = min(_build_reversed(40_000) for _ in range(3))
+    assert large / small < 20, f"x8 en taille → x{large / small:.1f} en temps"
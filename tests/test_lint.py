@@ -0,0 +1,47 @@
+"""Linter des motifs : quantificateurs imbriqués signalés, répétitions délimitées ou bornées tolérées."""
+
+from __future__ import annotations
+
+import pytest
+import regex as reg
+
+from prompts.lint import NESTED_MAX, lint_pattern
+from prompts.loaders import load_markers
+
+
+@pytest.mark.parametrize("pattern", [
+    r"(?:\w+\s*)+",
+    r"\bpas\s+(?:[\w']+\s?)+\s+de\b",
+    r"(?:(?:\w+)+,)*",
+    r"(?:\w+\s*){0,%d}" % (NESTED_MAX + 1),
+])
+def test_nested_quantifiers_flagged(pattern):
+    warnings = lint_pattern(pattern, reg.IGNORECASE)
+    assert len(warnings) == 1 and "quantificateurs imbriqués" in warnings[0]
+
+
+@pytest.mark.parametrize("pattern", [
+    r"(?:\s+[\w']+){0,2}",  # borne courte
+    r"(?:\s*,?\s*ni\s+\w+)*",  # littéral requis à chaque itération
+    r"\b(?:pas|plus)\s+de\b",
+    r"(?:\w+\s*)++",  # possessif : pas de retour arrière
+    r"(?:absence){e<=1}\s+de",  # illisible pour `re` : non analysé
+    r"[[:alpha:]]+",
+])
+def test_tolerated_patterns(pattern):
+    assert lint_pattern(pattern, reg.IGNORECASE) == []
+
+
+def test_loader_attaches_lint(tmp_path):
+    d = tmp_path / "rules" / "10_markers"
+    d.mkdir(parents=True)
+    (d / "test.yaml").write_text("""- id: LENT
+  when_pattern: '\\bpas\\s+(?:\\w+\\s*)+\\bde\\b'
+  group: "test"
+  negative_guards:
+    - pattern: '(?:\\w+\\s*)+'
+""", encoding="utf-8")
+    rule = load_markers(tmp_path / "rules", use_cache=False)["test"][0]
+    assert len(rule["_lint"]) == 2
+    assert rule["_lint"][0].startswith("when_pattern: quantificateurs imbriqués")
+    assert rule["_lint"][1].startswith("garde ")
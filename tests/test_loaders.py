@@ -0,0 +1,74 @@
+"""Chargement des règles : le cache disque rend les mêmes règles et les mêmes traces."""
+
+from __future__ import annotations
+import logging
+import types
+
+import pytest
+
+from prompts import loaders
+from prompts.debug_print import TRACE
+from prompts.loaders import load_markers, rule_cache_path
+
+
+class _Events(logging.Handler):
+    def __init__(self):
+        super().__init__(TRACE)
+        self.events = []
+
+    def emit(self, record):
+        if getattr(record, "trace_event", None) == "rule_loaded":
+            self.events.append((record.rule_id, {k: v for k, v in record.trace.items() if k != "source"},
+                                record.trace["source"]))
+
+
+def _loaded_events(rules_dir, use_cache):
+    handler = _Events()
+    logger = logging.getLogger("prompts.loaders")
+    level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(TRACE)
+    try:
+        grouped = load_markers(rules_dir, use_cache=use_cache)
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+    return grouped, handler.events
+
+
+def test_rule_loaded_traced_from_cache(rules_copy):
+    plain, from_yaml = _loaded_events(rules_copy, use_cache=False)
+    built, on_build = _loaded_events(rules_copy, use_cache=True)
+    assert rule_cache_path(rules_copy).exists()
+    cached, on_hit = _loaded_events(rules_copy, use_cache=True)
+
+    n = sum(len(rules) for rules in plain.values())
+    assert n and len(from_yaml) == len(on_build) == len(on_hit) == n
+    assert {source for _, _, source in from_yaml + on_build} == {"yaml"}
+    assert {source for _, _, source in on_hit} == {"cache"}
+    assert [e[:2] for e in on_hit] == [e[:2] for e in from_yaml]
+
+    def public(grouped):
+        return {g: [(r.get("id"), r["_compiled"].pattern if r.get("_compiled") else None, r.get("_anchors"))
+                    for r in rules] for g, rules in grouped.items()}
+    assert public(cached) == public(built) == public(plain)
+
+
+@pytest.mark.parametrize("change", ["regex", "python", "source"])
+def test_rule_cache_invalidated_by_code_changes(rules_copy, tmp_path, monkeypatch, change):
+    # le cache contient du code regex compilé et les champs calculés par anchors/lint
+    source = tmp_path / "anchors.py"
+    source.write_text("# v1\n", encoding="utf-8")
+    monkeypatch.setattr(loaders, "_CACHE_SOURCES", loaders._CACHE_SOURCES + (source,))
+    _loaded_events(rules_copy, use_cache=True)
+    _, on_hit = _loaded_events(rules_copy, use_cache=True)
+    assert {s for _, _, s in on_hit} == {"cache"}
+
+    if change == "regex":
+        monkeypatch.setattr(loaders.reg, "__version__", "0.0.0")
+    elif change == "python":
+        monkeypatch.setattr(loaders, "sys", types.SimpleNamespace(version_info=(2, 7, 18)))
+    else:
+        source.write_text("# v2\n", encoding="utf-8")
+    _, after = _loaded_events(rules_copy, use_cache=True)
+    assert after and {s for _, _, s in after} == {"yaml"}
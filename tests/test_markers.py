@@ -0,0 +1,73 @@
+"""Gardes négatives : SentenceGuards (index par phrase) = _guard_hits (fenêtre par match)."""
+
+from __future__ import annotations
+
+import pytest
+
+from conftest import CORPUS, RULES
+from prompts.loaders import load_markers
+from prompts.markers import SentenceGuards, _guard_hits, build_guard_index, guard_hits_indexed
+
+
+@pytest.fixture(scope="module")
+def guarded_rules():
+    markers = load_markers(RULES, use_cache=False)
+    return [r for rules in markers.values() for r in rules if r.get("_guards") and r.get("_compiled")]
+
+
+def _texts(rule, corpus):
+    examples = [str(ex).split("→")[0].strip() for ex in rule.get("examples") or []]
+    dense = " ; ".join(examples * 20)  # la règle se déclenche de nombreuses fois dans la phrase
+    texts = corpus + examples + [dense, dense.upper()]
+    # casefold non aligné sur le texte ("ß" → "ss") : repli sur la recherche fenêtrée
+    texts += ["Straße " + t for t in examples]
+    return texts
+
+
+def test_sentence_guards_equal_windowed(guarded_rules):
+    assert guarded_rules
+    corpus = [line.strip() for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+    n = rejected = 0
+    for rule in guarded_rules:
+        for text in _texts(rule, corpus):
+            matches = list(rule["_compiled"].finditer(text))
+            if not matches:
+                continue
+            folded = text.casefold()
+            guards = SentenceGuards(rule, text, folded)
+            index = build_guard_index(rule, text, folded)
+            for m in matches:
+                expected = _guard_hits(rule, text, m)
+                assert guards.hits(m) == expected, (rule["id"], text, m.span())
+                assert guard_hits_indexed(rule, text, folded, m, index) == expected, (rule["id"], text, m.span())
+                n += 1
+                rejected += expected
+    assert n and rejected
+
+
+@pytest.mark.parametrize("guard, text", [
+    (r"(?:absence){e<=1}\s+totale", "pas de fièvre, absense totale de toux, pas de douleur."),
+    (r"[[:alpha:]]+x\s+totale", "pas de fièvre, toux totale, pas de douleur."),
+])
+def test_regex_only_guard_is_not_skipped(tmp_path, guard, text):
+    # une ancre mal lue par `re` marquait la garde absente : elle ne rejetait plus rien
+    d = tmp_path / "rules" / "10_markers"
+    d.mkdir(parents=True)
+    (d / "test.yaml").write_text(f"""- id: PAS_TEST
+  when_pattern: '\\bpas\\s+de\\b'
+  group: "test"
+  negative_guards:
+    - pattern: '{guard}'
+""", encoding="utf-8")
+    rule = load_markers(tmp_path / "rules", use_cache=False)["test"][0]
+    assert rule["_guard_anchors"] == [None]
+    matches = list(rule["_compiled"].finditer(text))
+    assert len(matches) == 2
+    folded = text.casefold()
+    guards = SentenceGuards(rule, text, folded)
+    index = build_guard_index(rule, text, folded)
+    for m in matches:
+        expected = _guard_hits(rule, text, m)
+        assert guards.hits(m) == expected
+        assert guard_hits_indexed(rule, text, folded, m, index) == expected
+    assert any(_guard_hits(rule, text, m) for m in matches)
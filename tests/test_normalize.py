@@ -0,0 +1,82 @@
+"""Texte normalisé : correspondance des offsets original ↔ NFC sur du texte décomposé (NFD)."""
+
+from __future__ import annotations
+import unicodedata
+
+import pytest
+
+from conftest import CORPUS, RULES
+from prompts.detector import annotate_sentence
+from prompts.loaders import load_markers
+from prompts.normalize import NormalizedText, fold, normalize
+
+SAMPLES = [
+    "Pas de fièvre ni d’œdème, hépatomégalie évoquée.",
+    "Aucune lésion décelée à l'échographie ; pas d’épanchement.",
+    "́accent initial et ȩ́ doublement combiné",  # marque combinante en tête, grappe de 3
+    "ÉCHOGRAPHIE SANS ANOMALIE, NI ÉPANCHEMENT",
+    "Straße ǅ ﬁ ΣΑΣ",  # replis de casse qui ne changent pas la longueur
+]
+
+
+def _nfd(s):
+    return unicodedata.normalize("NFD", s)
+
+
+def _boundaries(text):
+    """Débuts de grappe (caractère non combinant) et fin du texte."""
+    return [i for i in range(len(text)) if i == 0 or not unicodedata.combining(text[i])] + [len(text)]
+
+
+@pytest.mark.parametrize("sample", SAMPLES)
+def test_round_trip_on_decomposed_input(sample):
+    text = _nfd(sample)
+    nt = NormalizedText(text)
+    assert nt.norm == fold(unicodedata.normalize("NFC", text)) == normalize(text)
+    assert len(nt.norm) == len(unicodedata.normalize("NFC", text))
+    assert nt.identity == (text == unicodedata.normalize("NFC", text))
+    bounds = _boundaries(text)
+    for i in bounds:  # original → normalisé → original : identité aux frontières de grappe
+        assert nt.to_orig(nt.to_norm(i)) == i
+    for k in range(len(nt.norm) + 1):  # normalisé → original : toujours une frontière de grappe
+        i = nt.to_orig(k)
+        assert i in bounds
+        assert nt.to_norm(i) <= k
+    for a, b in zip(bounds, bounds[1:]):  # chaque grappe se recompose en son segment normalisé
+        assert fold(unicodedata.normalize("NFC", text[a:b])) == nt.norm[nt.to_norm(a):nt.to_norm(b)]
+
+
+def test_nfc_input_is_identity():
+    nt = NormalizedText(SAMPLES[0])
+    assert nt.identity and nt.to_norm(7) == 7 and nt.to_orig(7) == 7
+
+
+@pytest.fixture(scope="module")
+def markers():
+    return load_markers(RULES, use_cache=False)
+
+
+def test_cues_on_decomposed_text(markers):
+    """Les positions des cues d'une phrase NFD couvrent, après NFC, les surfaces de la phrase NFC.
+
+    Les motifs étant écrits en NFC, les règles qui matchent peuvent différer entre les deux
+    formes : seules les phrases où les mêmes règles produisent les mêmes labels sont comparées.
+    """
+    lines = [line.strip() for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+    checked = 0
+    for sid, line in enumerate(lines, 1):
+        composed = unicodedata.normalize("NFC", line)
+        decomposed = _nfd(composed)
+        if decomposed == composed:
+            continue
+        a = annotate_sentence(composed, sid, markers, [])["cues"]
+        b = annotate_sentence(decomposed, sid, markers, [])["cues"]
+        def key(cues):
+            return [(c["id"], unicodedata.normalize("NFC", c["cue_label"])) for c in cues]
+        if not a or key(a) != key(b):
+            continue
+        for ca, cb in zip(a, b):
+            assert [composed[s:e] for s, e in ca["positions"]] == \
+                [unicodedata.normalize("NFC", decomposed[s:e]) for s, e in cb["positions"]], (sid, ca, cb)
+        checked += 1
+    assert checked > 100
@@ -0,0 +1,60 @@
+"""Préfiltre par ancres : il ne change aucun résultat d'annotate_sentence."""
+
+from __future__ import annotations
+import random
+import warnings
+
+import pytest
+import regex as reg
+
+from conftest import CORPUS, RULES
+from prompts.anchors import anchor_literals, may_match
+from prompts.detector import annotate_sentence, load_markers
+
+
+def _without_anchors(markers_by_group):
+    # _anchors = None : may_match laisse passer toutes les règles
+    return {g: [dict(r, _anchors=None) for r in rules] for g, rules in markers_by_group.items()}
+
+
+def _sentences():
+    sents = [line.strip() for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+    rnd = random.Random(0)
+    # variantes de casse : les ancres sont comparées au texte casefoldé
+    extra = [s.upper() for s in sents]
+    extra += ["".join(c.upper() if rnd.random() < 0.3 else c for c in s) for s in sents]
+    return sents + extra
+
+
+def test_prefilter_does_not_change_cues():
+    markers = load_markers(RULES, use_cache=False)
+    assert any(r.get("_anchors") for rules in markers.values() for r in rules)
+    plain = _without_anchors(markers)
+    diffs = []
+    for sid, text in enumerate(_sentences(), 1):
+        with_prefilter = annotate_sentence(text, sid, markers, [])
+        without = annotate_sentence(text, sid, plain, [])
+        if with_prefilter != without:
+            diffs.append(text)
+    assert diffs == []
+
+
+@pytest.mark.parametrize("pattern, text", [
+    (r"[[:alpha:]]+x", "abcx"),  # classe POSIX : `re` y lit le littéral "]"
+    (r"(?:absence){i<=1}\s+de", "absence de"),  # contrainte floue lue comme texte par `re`
+    (r"(?:absence){e<=1}\s+de", "absense de"),
+    (r"\b(?:fi[eè]vre){1<=e<=2}", "fievre"),
+    (r"(?:abscence){2i+2d+1s<=4}", "absence"),
+])
+def test_regex_only_syntax_has_no_anchor(pattern, text):
+    flags = reg.IGNORECASE | reg.BESTMATCH
+    assert reg.search(pattern, text, flags)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")  # pas de FutureWarning du parseur `re`
+        anchors = anchor_literals(pattern, flags)
+    assert anchors is None
+    assert may_match(anchors, text.casefold())
+
+
+def test_plain_repeat_keeps_anchor():
+    assert anchor_literals(r"\bpas{1,2}\s+de\b") == frozenset({"pa"})
@@ -0,0 +1,66 @@
+"""Profil par règle (--profile) : compteurs cohérents avec la sortie, en série comme en parallèle."""
+
+from __future__ import annotations
+import json
+
+from conftest import CORPUS, run_runner
+from prompts.profiling import _COUNTS, RuleProfile
+
+
+def _profile(tmp_path, rules_dir, name, *opts):
+    out, prof = tmp_path / f"{name}.jsonl", tmp_path / f"{name}.json"
+    run_runner("--rules", rules_dir, "--input", CORPUS, "--output", out, "--profile", prof, *opts)
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    return records, json.loads(prof.read_text(encoding="utf-8")), prof.with_suffix(".txt")
+
+
+def _counts(profile):
+    return {rid: {k: st[k] for k in _COUNTS} for rid, st in profile["rules"].items()}
+
+
+def test_profile_counts(tmp_path, rules_copy):
+    records, profile, table = _profile(tmp_path, rules_copy, "serial", "--cue-cache", 0)
+    assert profile["sentences"] == len(records)
+    rules = profile["rules"]
+    assert sum(st["cues"] for st in rules.values()) == sum(len(r["cues"]) for r in records)
+    fired = {c["id"] for r in records for c in r["cues"]}
+    assert fired <= {rid for rid, st in rules.items() if st["cues"]}
+    for rid, st in rules.items():
+        assert st["matches"] >= st["cues"] + st["dedup_drops"] + st["guard_rejects"], rid
+        assert st["evaluated"] + st["prefiltered"] <= profile["sentences"], rid
+        assert st["worst_s"] <= st["regex_s"] + 1e-9, rid
+    assert table.read_text(encoding="utf-8").count("\n") == len(rules) + 2
+
+
+def test_parallel_profile_equals_serial(tmp_path, rules_copy):
+    _, serial, _ = _profile(tmp_path, rules_copy, "serial", "--cue-cache", 0)
+    _, parallel, _ = _profile(tmp_path, rules_copy, "parallel", "--cue-cache", 0, "--workers", 3, "--chunk-size", 50)
+    assert parallel["sentences"] == serial["sentences"]
+    assert _counts(parallel) == _counts(serial)
+
+
+def test_merge():
+    a, b = RuleProfile(), RuleProfile()
+    rule = {"id": "R", "group": "g"}
+    a.sentences, b.sentences = 2, 3
+    a.record_regex(a.rule(rule), 0.5)
+    b.sid = 7
+    b.record_regex(b.rule(rule), 0.75)
+    b.rule({"id": "S", "group": "h"})["cues"] = 4
+    a.merge(b.to_dict())
+    assert a.sentences == 5
+    assert a.rules["R"]["evaluated"] == 2 and a.rules["R"]["regex_s"] == 1.25
+    assert (a.rules["R"]["worst_s"], a.rules["R"]["worst_sid"]) == (0.75, 7)
+    assert a.rules["S"]["cues"] == 4
+
+
+def test_profile_ignores_cue_cache(tmp_path, rules_copy):
+    # chaque phrase deux fois : avec le cache de cues, la seconde occurrence ne serait pas évaluée
+    doubled = tmp_path / "doubled.txt"
+    doubled.write_text(CORPUS.read_text(encoding="utf-8") * 2, encoding="utf-8")
+    out, prof = tmp_path / "out.jsonl", tmp_path / "prof.json"
+    run_runner("--rules", rules_copy, "--input", doubled, "--output", out, "--profile", prof, "--cue-cache", 1000)
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    profile = json.loads(prof.read_text(encoding="utf-8"))
+    assert profile["sentences"] == len(records)
+    assert sum(st["cues"] for st in profile["rules"].values()) == sum(len(r["cues"]) for r in records)
@@ -0,0 +1,17 @@
+"""Runner : la sortie parallèle est identique, ligne pour ligne, à la sortie série."""
+
+from __future__ import annotations
+
+import pytest
+
+from conftest import CORPUS, run_runner
+
+
+@pytest.mark.parametrize("opts", [(), ("--segment",), ("--scopes",)], ids=["phrases", "segment", "scopes"])
+def test_parallel_equals_serial(tmp_path, rules_copy, opts):
+    serial, parallel = tmp_path / "serial.jsonl", tmp_path / "parallel.jsonl"
+    run_runner("--rules", rules_copy, "--input", CORPUS, "--output", serial, *opts)
+    # petits lots : beaucoup de lots en vol, l'ordre de fin des workers diffère de l'ordre d'entrée
+    run_runner("--rules", rules_copy, "--input", CORPUS, "--output", parallel, "--workers", 3, "--chunk-size", 7, *opts)
+    assert serial.read_bytes() == parallel.read_bytes()
+    assert serial.read_text(encoding="utf-8").count("\n") > 0
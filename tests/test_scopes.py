@@ -0,0 +1,150 @@
+"""Portées : deny_if_group_present indexé par phrase = parcours de tous les cues; portées des règles réelles."""
+
+from __future__ import annotations
+import random
+
+import pytest
+
+from conftest import CORPUS, RULES
+from prompts import scopes
+from prompts.detector import annotate_sentence, load_markers
+from prompts.intervals import IntervalIndex
+from prompts.scopes import load_strategies, resolve_scopes
+
+
+def _denied_brute(st, sent, lo, hi, cue_index, cues, cue_bounds):
+    """Ancienne version : tous les autres cues de la phrase comparés à la fenêtre."""
+    guards = st.get("guards") or {}
+    if not isinstance(guards, dict):
+        return False
+    deny = guards.get("deny_if_group_present")
+    if deny:
+        a, b = scopes._window(sent, lo, hi, int(deny.get("window_tokens") or scopes.DEFAULT_WINDOW_TOKENS))
+        labels = {str(x).lower() for x in deny.get("labels") or []}
+        for k, other in enumerate(cues):
+            if k == cue_index or other.get("group") != deny.get("group"):
+                continue
+            if labels and str(other.get("cue_label", "")).lower() not in labels:
+                continue
+            oa, ob = cue_bounds[k]
+            if oa < b and ob > a:
+                return True
+    surface = st.get("_deny_surface")
+    if surface:
+        a, b = scopes._window(sent, lo, hi, scopes.DEFAULT_WINDOW_TOKENS)
+        return any(p.search(sent.text, a, b) for p in surface)
+    return False
+
+
+@pytest.fixture(scope="module")
+def strategies():
+    return load_strategies(RULES)
+
+
+def _random_cues(rnd, text, groups):
+    cues = []
+    for _ in range(rnd.randint(1, 12)):
+        a = rnd.randrange(len(text))
+        b = min(len(text), a + rnd.randint(1, 15))
+        positions = [(a, b)]
+        if rnd.random() < 0.3 and b < len(text):  # cue discontinu ("ne … pas")
+            c = rnd.randrange(b, len(text))
+            positions.append((c, min(len(text), c + 3)))
+        cues.append({"group": rnd.choice(groups), "cue_label": rnd.choice(["sans", "SANS", "ni", "pas", "aucun", ""]),
+                     "positions": positions})
+    return cues
+
+
+def test_denied_matches_brute_force(strategies):
+    deny = [st for sts in strategies.values() for st in sts if (st.get("guards") or {}).get("deny_if_group_present")]
+    assert deny
+    groups = sorted(strategies) + ["preposition"]
+    rnd = random.Random(0)
+    texts = [line for line in CORPUS.read_text(encoding="utf-8").splitlines() if len(line) > 20][:400]
+    checked = denied = 0
+    for text in texts:
+        cues = _random_cues(rnd, text, groups)
+        sent = scopes._Sentence(text)
+        bounds = [scopes._cue_bounds(c) for c in cues]
+        index = scopes._CueIndex(cues, bounds)
+        for ci, cue in enumerate(cues):
+            lo, hi = bounds[ci]
+            for st in deny:
+                expected = _denied_brute(st, sent, lo, hi, ci, cues, bounds)
+                assert scopes._denied(st, sent, lo, hi, cue, index) == expected, (text, cue, st.get("id"))
+                checked += 1
+                denied += expected
+    assert checked and 0 < denied < checked
+
+
+def test_resolve_scopes_unchanged(strategies, monkeypatch):
+    rnd = random.Random(1)
+    texts = [line for line in CORPUS.read_text(encoding="utf-8").splitlines() if len(line) > 20][:200]
+    cases = [(text, _random_cues(rnd, text, sorted(strategies))) for text in texts]
+    fast = [resolve_scopes(text, cues, strategies) for text, cues in cases]
+
+    def brute(st, sent, lo, hi, cue, index):
+        ci = next(k for k, c in enumerate(current["cues"]) if c is cue)
+        return _denied_brute(st, sent, lo, hi, ci, current["cues"], current["bounds"])
+    current = {}
+    monkeypatch.setattr(scopes, "_denied", brute)
+    slow = []
+    for text, cues in cases:
+        current.update(cues=cues, bounds=[scopes._cue_bounds(c) for c in cues])
+        slow.append(resolve_scopes(text, cues, strategies))
+    assert fast == slow
+
+
+@pytest.fixture(scope="module")
+def markers():
+    return load_markers(RULES, use_cache=False)
+
+
+def _scopes(text, markers, strategies, keep=lambda cue: True):
+    """{(groupe, label du cue): (stratégie, portée)} pour les cues de `text` retenus par `keep`."""
+    cues = [c for c in annotate_sentence(text, 1, markers, IntervalIndex())["cues"] if keep(c)]
+    return {(cues[s["cue_index"]]["group"], cues[s["cue_index"]]["cue_label"]): (s["id"], s["scope"])
+            for s in resolve_scopes(text, cues, strategies)}
+
+
+def test_subject_verb_object(markers, strategies):
+    # sujet à gauche du cue, jusqu'au début de la phrase (ou une ponctuation)
+    got = _scopes("Le patient n'a pas de fièvre.", markers, strategies)
+    assert got[("bipartite", "n' pas")] == ("BIP_G_CORE", "Le patient n'a pas de fièvre")
+    got = _scopes("Au réveil, le patient n'a pas de fièvre.", markers, strategies)
+    assert got[("bipartite", "n' pas")] == ("BIP_G_CORE", "le patient n'a pas de fièvre")
+
+
+def test_strip_leading_de(markers, strategies):
+    got = _scopes("Ni de fièvre ni de toux.", markers, strategies)
+    assert sorted(got.values()) == [("CONJ_NI_CORE", "fièvre"), ("CONJ_NI_CORE", "toux")]
+    # sans strip_leading_de, le "de" reste dans la portée
+    assert _scopes("Absence de fièvre.", markers, strategies)[("lexical", "Absence")] == ("LEX_G_CORE", "de fièvre")
+
+
+@pytest.mark.parametrize("text, scope", [
+    ("Absence de fièvre; toux sèche.", "de fièvre"),  # stop_punct
+    ("Absence de fièvre: toux sèche.", "de fièvre"),
+    ("Absence de fièvre, toux sèche.", "de fièvre, toux sèche"),  # la virgule n'arrête pas la fenêtre
+    ("Absence de toux pas de fièvre.", "de toux"),  # cue suivant
+])
+def test_right_window_stops(markers, strategies, text, scope):
+    assert _scopes(text, markers, strategies)[("lexical", "Absence")] == ("LEX_G_CORE", scope)
+
+
+def test_skip_ne_que(markers, strategies):
+    assert _scopes("Il ne que tousse.", markers, strategies) == {}
+    assert _scopes("Il ne tousse.", markers, strategies)[("bipartite", "ne")] == ("BIP_G_CORE", "Il ne tousse")
+
+
+@pytest.mark.parametrize("text, label", [
+    ("Patient sans antécédent, aucune allergie connue.", "aucune"),
+    ("Sans fièvre et pas de toux.", "pas"),
+])
+def test_deny_determinant_next_to_sans(markers, strategies, text, label):
+    got = _scopes(text, markers, strategies)
+    assert ("preposition", "sans") in {(g, l.lower()) for g, l in got}
+    assert ("determinant", label) not in got
+    # sans le cue "sans", le déterminant reçoit sa portée
+    alone = _scopes(text, markers, strategies, keep=lambda c: c["group"] != "preposition")
+    assert alone[("determinant", label)][0] == "DET_G_CORE"
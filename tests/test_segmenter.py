@@ -0,0 +1,48 @@
+"""Segmentation en phrases : cas de coupure et coût linéaire en la taille du texte."""
+
+from __future__ import annotations
+import time
+
+import pytest
+
+from prompts.segmenter import split_sentences
+
+
+def _split(text):
+    return [text[a:b] for a, b in split_sentences(text)]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("12 mm. Pas de récidive.", ["12 mm.", "Pas de récidive."]),
+    ("etc. Aucune fièvre.", ["etc.", "Aucune fièvre."]),
+    ("vitamine D. Pas de fièvre.", ["vitamine D.", "Pas de fièvre."]),
+    ("lésion de 12 mm. de diamètre", ["lésion de 12 mm. de diamètre"]),
+    ("douleurs, etc. sans fièvre", ["douleurs, etc. sans fièvre"]),
+    ("nodule de 4 mm. 2 autres nodules.", ["nodule de 4 mm. 2 autres nodules."]),
+    ("Madame R. F., âgée de 45 ans, sans antécédent.", ["Madame R. F., âgée de 45 ans, sans antécédent."]),
+    ("Madame E. H âgée de 70 ans. Pas de fièvre.", ["Madame E. H âgée de 70 ans.", "Pas de fièvre."]),
+    ("M. Dumont va bien. Dr. Martin aussi.", ["M. Dumont va bien.", "Dr. Martin aussi."]),
+    ("voir fig. 3 et cf. Tab. 2.", ["voir fig. 3 et cf. Tab. 2."]),
+    ("Pas de fièvre… La recherche … détectait.", ["Pas de fièvre…", "La recherche … détectait."]),
+    ("Valeur 12.5 normale. Fin", ["Valeur 12.5 normale.", "Fin"]),
+])
+def test_split(text, expected):
+    assert _split(text) == expected
+
+
+def _seconds(text, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        split_sentences(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def test_linear_in_text_length():
+    # beaucoup de points précédés de mots : l'ancien scan du mot précédent depuis le début était quadratique
+    unit = "Le patient ne présente pas de fièvre ni de toux. Vitamine D. Etc. "
+    small, large = unit * 500, unit * 2000
+    assert len(split_sentences(large)) == 4 * len(split_sentences(small))
+    ratio = _seconds(large) / _seconds(small)
+    assert ratio < 8, f"x4 en taille → x{ratio:.1f} en temps"
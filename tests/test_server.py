@@ -0,0 +1,86 @@
+"""Serveur : rechargement à chaud des règles et réponses d'erreur HTTP."""
+
+from __future__ import annotations
+import http.client
+import json
+import threading
+
+import pytest
+
+from prompts.server import AnnotationServer, RuleSet
+
+NEW_RULE = """- id: ZZ_JAMAIS_TEST
+  when_pattern: '\\b(?P<match>jamais\\s+plus)\\b'
+  cue_label: ["{match}"]
+  group: "lexical"
+  options:
+    regex: true
+    case_insensitive: true
+    exclude_verbs_from_cue: true
+"""
+
+
+def test_reload_keeps_previous_generation_on_error(rules_copy):
+    rules = RuleSet(rules_copy)
+    first = rules.state
+    assert first.generation == 1
+    extra = rules_copy / "10_markers" / "zz_test.yaml"
+    extra.write_text("- id: ZZ\n  when_pattern: [non fermé\n", encoding="utf-8")
+    assert rules.reload() is False
+    assert rules.state is first  # ancien jeu toujours servi
+    assert rules.state.annotator.annotate("Il ne viendra jamais plus.", 1) == first.annotator.annotate("Il ne viendra jamais plus.", 1)
+
+    extra.write_text(NEW_RULE, encoding="utf-8")
+    assert rules.reload() is True
+    assert rules.state.generation == 2
+    assert rules.state.n_rules == first.n_rules + 1
+    cues = rules.state.annotator.annotate("Il ne viendra jamais plus.", 1)["cues"]
+    assert "ZZ_JAMAIS_TEST" in {c["id"] for c in cues}
+
+
+@pytest.fixture
+def server(rules_copy):
+    srv = AnnotationServer(("127.0.0.1", 0), RuleSet(rules_copy))
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _post(srv, path, body=b"", headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", srv.server_address[1], timeout=10)
+    try:
+        conn.request("POST", path, body=body, headers=headers or {})
+        resp = conn.getresponse()
+        return resp.status, json.loads(resp.read())
+    finally:
+        conn.close()
+
+
+def test_annotate_ok(server):
+    status, body = _post(server, "/annotate", json.dumps({"sentences": ["Pas de fièvre."]}).encode())
+    assert status == 200 and body["generation"] == 1
+    assert body["results"][0]["text"] == "Pas de fièvre."
+
+
+def test_negative_content_length(server):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+    try:
+        conn.putrequest("POST", "/annotate")
+        conn.putheader("Content-Length", "-1")
+        conn.endheaders()
+        resp = conn.getresponse()  # sans le correctif, le serveur attend la fin du flux : timeout
+        assert resp.status == 400
+        assert "Content-Length" in json.loads(resp.read())["error"]
+    finally:
+        conn.close()
+
+
+def test_annotation_error_is_500(server, monkeypatch):
+    def boom(text, sid):
+        raise RuntimeError("règle cassée")
+    monkeypatch.setattr(server.rules.state.annotator, "annotate", boom)
+    status, body = _post(server, "/annotate", json.dumps({"sentences": ["Pas de fièvre."]}).encode())
+    assert status == 500
+    assert "règle cassée" in body["error"]
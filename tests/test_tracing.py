@@ -0,0 +1,97 @@
+"""Traces TRACE par règle : cohérentes avec les cues produites, et sans effet sur le résultat."""
+
+from __future__ import annotations
+import json
+import logging
+from collections import Counter
+
+import pytest
+
+from conftest import CORPUS, RULES, run_runner
+from prompts.debug_print import TRACE, JsonTraceFormatter, debug_print, enable_tracing
+from prompts.detector import annotate_sentence
+from prompts.loaders import load_markers
+
+
+class _Lines(logging.Handler):
+    def __init__(self):
+        super().__init__(TRACE)
+        self.setFormatter(JsonTraceFormatter())
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+@pytest.fixture(scope="module")
+def markers():
+    return load_markers(RULES, use_cache=False)
+
+
+@pytest.fixture
+def traced():
+    handler = _Lines()
+    logger = logging.getLogger("prompts")
+    level = logger.level
+    enable_tracing(handler)
+    try:
+        yield handler
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+
+
+def _sentences(n=300):
+    return [line.strip() for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()][:n]
+
+
+def test_events_match_results(markers, traced):
+    sents = _sentences()
+    results = [annotate_sentence(text, sid, markers, []) for sid, text in enumerate(sents, 1)]
+    events = [json.loads(line) for line in traced.lines]
+    kinds = Counter(e["event"] for e in events)
+    assert kinds["sentence"] == len(sents)
+    assert kinds["match"] == kinds["cue"] + kinds["dedup_drop"] + kinds["guard_reject"]
+
+    # événements regroupés par phrase, dans l'ordre d'émission
+    per_sentence, current = [], None
+    for e in events:
+        if e["event"] == "sentence":
+            current = []
+            per_sentence.append((e["sid"], current))
+        else:
+            current.append(e)
+    assert [sid for sid, _ in per_sentence] == list(range(1, len(sents) + 1))
+    for (sid, evs), res in zip(per_sentence, results):
+        cues = [(e["rule"], [list(p) for p in e["positions"]]) for e in evs if e["event"] == "cue"]
+        assert cues == [(c["id"], [list(p) for p in c["positions"]]) for c in res["cues"]], sid
+
+
+def test_tracing_does_not_change_output(markers, traced):
+    sents = _sentences(100)
+    with_trace = [annotate_sentence(text, sid, markers, []) for sid, text in enumerate(sents, 1)]
+    logging.getLogger("prompts").setLevel(logging.WARNING)
+    without = [annotate_sentence(text, sid, markers, []) for sid, text in enumerate(sents, 1)]
+    assert traced.lines and with_trace == without
+
+
+def test_debug_print_silent_when_disabled(capsys):
+    logging.getLogger("prompts.debug").setLevel(logging.INFO)
+    try:
+        debug_print("ne doit pas s'afficher", 1, 2)
+    finally:
+        logging.getLogger("prompts.debug").setLevel(logging.NOTSET)
+    assert capsys.readouterr().out == ""
+
+
+def test_runner_trace_file(tmp_path, rules_copy):
+    out, trace, corpus = tmp_path / "out.jsonl", tmp_path / "trace.jsonl", tmp_path / "corpus.txt"
+    lines = CORPUS.read_text(encoding="utf-8").splitlines()
+    corpus.write_text("\n".join(lines + lines[:3] * 2) + "\n", encoding="utf-8")  # phrases répétées : cache de cues
+    run_runner("--rules", rules_copy, "--input", corpus, "--output", out, "--trace", trace)
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    lines = [json.loads(line) for line in trace.read_text(encoding="utf-8").splitlines()]
+    kinds = Counter(e["event"] for e in lines if "event" in e)  # les autres messages (INFO...) y figurent aussi
+    assert kinds["sentence"] == len(records)
+    assert kinds["cue"] == sum(len(r["cues"]) for r in records)
+    assert kinds["rule_loaded"] > 0